@@ -0,0 +1,215 @@
+# appwrite_storage.py - Pooled Appwrite storage client with a bounded upload queue
+# File: /appwrite_storage.py
+import concurrent.futures
+import hashlib
+import mimetypes
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+REQUIRED_ENV_VARS = [
+    "APPWRITE_ENDPOINT",
+    "APPWRITE_PROJECT_ID",
+    "APPWRITE_API_KEY",
+    "APPWRITE_BUCKET_ID"
+]
+
+# Appwrite accepts single requests up to 5MB; larger files go up in chunks
+CHUNK_SIZE = 5 * 1024 * 1024
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class AppwriteStorage:
+    """
+    Long-lived client for the Appwrite storage files API.
+    A single requests.Session keeps HTTPS connections alive between uploads
+    instead of opening a new one per file like the SDK does.
+    """
+
+    def __init__(self, endpoint, project_id, api_key, bucket_id,
+                 pool_size=8, max_retries=3, backoff=0.5, timeout=30, chunk_size=CHUNK_SIZE):
+        self.endpoint = endpoint.rstrip("/")
+        self.project_id = project_id
+        self.bucket_id = bucket_id
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "X-Appwrite-Project": project_id,
+            "X-Appwrite-Key": api_key,
+        })
+
+        # Recent upload durations, for latency percentiles
+        self._latencies = deque(maxlen=10000)
+        self._latency_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        missing_vars = [var for var in REQUIRED_ENV_VARS if not os.environ.get(var)]
+        if missing_vars:
+            raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
+        return cls(
+            os.environ["APPWRITE_ENDPOINT"],
+            os.environ["APPWRITE_PROJECT_ID"],
+            os.environ["APPWRITE_API_KEY"],
+            os.environ["APPWRITE_BUCKET_ID"],
+            **kwargs
+        )
+
+    def download_url(self, file_id):
+        return (
+            f"{self.endpoint}/storage/buckets/{self.bucket_id}"
+            f"/files/{file_id}/download?project={self.project_id}"
+        )
+
+    def upload(self, data, filename, file_id=None, mime_type=None):
+        """
+        Upload bytes, or a seekable binary file read from its current
+        position, as a publicly readable file and return its download URL.
+        Files larger than chunk_size are sent as Content-Range chunks.
+        """
+        file_id = file_id or uuid.uuid4().hex
+        mime_type = mime_type or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        started = time.perf_counter()
+
+        if hasattr(data, "read"):
+            offset = data.tell()
+            size = data.seek(0, os.SEEK_END) - offset
+            data.seek(offset)
+            read_chunk = lambda start, end: data.read(end - start)
+        else:
+            size = len(data)
+            view = memoryview(data)
+            read_chunk = lambda start, end: view[start:end]
+
+        if size <= self.chunk_size:
+            self._post_file(file_id, filename, read_chunk(0, size), mime_type)
+        else:
+            for start in range(0, size, self.chunk_size):
+                end = min(start + self.chunk_size, size)
+                headers = {"Content-Range": f"bytes {start}-{end - 1}/{size}"}
+                if start:
+                    headers["X-Appwrite-ID"] = file_id
+                self._post_file(file_id, filename, read_chunk(start, end), mime_type, headers)
+
+        with self._latency_lock:
+            self._latencies.append(time.perf_counter() - started)
+        return self.download_url(file_id)
+
+    def latency_percentiles(self, percentiles=(50, 90, 95, 99)):
+        """Latency percentiles in milliseconds over the most recent uploads."""
+        with self._latency_lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return {}
+        return {
+            f"p{p}": round(samples[min(len(samples) - 1, int(len(samples) * p / 100))] * 1000, 3)
+            for p in percentiles
+        }
+
+    def _post_file(self, file_id, filename, chunk, mime_type, headers=None):
+        url = f"{self.endpoint}/storage/buckets/{self.bucket_id}/files"
+        form = {"fileId": file_id, "permissions[]": ['read("any")']}
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(
+                    url,
+                    data=form,
+                    files={"file": (filename, bytes(chunk), mime_type)},
+                    headers=headers,
+                    timeout=self.timeout,
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    response.raise_for_status()
+                    return response.json()
+            # Exponential backoff with jitter so parallel retries spread out
+            time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+
+class UploadQueue:
+    """
+    Bounded queue of uploads served by a fixed set of worker threads.
+    submit() blocks once maxsize uploads are waiting, which pushes back on
+    producers instead of buffering an unbounded number of drawings.
+    """
+
+    def __init__(self, workers=4, maxsize=64):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"appwrite-upload-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, func, *args):
+        """Queue func(*args); returns a concurrent.futures.Future for its result."""
+        future = concurrent.futures.Future()
+        self._queue.put((future, func, args))
+        return future
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def _worker(self):
+        while True:
+            future, func, args = self._queue.get()
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(func(*args))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+
+def storage_scope():
+    """
+    Short name for the storage this process uploads to (endpoint, project
+    and bucket). Local state that holds upload URLs or jobs that upload is
+    kept per scope, so processes set up for different buckets can share a
+    machine without handing out each other's URLs.
+    """
+    target = "\n".join([
+        os.environ.get("APPWRITE_ENDPOINT", "").rstrip("/"),
+        os.environ.get("APPWRITE_PROJECT_ID", ""),
+        os.environ.get("APPWRITE_BUCKET_ID", ""),
+    ])
+    return hashlib.sha256(target.encode("utf-8")).hexdigest()[:16]
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """Return the process-wide storage client, creating it on first use."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = AppwriteStorage.from_env(
+                    pool_size=int(os.environ.get("DXF_UPLOAD_WORKERS", 4)),
+                )
+    return _storage
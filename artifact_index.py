@@ -0,0 +1,138 @@
+# artifact_index.py - Persistent, searchable history of generated drawings
+# File: /artifact_index.py
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    filename TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    scale REAL NOT NULL,
+    building_type TEXT NOT NULL,
+    format TEXT NOT NULL,
+    size INTEGER,
+    generation_ms REAL,
+    url TEXT,
+    cached INTEGER NOT NULL DEFAULT 0
+);
+-- Recency is the rowid order; the filters below are walked newest first too
+CREATE INDEX IF NOT EXISTS artifacts_building_type ON artifacts (building_type, id);
+CREATE INDEX IF NOT EXISTS artifacts_format ON artifacts (format, id);
+
+-- Full-text index over prompts, kept in step with the table by triggers
+CREATE VIRTUAL TABLE IF NOT EXISTS artifacts_prompt USING fts5(
+    prompt, content='artifacts', content_rowid='id', prefix='3'
+);
+CREATE TRIGGER IF NOT EXISTS artifacts_prompt_insert AFTER INSERT ON artifacts BEGIN
+    INSERT INTO artifacts_prompt (rowid, prompt) VALUES (NEW.id, NEW.prompt);
+END;
+CREATE TRIGGER IF NOT EXISTS artifacts_prompt_delete AFTER DELETE ON artifacts BEGIN
+    INSERT INTO artifacts_prompt (artifacts_prompt, rowid, prompt) VALUES ('delete', OLD.id, OLD.prompt);
+END;
+"""
+
+COLUMNS = ("id", "created", "filename", "prompt", "scale", "building_type", "format",
+           "size", "generation_ms", "url", "cached")
+
+# Old rows are pruned once every this many inserts, not on each one
+PRUNE_EVERY = 1000
+
+
+def match_query(text):
+    """
+    FTS5 query for free text: every word must appear, as a prefix, so
+    "kitch office" finds "office with a kitchen". Quoting keeps FTS5
+    operators in user input from being interpreted.
+    """
+    terms = ['"' + word.replace('"', '""') + '"*' for word in text.split()]
+    return " ".join(terms)
+
+
+class ArtifactIndex:
+    """
+    Every generated drawing (prompt, parameters, size, render time and
+    URL) in a SQLite database in WAL mode. Listing walks an index (the rowid,
+    a filter index or the prompt full-text index) from the newest row and
+    stops after one page, so its cost does not depend on how much history
+    is stored. At most max_rows rows are kept.
+    """
+
+    def __init__(self, path, max_rows=100_000):
+        self.path = path
+        self.max_rows = max_rows
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db().executescript(SCHEMA)
+
+    def record(self, filename, prompt, url, scale, building_type, fmt,
+               size=None, generation_ms=None, cached=False):
+        """Add a generated drawing; returns its id."""
+        db = self._db()
+        with db:
+            artifact_id = db.execute(
+                "INSERT INTO artifacts (created, filename, prompt, scale, building_type, format,"
+                " size, generation_ms, url, cached) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), filename, prompt, float(scale), str(building_type).strip().lower(), fmt,
+                 size, generation_ms, url, int(cached)),
+            ).lastrowid
+            if self.max_rows and artifact_id % PRUNE_EVERY == 0:
+                db.execute("DELETE FROM artifacts WHERE id <= ?", (artifact_id - self.max_rows,))
+        return artifact_id
+
+    def recent(self, limit=10, before=None, building_type=None, fmt=None, search=None):
+        """
+        Newest artifacts first, optionally filtered by building type, format
+        and prompt text. Pass the last id of a page as before to get the next
+        one. Returns (rows, next_before) with next_before None on the last page.
+        """
+        tables = "artifacts"
+        conditions = []
+        params = []
+        order = "artifacts.id"
+        if search and search.split():
+            # Driven by the full-text index, which yields rowids newest first
+            tables = "artifacts_prompt JOIN artifacts ON artifacts.id = artifacts_prompt.rowid"
+            conditions.append("artifacts_prompt MATCH ?")
+            params.append(match_query(search))
+            order = "artifacts_prompt.rowid"
+        if before is not None:
+            conditions.append(f"{order} < ?")
+            params.append(int(before))
+        if building_type:
+            conditions.append("artifacts.building_type = ?")
+            params.append(str(building_type).strip().lower())
+        if fmt:
+            conditions.append("artifacts.format = ?")
+            params.append(fmt)
+
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        columns = ", ".join(f"artifacts.{column}" for column in COLUMNS)
+        # One row past the page tells whether there is a next page
+        rows = self._db().execute(
+            f"SELECT {columns} FROM {tables}{where} ORDER BY {order} DESC LIMIT ?",
+            (*params, limit + 1),
+        ).fetchall()
+
+        page = [dict(zip(COLUMNS, row)) for row in rows[:limit]]
+        for artifact in page:
+            artifact["cached"] = bool(artifact["cached"])
+        next_before = page[-1]["id"] if len(rows) > limit else None
+        return page, next_before
+
+    def _db(self):
+        # One connection per thread, and never one inherited across fork()
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            local.db = db
+            local.pid = os.getpid()
+        return local.db
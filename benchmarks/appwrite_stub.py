@@ -0,0 +1,119 @@
+# appwrite_stub.py - Local stand-in for the Appwrite storage files API
+# File: /benchmarks/appwrite_stub.py
+#
+# Usage: python benchmarks/appwrite_stub.py [--port 8787] [--latency-ms 5]
+# or start_stub_server() from a benchmark to run it in a background thread.
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILES_PATH = re.compile(r"^/v1/storage/buckets/([^/]+)/files$")
+FILE_ID_FIELD = re.compile(rb'name="fileId"\r\n\r\n([^\r]+)\r\n')
+CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+
+
+class StubState:
+    def __init__(self, latency=0.0, fail_every=0):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.requests = 0
+        self.connections = 0
+        self.files = {}
+        self.lock = threading.Lock()
+
+
+class AppwriteStubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this Nagle + delayed
+    # ACK add ~40ms to every response on a reused connection
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.state.lock:
+            self.server.state.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        state = self.server.state
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        match = FILES_PATH.match(self.path)
+        if not match or not self.headers.get("X-Appwrite-Key"):
+            return self._reply(401 if match else 404, {"message": "Unauthorized or unknown path"})
+
+        with state.lock:
+            state.requests += 1
+            fail = state.fail_every and state.requests % state.fail_every == 0
+        if state.latency:
+            time.sleep(state.latency)
+        if fail:
+            return self._reply(503, {"message": "Injected failure"})
+
+        file_id_match = FILE_ID_FIELD.search(body)
+        if not file_id_match:
+            return self._reply(400, {"message": "Missing fileId"})
+        file_id = self.headers.get("X-Appwrite-ID") or file_id_match.group(1).decode()
+
+        chunks_total = chunks_uploaded = 1
+        content_range = CONTENT_RANGE.match(self.headers.get("Content-Range", ""))
+        with state.lock:
+            if content_range:
+                start, end, size = map(int, content_range.groups())
+                if start == 0:
+                    state.files[file_id] = {"size": size, "received": 0, "chunks": 0, "chunk_size": end + 1}
+                record = state.files[file_id]
+                record["received"] += end - start + 1
+                record["chunks"] += 1
+                chunks_uploaded = record["chunks"]
+                chunks_total = -(-size // record["chunk_size"])
+            else:
+                state.files[file_id] = {"size": len(body), "received": len(body), "chunks": 1}
+
+        self._reply(201, {
+            "$id": file_id,
+            "bucketId": match.group(1),
+            "chunksUploaded": chunks_uploaded,
+            "chunksTotal": chunks_total,
+        })
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_stub_server(port=0, latency=0.0, fail_every=0):
+    """Start the stub in a daemon thread; returns (server, endpoint URL)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), AppwriteStubHandler)
+    server.daemon_threads = True
+    server.state = StubState(latency, fail_every)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Appwrite storage API stub")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, endpoint = start_stub_server(args.port, args.latency_ms / 1000)
+    print(f"Appwrite stub listening on {endpoint}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# bench_artifacts.py - list_recent_dxf_files query time against history size
+# File: /benchmarks/bench_artifacts.py
+#
+# Usage: python benchmarks/bench_artifacts.py [--sizes 1000 10000 100000] [--json results.json]
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from artifact_index import ArtifactIndex
+
+PROMPTS = [
+    "house with 2 doors and 3 windows, bedroom and kitchen",
+    "office with 6 doors, 20 windows, 8 rooms and a kitchen",
+    "warehouse with 30 doors and a loading dock",
+]
+BUILDING_TYPES = ["house", "office", "warehouse"]
+
+QUERIES = {
+    "newest": {},
+    "building_type": {"building_type": "office"},
+    "format": {"fmt": "svg"},
+    "search_word": {"search": "kitchen"},
+    "search_prefix": {"search": "kitch"},
+    "search_rare": {"search": "dock"},
+}
+
+
+def fill(index, count):
+    """Insert count artifacts in one transaction, as a long-running server would have."""
+    db = index._db()
+    with db:
+        db.executemany(
+            "INSERT INTO artifacts (created, filename, prompt, scale, building_type, format, size, generation_ms, url)"
+            " VALUES (?, ?, ?, 1.0, ?, ?, 20000, 15.0, 'https://example.invalid/')",
+            (
+                (time.time(), f"plan_{i}.dxf", f"{random.choice(PROMPTS)} #{i}",
+                 random.choice(BUILDING_TYPES), random.choice(["dxf", "dxf", "dxf", "svg"]))
+                for i in range(count)
+            ),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Artifact index benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    random.seed(0)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            index = ArtifactIndex(os.path.join(directory, f"artifacts_{size}.sqlite3"), max_rows=None)
+            fill(index, size)
+            timings = {}
+            for name, filters in QUERIES.items():
+                samples = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    index.recent(10, **filters)
+                    samples.append((time.perf_counter() - start) * 1000)
+                timings[f"{name}_ms"] = round(statistics.median(samples), 3)
+            results[size] = timings
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(output)
+
+
+if __name__ == "__main__":
+    main()
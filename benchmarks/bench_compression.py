@@ -0,0 +1,73 @@
+# bench_compression.py - Size and CPU cost of gzip/brotli levels on generated plans
+# File: /benchmarks/bench_compression.py
+#
+# Usage: python benchmarks/bench_compression.py [--repeat 5] [--json results.json]
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dxf_compression import available_encodings, compress, decompress
+from dxf_engine import render_plan_bytes
+
+# From a single room to a plan with hundreds of openings
+PLANS = {
+    "small_house": ("house with 2 doors and 3 windows, bedroom and kitchen", 1.0, "house"),
+    "office": ("office with 6 doors, 20 windows, 8 rooms and a kitchen", 1.0, "office"),
+    "large_warehouse": ("warehouse with 300 doors, 500 windows and 200 rooms", 1.0, "warehouse"),
+}
+
+LEVELS = {
+    "gzip": [1, 3, 6, 9],
+    "br": [1, 4, 5, 8, 11],
+}
+
+
+def measure(data, encoding, level, repeat):
+    compress_ms = []
+    decompress_ms = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compressed = compress(data, encoding, level)
+        compress_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        decompress(compressed, encoding)
+        decompress_ms.append((time.perf_counter() - start) * 1000)
+    return {
+        "bytes": len(compressed),
+        "ratio": round(len(data) / len(compressed), 2),
+        "compress_ms": round(statistics.median(compress_ms), 3),
+        "decompress_ms": round(statistics.median(decompress_ms), 3),
+        "compress_mb_per_s": round(len(data) / 1e6 / (statistics.median(compress_ms) / 1000), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DXF compression benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for name, (prompt, scale, building_type) in PLANS.items():
+        data = render_plan_bytes(prompt, scale, building_type)
+        plan = {"bytes": len(data)}
+        for encoding in available_encodings():
+            for level in LEVELS[encoding]:
+                plan[f"{encoding}_{level}"] = measure(data, encoding, level, args.repeat)
+        results[name] = plan
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# bench_delta.py - Compare redrawing only what an edit changes with rendering the edited plan again
+# File: /benchmarks/bench_delta.py
+#
+# Usage: python benchmarks/bench_delta.py [--iterations 20] [--json results.json]
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dxf_delta import PlanState
+from dxf_engine import edit_spec, normalize_spec, render_spec
+
+CASES = {
+    "add_room": ("house with 4 doors, 6 windows, 3 bedrooms, kitchen and bathroom", {"add_rooms": ["bathroom"]}),
+    "add_window": ("house with 4 doors, 6 windows, 3 bedrooms, kitchen and bathroom", {"add_windows": 1}),
+    "add_door_40": ("warehouse with 40 doors and 60 windows", {"add_doors": 1}),
+    "remove_door_200_rooms": ("house with 10 doors, 10 windows and 200 rooms", {"remove_doors": 1}),
+    # Grows the footprint, so every entity moves and is redrawn
+    "add_door_900": ("house with 900 doors and 900 windows", {"add_doors": 1}),
+}
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "p50_ms": round(samples[len(samples) // 2], 4),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 4),
+    }
+
+
+def measure_case(prompt, edits, iterations):
+    spec = normalize_spec(prompt)
+    edited = edit_spec(spec, **edits)
+    state = PlanState()
+    state.update(spec)
+    state.serialize(spec["format"])
+
+    # As GenerationEngine.edit does: a copy of the held drawing is changed
+    delta, full = [], []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        copy = state.copy()
+        redrawn = copy.update(edited)
+        copy.serialize(edited["format"])
+        delta.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        render_spec(edited)
+        full.append((time.perf_counter() - start) * 1000)
+
+    result = {
+        "entities": redrawn[2],
+        "redrawn": redrawn[0],
+        "delta": summarize(delta),
+        "full_render": summarize(full),
+    }
+    result["speedup"] = round(result["full_render"]["mean_ms"] / result["delta"]["mean_ms"], 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan edit (delta redraw) benchmark")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = {name: measure_case(prompt, edits, args.iterations) for name, (prompt, edits) in CASES.items()}
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(output)
+
+
+if __name__ == "__main__":
+    main()
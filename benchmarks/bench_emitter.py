@@ -0,0 +1,104 @@
+# bench_emitter.py - Compare per-call msp.add_*() with the bulk entity emitter
+# File: /benchmarks/bench_emitter.py
+#
+# Usage: python benchmarks/bench_emitter.py [--sizes 1000 10000 100000] [--repeat 3] [--json results.json]
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from ezdxf.enums import TextEntityAlignment
+
+from dxf_emitter import BulkEmitter
+from dxf_render import templates
+
+
+def make_geometry(count):
+    """A plan-like mix: a quarter each of lines, arcs, frames and labels."""
+    quarter = count // 4
+    rng = np.random.default_rng(0)
+    starts = rng.uniform(0, 20000, (quarter, 2))
+    return {
+        "segments": np.hstack([starts, starts + rng.uniform(-800, 800, (quarter, 2))]),
+        "centers": starts,
+        "radii": np.full(quarter, 800.0),
+        "angles": np.tile([0.0, 90.0], (quarter, 1)),
+        "frames": starts[:, None, :] + np.array([(0, 0), (1200, 0), (1200, 150), (0, 150)]),
+        "labels": [f"Room {i}" for i in range(quarter)],
+    }
+
+
+def per_call(msp, geometry):
+    for x1, y1, x2, y2 in geometry["segments"].tolist():
+        msp.add_line((x1, y1), (x2, y2), dxfattribs={"layer": "WALLS", "lineweight": 30})
+    for (x, y), radius, (start, end) in zip(
+        geometry["centers"].tolist(), geometry["radii"].tolist(), geometry["angles"].tolist()
+    ):
+        msp.add_arc(center=(x, y), radius=radius, start_angle=start, end_angle=end,
+                    dxfattribs={"layer": "DOORS"})
+    for corners in geometry["frames"].tolist():
+        msp.add_lwpolyline(corners, close=True, dxfattribs={"layer": "WINDOWS"})
+    for label, (x, y) in zip(geometry["labels"], geometry["centers"].tolist()):
+        msp.add_text(label, dxfattribs={"height": 200, "layer": "TEXT"}
+                     ).set_placement((x, y), align=TextEntityAlignment.MIDDLE_CENTER)
+
+
+def bulk(msp, geometry):
+    emit = BulkEmitter(msp)
+    emit.lines(geometry["segments"], layer="WALLS", lineweight=30)
+    emit.arcs(geometry["centers"], geometry["radii"], geometry["angles"], layer="DOORS")
+    emit.polylines(geometry["frames"], close=True, layer="WINDOWS")
+    emit.texts(geometry["labels"], geometry["centers"], align=TextEntityAlignment.MIDDLE_CENTER,
+               height=200, layer="TEXT")
+
+
+def measure(emit, geometry, repeat):
+    samples = []
+    entities = 0
+    for _ in range(repeat):
+        doc = templates.new_document("architectural")
+        msp = doc.modelspace()
+        start = time.perf_counter()
+        emit(msp, geometry)
+        samples.append((time.perf_counter() - start) * 1000)
+        entities = len(msp)
+    return {
+        "entities": entities,
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "min_ms": round(min(samples), 3),
+        "us_per_entity": round(min(samples) * 1000 / max(entities, 1), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk entity emitter benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for size in args.sizes:
+        geometry = make_geometry(size)
+        per_call_result = measure(per_call, geometry, args.repeat)
+        bulk_result = measure(bulk, geometry, args.repeat)
+        results[str(size)] = {
+            "per_call": per_call_result,
+            "bulk": bulk_result,
+            "speedup": round(per_call_result["min_ms"] / bulk_result["min_ms"], 2),
+        }
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# bench_formats.py - Size, write and parse cost of each output format
+# File: /benchmarks/bench_formats.py
+#
+# Usage: python benchmarks/bench_formats.py [--repeat 5] [--json results.json]
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ElementTree
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ezdxf
+
+from dxf_formats import FORMATS, serialize
+from dxf_render import draw_architectural_plan, templates
+
+PLANS = {
+    "small_house": ("house with 2 doors and 3 windows, bedroom and kitchen", 1.0, "house"),
+    "office": ("office with 6 doors, 20 windows, 8 rooms and a kitchen", 1.0, "office"),
+    "large_warehouse": ("warehouse with 300 doors, 500 windows and 200 rooms", 1.0, "warehouse"),
+}
+
+
+def parse(data, fmt, directory):
+    """What a consumer does with the bytes: load the DXF, or parse the preview."""
+    if fmt in ("dxf", "dxf-binary"):
+        path = os.path.join(directory, "plan.dxf")
+        with open(path, "wb") as file:
+            file.write(data)
+        ezdxf.readfile(path)
+    elif fmt == "json":
+        json.loads(data)
+    else:
+        ElementTree.fromstring(data)
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Output format benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, (prompt, scale, building_type) in PLANS.items():
+            doc = templates.new_document("architectural")
+            draw_architectural_plan(doc, prompt, scale, building_type)
+            plan = {"entities": len(doc.modelspace())}
+            for fmt in FORMATS:
+                data, write_ms = timed(lambda: serialize(doc, fmt), args.repeat)
+                _, parse_ms = timed(lambda: parse(data, fmt, directory), args.repeat)
+                plan[fmt] = {
+                    "bytes": len(data),
+                    "write_ms": round(write_ms, 3),
+                    "parse_ms": round(parse_ms, 3),
+                    "write_mb_per_s": round(len(data) / 1e6 / (write_ms / 1000), 1),
+                }
+            results[name] = plan
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(output)
+
+
+if __name__ == "__main__":
+    main()
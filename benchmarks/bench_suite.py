@@ -0,0 +1,479 @@
+# bench_suite.py - Where a generation spends its time, stage by stage
+# File: /benchmarks/bench_suite.py
+#
+# Times prompt parsing, drawing per building type and entity count,
+# serialization per format, uploads against the local Appwrite stub, HTTP
+# throughput of the Flask app and cold starts of the stdio MCP server, and
+# writes everything to one JSON report.
+# Pass an earlier report to --compare to list regressions (exit status 1).
+#
+# Usage: python benchmarks/bench_suite.py [--only parse draw serialize upload http startup]
+#            [--concurrency 1 8 32] [--url http://host:port] [--json results.json]
+#            [--compare baseline.json] [--tolerance 0.2]
+import argparse
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from bench_upload import percentiles
+from dxf_engine import GENERATOR_VERSION, render_plan_bytes
+from dxf_render import draw_architectural_plan, templates
+from dxf_formats import FORMATS, serialize
+from prompt_features import _extract_features, build_plan_spec, extract_features, normalize_prompt
+
+SECTIONS = ["parse", "draw", "serialize", "upload", "http", "startup"]
+
+PROMPTS = {
+    "short": "house with 2 doors",
+    "typical": "house with 2 doors and 3 windows, bedroom, bathroom and kitchen",
+    "long": "office building " + "with an open plan area, meeting room and kitchen " * 20 + "and 40 windows",
+}
+
+BUILDING_TYPES = ["house", "office", "warehouse"]
+
+# Entities drawn grow with the counts in the prompt
+ENTITY_COUNTS = [10, 100, 1000]
+
+
+def timed(func, repeat):
+    """Median wall time of func() in milliseconds, and its last result."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+
+def plan_prompt(building_type, count):
+    return f"{building_type} with {count} doors, {count} windows and {max(1, count // 10)} bedrooms"
+
+
+def draw_plan(prompt, building_type):
+    doc = templates.new_document("architectural")
+    draw_architectural_plan(doc, prompt, 1.0, building_type)
+    return doc
+
+
+def bench_parse(args):
+    """Feature extraction on a cold prompt and on a memoized one, plus the full plan spec."""
+    results = {}
+    for name, prompt in PROMPTS.items():
+        normalized = normalize_prompt(prompt)
+        _, cold_ms = timed(lambda: _extract_features.__wrapped__(normalized), args.repeat * 20)
+        _, memoized_ms = timed(lambda: extract_features(prompt), args.repeat * 20)
+        _, spec_ms = timed(lambda: build_plan_spec(prompt, 1.0, None), args.repeat * 20)
+        results[name] = {
+            "chars": len(prompt),
+            "cold_us": round(cold_ms * 1000, 2),
+            "memoized_us": round(memoized_ms * 1000, 2),
+            "plan_spec_us": round(spec_ms * 1000, 2),
+        }
+    return results
+
+
+def bench_draw(args):
+    """draw_architectural_plan on a template copy, per building type and entity count."""
+    results = {}
+    for building_type in BUILDING_TYPES:
+        for count in args.entities:
+            prompt = plan_prompt(building_type, count)
+            doc, draw_ms = timed(lambda: draw_plan(prompt, building_type), args.repeat)
+            entities = len(doc.modelspace())
+            results[f"{building_type}_{count}"] = {
+                "entities": entities,
+                "draw_ms": round(draw_ms, 3),
+                "entities_per_ms": round(entities / draw_ms, 1),
+            }
+    return results
+
+
+def bench_serialize(args):
+    """
+    Every output format for one plan per building type: the in-memory
+    serialize() the servers use, and doc.saveas() to disk for the DXF formats.
+    """
+    count = args.entities[len(args.entities) // 2]
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for building_type in BUILDING_TYPES:
+            doc = draw_plan(plan_prompt(building_type, count), building_type)
+            plan = {"entities": len(doc.modelspace())}
+            for fmt in FORMATS:
+                data, serialize_ms = timed(lambda: serialize(doc, fmt), args.repeat)
+                plan[fmt] = {"bytes": len(data), "serialize_ms": round(serialize_ms, 3)}
+                if fmt in ("dxf", "dxf-binary"):
+                    path = os.path.join(directory, "plan.dxf")
+                    _, saveas_ms = timed(lambda: doc.saveas(path, fmt="bin" if fmt == "dxf-binary" else "asc"), args.repeat)
+                    plan[fmt]["saveas_ms"] = round(saveas_ms, 3)
+            results[building_type] = plan
+    return results
+
+
+def bench_upload(args):
+    """
+    mcp_app.upload_to_appwrite against the local stub, with up to
+    `concurrency` uploads in flight on the event loop at a time.
+    """
+    from appwrite_stub import start_stub_server
+
+    server, endpoint = start_stub_server(latency=args.latency_ms / 1000)
+    os.environ.update({
+        "APPWRITE_ENDPOINT": endpoint,
+        "APPWRITE_PROJECT_ID": "bench",
+        "APPWRITE_API_KEY": "bench",
+        "APPWRITE_BUCKET_ID": "bench",
+    })
+    # Keep the server's job store and file history out of the real ones
+    state = tempfile.TemporaryDirectory()
+    os.environ["DXF_JOB_DB"] = os.path.join(state.name, "jobs.sqlite3")
+    os.environ["DXF_ARTIFACT_DB"] = os.path.join(state.name, "artifacts.sqlite3")
+    try:
+        import mcp_app
+    finally:
+        del os.environ["DXF_JOB_DB"], os.environ["DXF_ARTIFACT_DB"]
+
+    data = render_plan_bytes(plan_prompt("house", ENTITY_COUNTS[1]))
+
+    async def run(concurrency):
+        slots = asyncio.Semaphore(concurrency)
+        samples = []
+
+        async def upload():
+            async with slots:
+                start = time.perf_counter()
+                await mcp_app.upload_to_appwrite(data, "plan.dxf")
+                samples.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(upload() for _ in range(args.requests)))
+        return samples, time.perf_counter() - started
+
+    results = {"bytes": len(data)}
+    for concurrency in args.concurrency:
+        samples, total = asyncio.run(run(concurrency))
+        results[f"c{concurrency}"] = {
+            "latency_ms": percentiles(samples),
+            "uploads_per_s": round(len(samples) / total, 1),
+        }
+    server.shutdown()
+    state.cleanup()
+    return results
+
+
+def start_app(directory):
+    """Serve main.app from a threaded server in this process; returns (server, base URL)."""
+    from werkzeug.serving import make_server
+
+    # main keeps uploads/ and its job store relative to the working directory
+    os.chdir(directory)
+    import main
+
+    main.jobs.start()
+    server = make_server("127.0.0.1", 0, main.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def load(request, count, concurrency):
+    """
+    Send count requests from concurrency threads, each with its own
+    keep-alive session. request(session, i) returns True on success.
+    """
+    local = threading.local()
+    samples = []
+    errors = 0
+
+    def one(i):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        start = time.perf_counter()
+        ok = request(local.session, i)
+        return ok, time.perf_counter() - start
+
+    started = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as pool:
+        for ok, elapsed in pool.map(one, range(count)):
+            samples.append(elapsed)
+            errors += not ok
+    total = time.perf_counter() - started
+    return {
+        "latency_ms": percentiles(samples),
+        "req_per_s": round(count / total, 1),
+        "errors": errors,
+    }
+
+
+def bench_http(args):
+    """
+    Requests per second and latency of POST / (cached and freshly rendered),
+    /mcp (tools/list and a cached generate_dxf) and /download, per concurrency.
+    """
+    server = None
+    directory = tempfile.TemporaryDirectory()
+    # start_app changes into directory, which is deleted when this section ends
+    cwd = os.getcwd()
+    base = args.url.rstrip("/") if args.url else None
+    if base is None:
+        server, base = start_app(directory.name)
+
+    # Every run gets its own prompts so "render" requests really render
+    run_id = f"{os.getpid()}-{time.time():.0f}"
+    fresh = itertools.count()
+    cached_prompt = f"house with 2 doors and 3 windows, kitchen {run_id}"
+
+    def post_generate(prompt):
+        def request(session, i):
+            response = session.post(f"{base}/", json={"prompt": prompt(i)})
+            return response.ok and b"Archivo listo" in response.content
+        return request
+
+    def mcp(payload):
+        def request(session, i):
+            response = session.post(f"{base}/mcp", json=payload)
+            return response.ok and b'"error"' not in response.content
+        return request
+
+    def download(url, encoding):
+        def request(session, i):
+            response = session.get(f"{base}{url}", headers={"Accept-Encoding": encoding})
+            return response.ok
+        return request
+
+    # Warm up: render the cached prompt once and find its download URL
+    warmup = requests.post(f"{base}/", json={"prompt": cached_prompt})
+    events = [json.loads(line[5:]) for line in warmup.iter_lines() if line.startswith(b"data:")]
+    download_url = next(event["url"] for event in events if "url" in event)
+
+    scenarios = {
+        "post_cached": post_generate(lambda i: cached_prompt),
+        "post_render": post_generate(lambda i: f"office with {i % 40 + 1} doors #{run_id}-{next(fresh)}"),
+        "mcp_tools_list": mcp({"jsonrpc": "2.0", "id": 1, "method": "tools/list"}),
+        "mcp_generate_cached": mcp({
+            "jsonrpc": "2.0", "id": 1, "method": "tools/call",
+            "params": {"name": "generate_dxf", "arguments": {"prompt": cached_prompt}},
+        }),
+        "download": download(download_url, "identity"),
+        "download_gzip": download(download_url, "gzip"),
+    }
+
+    results = {}
+    try:
+        for name, request in scenarios.items():
+            results[name] = {}
+            for concurrency in args.concurrency:
+                results[name][f"c{concurrency}"] = load(request, args.requests, concurrency)
+    finally:
+        if server is not None:
+            import main
+
+            server.shutdown()
+            main.jobs.shutdown()
+            main.batch_renderer.shutdown()
+        os.chdir(cwd)
+        directory.cleanup()
+    return results
+
+
+def rpc(process, message):
+    """Send one JSON-RPC message to a stdio server; returns the response to it (None for notifications)."""
+    process.stdin.write(json.dumps(message).encode("utf-8") + b"\n")
+    process.stdin.flush()
+    if "id" not in message:
+        return None
+    for line in process.stdout:
+        response = json.loads(line)
+        if response.get("id") == message["id"]:
+            return response
+    raise RuntimeError(f"Server exited before answering {message['method']}")
+
+
+def bench_startup(args):
+    """
+    Cold starts of `python mcp_server.py` as Agent Zero launches it: time
+    from spawning the process until initialize and tools/list are answered,
+    and how long the first generation then takes (the render pool and
+    drawing code may still be loading), per render executor.
+    """
+    from appwrite_stub import start_stub_server
+
+    server, endpoint = start_stub_server(latency=args.latency_ms / 1000)
+    state = tempfile.TemporaryDirectory()
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mcp_server.py")
+    env = dict(
+        os.environ,
+        APPWRITE_ENDPOINT=endpoint, APPWRITE_PROJECT_ID="bench", APPWRITE_API_KEY="bench",
+        APPWRITE_BUCKET_ID="bench",
+        DXF_JOB_DB=os.path.join(state.name, "jobs.sqlite3"),
+        DXF_ARTIFACT_DB=os.path.join(state.name, "artifacts.sqlite3"),
+        # The server's cache lives in the temp directory; keep it out of the real one
+        TMPDIR=state.name,
+    )
+    run_id = f"{os.getpid()}-{time.time():.0f}"
+
+    def launch(kind, i):
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, script], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, env=dict(env, DXF_RENDER_EXECUTOR=kind),
+        )
+        try:
+            rpc(process, {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {
+                "protocolVersion": "2024-11-05", "capabilities": {},
+                "clientInfo": {"name": "bench", "version": "1.0"},
+            }})
+            initialize = time.perf_counter() - started
+            rpc(process, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+            rpc(process, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+            list_tools = time.perf_counter() - started
+            call_started = time.perf_counter()
+            response = rpc(process, {"jsonrpc": "2.0", "id": 3, "method": "tools/call", "params": {
+                "name": "generate_architectural_dxf",
+                "arguments": {"prompt": f"house with 2 doors and 3 windows #{run_id}-{kind}-{i}"},
+            }})
+            first_generation = time.perf_counter() - call_started
+            if "Successfully generated" not in response["result"]["content"][0]["text"]:
+                raise RuntimeError(response["result"]["content"][0]["text"])
+        finally:
+            process.stdin.close()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        return initialize, list_tools, first_generation
+
+    results = {}
+    try:
+        for kind in ("process", "thread"):
+            samples = [launch(kind, i) for i in range(args.repeat)]
+            initialize, list_tools, first_generation = zip(*samples)
+            results[kind] = {
+                "initialize_ms": round(statistics.median(initialize) * 1000, 1),
+                "list_tools_ms": round(statistics.median(list_tools) * 1000, 1),
+                "first_generation_ms": round(statistics.median(first_generation) * 1000, 1),
+            }
+    finally:
+        server.shutdown()
+        state.cleanup()
+    return results
+
+
+BENCHMARKS = {
+    "parse": bench_parse,
+    "draw": bench_draw,
+    "serialize": bench_serialize,
+    "upload": bench_upload,
+    "http": bench_http,
+    "startup": bench_startup,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results, prefix=""):
+    """{"a": {"b": 1}} -> {"a.b": 1}, numbers only."""
+    flat = {}
+    for name, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{name}"] = value
+    return flat
+
+
+def compare(results, baseline, tolerance):
+    """
+    Metrics that got worse than baseline by more than tolerance (a fraction).
+    Times (_ms, _us) are better lower, rates (_per_s, _per_ms) better higher.
+    """
+    current, previous = flatten(results), flatten(baseline)
+    regressions = []
+    for name, value in current.items():
+        old = previous.get(name)
+        if not old:
+            continue
+        metric = name.rsplit(".", 1)[-1]
+        if metric.endswith(("_per_s", "_per_ms")):
+            worse = value < old * (1 - tolerance)
+        elif metric.endswith(("_ms", "_us")) or name.split(".")[-2:-1] == ["latency_ms"]:
+            worse = value > old * (1 + tolerance)
+        else:
+            continue
+        if worse:
+            regressions.append({"metric": name, "baseline": old, "current": value,
+                                "change": f"{(value - old) / old:+.0%}"})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark suite")
+    parser.add_argument("--only", nargs="+", choices=SECTIONS, default=SECTIONS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--entities", type=int, nargs="+", default=ENTITY_COUNTS,
+                        help="door/window counts per plan in the draw benchmark")
+    parser.add_argument("--requests", type=int, default=200, help="requests per HTTP/upload scenario")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="simulated Appwrite latency")
+    parser.add_argument("--url", help="benchmark a running server instead of an in-process one")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    # The in-process HTTP benchmark changes the working directory
+    args.json = args.json and os.path.abspath(args.json)
+    args.compare = args.compare and os.path.abspath(args.compare)
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "commit": git_commit(),
+            "generator_version": GENERATOR_VERSION,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": {},
+    }
+    for section in args.only:
+        print(f"running {section}...", file=sys.stderr)
+        report["results"][section] = BENCHMARKS[section](args)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        report["regressions"] = compare(report["results"], baseline["results"], args.tolerance)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(output)
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# bench_templates.py - Compare ezdxf.new() setup with template document copies
+# File: /benchmarks/bench_templates.py
+#
+# Usage: python benchmarks/bench_templates.py [--iterations 200] [--json results.json]
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ezdxf
+from dxf_render import draw_architectural_plan, setup_layers, templates
+
+PROMPT = "house with 2 doors and 3 windows, bedroom and kitchen"
+
+
+def old_document():
+    doc = ezdxf.new()
+    setup_layers(doc)
+    return doc
+
+
+def new_document():
+    return templates.new_document("architectural")
+
+
+def full_request(make_document):
+    doc = make_document()
+    draw_architectural_plan(doc, PROMPT, 1.0, "house")
+    stream = io.StringIO()
+    doc.write(stream)
+
+
+def measure(func, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "p50_ms": round(samples[len(samples) // 2], 4),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Template document benchmark")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = {
+        "setup_ezdxf_new": measure(old_document, args.iterations),
+        "setup_template_copy": measure(new_document, args.iterations),
+        "request_ezdxf_new": measure(lambda: full_request(old_document), args.iterations),
+        "request_template_copy": measure(lambda: full_request(new_document), args.iterations),
+    }
+    results["setup_speedup"] = round(
+        results["setup_ezdxf_new"]["mean_ms"] / results["setup_template_copy"]["mean_ms"], 2
+    )
+    results["request_speedup"] = round(
+        results["request_ezdxf_new"]["mean_ms"] / results["request_template_copy"]["mean_ms"], 2
+    )
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# bench_upload.py - Upload latency against a local Appwrite stub
+# File: /benchmarks/bench_upload.py
+#
+# Compares one-connection-per-upload (what the Appwrite SDK does) with the
+# pooled AppwriteStorage client behind the UploadQueue, and checks that
+# chunked uploads and retries reach the stub intact.
+#
+# Usage: python benchmarks/bench_upload.py [--uploads 200] [--size 40000] [--json results.json]
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from appwrite_storage import AppwriteStorage, UploadQueue
+from appwrite_stub import start_stub_server
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {
+        f"p{p}": round(samples[min(len(samples) - 1, int(len(samples) * p / 100))] * 1000, 3)
+        for p in (50, 90, 95, 99)
+    }
+
+
+def unpooled_upload(endpoint, data):
+    # Fresh connection for every file, like the SDK's requests.request()
+    response = requests.post(
+        f"{endpoint}/storage/buckets/bench/files",
+        data={"fileId": uuid.uuid4().hex, "permissions[]": ['read("any")']},
+        files={"file": ("plan.dxf", data, "application/dxf")},
+        headers={"X-Appwrite-Project": "bench", "X-Appwrite-Key": "bench"},
+    )
+    response.raise_for_status()
+
+
+def bench_unpooled(endpoint, server, data, uploads):
+    server.state.connections = 0
+    samples = []
+    started = time.perf_counter()
+    for _ in range(uploads):
+        start = time.perf_counter()
+        unpooled_upload(endpoint, data)
+        samples.append(time.perf_counter() - start)
+    return {
+        "latency_ms": percentiles(samples),
+        "total_s": round(time.perf_counter() - started, 3),
+        "connections": server.state.connections,
+    }
+
+
+def bench_pooled(endpoint, server, data, uploads, workers):
+    server.state.connections = 0
+    storage = AppwriteStorage(endpoint, "bench", "bench", "bench", pool_size=workers)
+    upload_queue = UploadQueue(workers=workers, maxsize=workers * 4)
+    started = time.perf_counter()
+    futures = [upload_queue.submit(storage.upload, data, "plan.dxf") for _ in range(uploads)]
+    for future in futures:
+        future.result()
+    return {
+        "latency_ms": storage.latency_percentiles(),
+        "total_s": round(time.perf_counter() - started, 3),
+        "connections": server.state.connections,
+    }
+
+
+def validate(endpoint, server):
+    """Chunked uploads arrive complete and injected 503s are retried."""
+    storage = AppwriteStorage(endpoint, "bench", "bench", "bench", chunk_size=64 * 1024, backoff=0.01)
+    big = os.urandom(300 * 1024)
+    url = storage.upload(big, "big.dxf")
+    file_id = url.split("/files/")[1].split("/")[0]
+    record = server.state.files[file_id]
+    assert record["received"] == len(big) and record["chunks"] == 5, record
+
+    server.state.fail_every = 3
+    try:
+        for _ in range(10):
+            storage.upload(b"0\nEOF\n", "small.dxf")
+    finally:
+        server.state.fail_every = 0
+    return {"chunked_upload": "ok", "retries": "ok"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Appwrite upload benchmark")
+    parser.add_argument("--uploads", type=int, default=200)
+    parser.add_argument("--size", type=int, default=40000, help="bytes per upload")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="simulated server latency")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    server, endpoint = start_stub_server(latency=args.latency_ms / 1000)
+    data = os.urandom(args.size)
+
+    results = {
+        "unpooled_serial": bench_unpooled(endpoint, server, data, args.uploads),
+        "pooled_serial": bench_pooled(endpoint, server, data, args.uploads, 1),
+        "pooled_queue": bench_pooled(endpoint, server, data, args.uploads, args.workers),
+        "validation": validate(endpoint, server),
+    }
+    server.shutdown()
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(output)
+
+
+if __name__ == "__main__":
+    main()
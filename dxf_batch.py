@@ -0,0 +1,164 @@
+# dxf_batch.py - Parallel batch rendering of many plan specs
+# File: /dxf_batch.py
+import concurrent.futures
+import io
+import multiprocessing
+import os
+import threading
+import zipfile
+
+from dxf_engine import normalize_spec
+from dxf_formats import DEFAULT_FORMAT
+from dxf_metrics import record_stages, run_timed, sampled
+from dxf_profiling import profile_call
+
+
+def normalize_batch_specs(items, max_items=500, default_format=DEFAULT_FORMAT):
+    """
+    Validate a list of batch items and fill in defaults.
+    Each item needs a prompt; scale, building_type and format are optional,
+    with the same defaults as a single generation (see normalize_spec).
+    """
+    if not isinstance(items, list) or not items:
+        raise ValueError("items must be a non-empty list")
+    if len(items) > max_items:
+        raise ValueError(f"Too many items in batch: {len(items)} (max {max_items})")
+
+    specs = []
+    for index, item in enumerate(items):
+        if isinstance(item, str):
+            item = {"prompt": item}
+        if not isinstance(item, dict) or not isinstance(item.get("prompt"), str):
+            raise ValueError(f"Item {index} is missing a 'prompt' string")
+        try:
+            specs.append(normalize_spec(
+                item["prompt"], item.get("scale", 1.0), item.get("building_type"),
+                item.get("format", default_format),
+            ))
+        except ValueError as e:
+            raise ValueError(f"Item {index}: {e}") from None
+    return specs
+
+
+class BatchRenderer:
+    """
+    Fans plan specs out to a process pool. render_func must be a module-level
+    function taking (prompt, scale, building_type, format) and returning the
+    encoded drawing, so it can be pickled into the worker processes.
+
+    kind="thread" uses a thread pool instead, which starts instantly but only
+    keeps the caller unblocked rather than rendering in parallel.
+
+    initializer, also module-level, runs in every worker as it starts (e.g.
+    to import the drawing code before the first render asks for it).
+    """
+
+    def __init__(self, render_func, max_workers=None, kind="process", initializer=None):
+        if kind not in ("process", "thread"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.render_func = render_func
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.kind = kind
+        self.initializer = initializer
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+        # Submitted specs that have not finished yet, kept up to date by
+        # done callbacks so stats() never has to walk the pool
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    @property
+    def executor(self):
+        # Started on first use so importing the app does not spawn processes
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = self._start_executor()
+        return self._executor
+
+    def _start_executor(self):
+        if self.kind == "thread":
+            return concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="dxf-render",
+                initializer=self.initializer,
+            )
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=self.initializer,
+        )
+
+    def warm(self):
+        """
+        Start the pool and a first worker ahead of the first render, which
+        otherwise waits for both. Returns a Future that is done once that
+        worker has run initializer.
+        """
+        if self.initializer is None:
+            raise ValueError("warm() needs an initializer to run")
+        return self.executor.submit(self.initializer)
+
+    def submit(self, spec, profile=False):
+        """
+        Schedule one spec; returns a concurrent.futures.Future of its bytes,
+        or of (bytes, .prof file bytes) when it is rendered under cProfile.
+        """
+        args = (spec["prompt"], spec["scale"], spec["building_type"], spec.get("format", DEFAULT_FORMAT))
+        # Workers send their stage timings back with the bytes; they are
+        # recorded here, in the process whose metrics get scraped. Profiled
+        # renders are slower than usual, so their timings are left out.
+        if profile:
+            rendering = self.executor.submit(run_timed, profile_call, False, self.render_func, *args)
+        else:
+            rendering = self.executor.submit(run_timed, self.render_func, sampled(), *args)
+        with self._pending_lock:
+            self._pending += 1
+        future = concurrent.futures.Future()
+        future.add_done_callback(lambda future: future.cancelled() and rendering.cancel())
+        rendering.add_done_callback(lambda rendering: self._finished(rendering, future))
+        return future
+
+    def stats(self):
+        """Pool saturation and queue depth for health checks."""
+        pending = self._pending
+        busy = min(pending, self.max_workers)
+        return {
+            "workers": self.max_workers,
+            "busy": busy,
+            "queued": pending - busy,
+            "saturation": round(busy / self.max_workers, 4),
+        }
+
+    def _finished(self, rendering, future):
+        with self._pending_lock:
+            self._pending -= 1
+        if future.cancelled():
+            return
+        if rendering.cancelled():
+            future.cancel()
+            future.set_running_or_notify_cancel()
+        elif rendering.exception() is not None:
+            future.set_exception(rendering.exception())
+        else:
+            data, timings = rendering.result()
+            record_stages(timings)
+            future.set_result(data)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+def build_zip(files, buffer=None):
+    """
+    Pack (arcname, data) pairs into a ZIP archive. Returns the archive bytes,
+    or writes into buffer (any writable binary file) when one is given.
+    """
+    target = buffer if buffer is not None else io.BytesIO()
+    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for arcname, data in files:
+            archive.writestr(arcname, data)
+    return buffer if buffer is not None else target.getvalue()
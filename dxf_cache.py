@@ -0,0 +1,379 @@
+# dxf_cache.py - Content-addressed cache for rendered DXF drawings
+# File: /dxf_cache.py
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+
+from dxf_compression import ENCODING_SUFFIXES, compress, decompress
+
+INDEX_FILENAME = "index.sqlite3"
+
+# Cache keys are hex digests; artifacts named "<key>_..." or "<key>.ext" belong to the cache
+KEYED_FILENAME = re.compile(r"([0-9a-f]{32})[_.]")
+
+# Files kept next to an artifact under its filename plus one of these
+# suffixes (render profiles); evicted together with it
+SIDECAR_SUFFIXES = (".prof",)
+
+# A hit only rewrites last_access when the stored value is older than this,
+# so hot entries do not turn every lookup into a write
+TOUCH_INTERVAL = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    key TEXT PRIMARY KEY,
+    filename TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    url TEXT,
+    encoding TEXT
+);
+CREATE INDEX IF NOT EXISTS artifacts_last_access ON artifacts (last_access);
+CREATE INDEX IF NOT EXISTS artifacts_created ON artifacts (created);
+
+-- Running totals, so quota checks and health stats never scan the table
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals VALUES (0, 0, 0);
+CREATE TRIGGER IF NOT EXISTS artifacts_insert AFTER INSERT ON artifacts BEGIN
+    UPDATE totals SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS artifacts_delete AFTER DELETE ON artifacts BEGIN
+    UPDATE totals SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS artifacts_resize AFTER UPDATE OF size ON artifacts BEGIN
+    UPDATE totals SET bytes = bytes - OLD.size + NEW.size WHERE id = 0;
+END;
+"""
+
+ENTRY_COLUMNS = "key, filename, path, size, created, url, encoding"
+
+
+def cache_key(generator_version, **inputs):
+    """
+    Build a content-addressed key from the generator inputs.
+    The prompt is kept verbatim because it is drawn into the plan title,
+    so only inputs that cannot change the output are normalized.
+    """
+    normalized = {"generator": generator_version}
+    for name, value in inputs.items():
+        if name == "scale":
+            value = float(value)
+        elif name == "building_type":
+            value = str(value).strip().lower()
+        normalized[name] = value
+
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def shard_path(key, filename):
+    """Relative path of an artifact: two levels of subdirectories from its key."""
+    return os.path.join(key[:2], key[2:4], filename)
+
+
+class CacheEntry:
+    """
+    A rendered drawing stored on disk, plus where clients can fetch it.
+    With an encoding, path holds the compressed representation of filename.
+    """
+
+    __slots__ = ("key", "filename", "path", "size", "created", "url", "encoding")
+
+    def __init__(self, key, filename, path, size, created, url=None, encoding=None):
+        self.key = key
+        self.filename = filename
+        self.path = path
+        self.size = size
+        self.created = created
+        self.url = url
+        self.encoding = encoding
+
+
+class DXFCache:
+    """
+    Stores rendered DXF bytes on disk, sharded into subdirectories by key,
+    with a SQLite index (WAL mode) shared by every process using the directory.
+    A background sweeper evicts entries older than max_age seconds, then the
+    least recently used ones while the cache holds more than max_entries
+    files or max_bytes in total.
+    """
+
+    def __init__(self, directory, max_entries=512, max_bytes=256 * 1024 * 1024, max_age=24 * 3600,
+                 sweep_interval=60):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+
+        # Per-process counters; the index itself is shared
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._local = threading.local()
+        self._sweeper_pid = None
+        self._sweeper_lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, INDEX_FILENAME)
+        self._db().executescript(SCHEMA)
+        self._adopt_flat_files()
+
+    def get(self, key):
+        """Return the CacheEntry for key, or None on a miss."""
+        self._ensure_sweeper()
+        entry = self._lookup("key", key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def lookup(self, filename):
+        """The CacheEntry stored under filename, or None. Not counted as a hit or miss."""
+        self._ensure_sweeper()
+        return self._lookup("filename", filename)
+
+    def entries(self, limit=100, offset=0):
+        """Most recently created entries first, straight from the index."""
+        rows = self._db().execute(
+            f"SELECT {ENTRY_COLUMNS} FROM artifacts ORDER BY created DESC LIMIT ? OFFSET ?",
+            (limit, offset),
+        ).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def put(self, key, filename, data, url=None, encoding=None):
+        """
+        Write data (bytes or a readable binary file) to disk under filename
+        and index it under key. With an encoding ("gzip" or "br") only the
+        compressed file is kept, e.g. filename + ".gz".
+        """
+        self._ensure_sweeper()
+        relative_path = shard_path(key, filename)
+        if encoding is not None:
+            if hasattr(data, "read"):
+                data = data.read()
+            data = compress(data, encoding)
+            relative_path += ENCODING_SUFFIXES[encoding]
+
+        path = os.path.join(self.directory, relative_path)
+        size = self._write(path, data)
+
+        now = time.time()
+        db = self._db()
+        with db:
+            previous = db.execute("SELECT path FROM artifacts WHERE key = ?", (key,)).fetchone()
+            db.execute(
+                "INSERT INTO artifacts (key, filename, path, size, created, last_access, url, encoding)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET filename = excluded.filename, path = excluded.path,"
+                " size = excluded.size, created = excluded.created, last_access = excluded.last_access,"
+                " url = excluded.url, encoding = excluded.encoding",
+                (key, filename, relative_path, size, now, now, url, encoding),
+            )
+        if previous is not None and previous[0] != relative_path:
+            # A stale other representation of the same entry
+            self._unlink(previous[0])
+        return CacheEntry(key, filename, path, size, now, url, encoding)
+
+    def sidecar_path(self, entry, suffix):
+        """Where a file belonging to entry (e.g. its render profile) is kept: right next to it."""
+        if suffix not in SIDECAR_SUFFIXES:
+            raise ValueError(f"Unknown sidecar suffix: {suffix}")
+        return os.path.join(os.path.dirname(entry.path), entry.filename + suffix)
+
+    def put_sidecar(self, entry, suffix, data):
+        """Store data next to entry; it is evicted together with the entry."""
+        path = self.sidecar_path(entry, suffix)
+        self._write(path, data)
+        return path
+
+    def read(self, entry):
+        """The original (uncompressed) bytes of an entry."""
+        with open(entry.path, "rb") as file:
+            data = file.read()
+        return decompress(data, entry.encoding) if entry.encoding else data
+
+    def stats(self):
+        """Counters for health checks and logging."""
+        entries, total_bytes = self._db().execute("SELECT entries, bytes FROM totals").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def sweep(self):
+        """
+        Evict expired entries, then least recently used ones until the cache
+        is within its quotas. Returns the number of entries evicted.
+        """
+        db = self._db()
+        evicted = []
+        if self.max_age is not None:
+            with db:
+                evicted += db.execute(
+                    "DELETE FROM artifacts WHERE created < ? RETURNING path",
+                    (time.time() - self.max_age,),
+                ).fetchall()
+
+        entries, total_bytes = db.execute("SELECT entries, bytes FROM totals").fetchone()
+        if entries > self.max_entries or total_bytes > self.max_bytes:
+            victims = []
+            for key, path, size in db.execute(
+                "SELECT key, path, size FROM artifacts ORDER BY last_access"
+            ):
+                if entries <= self.max_entries and total_bytes <= self.max_bytes:
+                    break
+                victims.append((key,))
+                evicted.append((path,))
+                entries -= 1
+                total_bytes -= size
+            with db:
+                db.executemany("DELETE FROM artifacts WHERE key = ?", victims)
+
+        for (path,) in evicted:
+            self._unlink(path)
+            self._unlink_sidecars(path)
+        self.evictions += len(evicted)
+        return len(evicted)
+
+    def _lookup(self, column, value):
+        row = self._db().execute(
+            f"SELECT {ENTRY_COLUMNS}, last_access FROM artifacts WHERE {column} = ?", (value,)
+        ).fetchone()
+        if row is None:
+            return None
+        entry = self._entry(row[:-1])
+        if self._is_expired(entry):
+            # The sweeper removes it
+            return None
+        if not os.path.exists(entry.path):
+            # Removed behind our back; drop the row so the totals stay true.
+            # Matching created leaves alone a row a concurrent put() just rewrote.
+            with self._db() as db:
+                removed = db.execute(
+                    "DELETE FROM artifacts WHERE key = ? AND created = ?", (entry.key, entry.created)
+                ).rowcount
+            if removed:
+                self._unlink_sidecars(os.path.relpath(entry.path, self.directory))
+            return None
+
+        now = time.time()
+        if now - row[-1] > TOUCH_INTERVAL:
+            with self._db() as db:
+                db.execute("UPDATE artifacts SET last_access = ? WHERE key = ?", (now, entry.key))
+        return entry
+
+    def _entry(self, row):
+        key, filename, relative_path, size, created, url, encoding = row
+        return CacheEntry(key, filename, os.path.join(self.directory, relative_path),
+                          size, created, url, encoding)
+
+    def _is_expired(self, entry):
+        return self.max_age is not None and time.time() - entry.created > self.max_age
+
+    def _write(self, path, data):
+        """Write bytes or a readable binary file to path atomically; returns the size."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            if hasattr(data, "read"):
+                shutil.copyfileobj(data, file)
+            else:
+                file.write(data)
+            size = file.tell()
+        os.replace(temp_path, path)
+        return size
+
+    def _unlink_sidecars(self, relative_path):
+        # Sidecars are named after the uncompressed filename
+        for suffix in ENCODING_SUFFIXES.values():
+            if relative_path.endswith(suffix):
+                relative_path = relative_path[:-len(suffix)]
+        for suffix in SIDECAR_SUFFIXES:
+            self._unlink(relative_path + suffix)
+
+    def _unlink(self, relative_path):
+        try:
+            os.unlink(os.path.join(self.directory, relative_path))
+        except FileNotFoundError:
+            pass
+
+    def _db(self):
+        # One connection per thread, and never one inherited across fork()
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            db = sqlite3.connect(self.index_path, timeout=30)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            local.db = db
+            local.pid = os.getpid()
+        return local.db
+
+    def _ensure_sweeper(self):
+        # Started on first use in each process: a thread started before a
+        # fork (e.g. gunicorn preload_app) does not exist in the workers
+        if self._sweeper_pid == os.getpid() or not self.sweep_interval:
+            return
+        with self._sweeper_lock:
+            if self._sweeper_pid != os.getpid():
+                self._sweeper_pid = os.getpid()
+                threading.Thread(target=self._sweep_forever, name="dxf-cache-sweeper", daemon=True).start()
+
+    def _sweep_forever(self):
+        while True:
+            try:
+                self.sweep()
+            except sqlite3.Error as e:
+                print(f"Cache sweep failed: {e}")
+            time.sleep(self.sweep_interval)
+
+    def _adopt_flat_files(self):
+        """
+        Move cache files left in the top-level directory by the old flat
+        layout into their shard and index them, so they are found and
+        eventually evicted like everything else.
+        """
+        db = self._db()
+        for name in os.listdir(self.directory):
+            match = KEYED_FILENAME.match(name)
+            path = os.path.join(self.directory, name)
+            if match is None or not os.path.isfile(path):
+                continue
+            filename, encoding = name, None
+            for candidate, suffix in ENCODING_SUFFIXES.items():
+                if name.endswith(suffix):
+                    filename, encoding = name[:-len(suffix)], candidate
+            key = match.group(1)
+            relative_path = shard_path(key, name)
+            target = os.path.join(self.directory, relative_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.replace(path, target)
+            except FileNotFoundError:
+                # Another process adopted it first
+                continue
+            stat = os.stat(target)
+            with db:
+                db.execute(
+                    "INSERT OR IGNORE INTO artifacts (key, filename, path, size, created, last_access, encoding)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, filename, relative_path, stat.st_size, stat.st_mtime, stat.st_mtime, encoding),
+                )
@@ -0,0 +1,55 @@
+# dxf_compression.py - Content encodings for DXF downloads and compressed storage
+# File: /dxf_compression.py
+import gzip
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+# File suffix of a stored representation per content encoding
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+GZIP_LEVEL = int(os.environ.get("DXF_GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("DXF_BROTLI_QUALITY", 5))
+
+# Bodies smaller than this are not worth a compression round trip
+MIN_COMPRESS_SIZE = 1024
+
+
+def available_encodings():
+    """Encodings this process can produce, preferred first."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def compress(data, encoding, level=None):
+    """Compress bytes with the given content encoding."""
+    if encoding == "gzip":
+        # mtime=0 keeps the output byte-identical for identical input
+        return gzip.compress(data, compresslevel=GZIP_LEVEL if level is None else level, mtime=0)
+    if encoding == "br":
+        if brotli is None:
+            raise ValueError("brotli is not installed")
+        return brotli.compress(data, quality=BROTLI_QUALITY if level is None else level)
+    raise ValueError(f"Unknown content encoding: {encoding}")
+
+
+def decompress(data, encoding):
+    """Inverse of compress()."""
+    if encoding == "gzip":
+        return zlib.decompress(data, wbits=31)
+    if encoding == "br":
+        if brotli is None:
+            raise ValueError("brotli is not installed")
+        return brotli.decompress(data)
+    raise ValueError(f"Unknown content encoding: {encoding}")
+
+
+def store_encoding_from_env():
+    """Encoding to store artifacts with (DXF_STORE_COMPRESSED), or None for plain files."""
+    encoding = os.environ.get("DXF_STORE_COMPRESSED", "").strip().lower() or None
+    if encoding is not None and encoding not in available_encodings():
+        raise ValueError(f"DXF_STORE_COMPRESSED must be one of {available_encodings()}, got {encoding!r}")
+    return encoding
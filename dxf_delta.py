@@ -0,0 +1,150 @@
+# dxf_delta.py - Redrawing a plan after an edit by changing only the entities that differ
+# File: /dxf_delta.py
+import io
+import pickle
+
+from ezdxf.entitydb import EntitySpace
+from ezdxf.lldxf.tagwriter import TagWriter
+
+from dxf_emitter import BulkEmitter
+from dxf_formats import serialize
+from dxf_metrics import stage_timer
+from dxf_render import BATCH_EMITTERS, plan_batches, templates
+from plan_layout import layout_plan
+from prompt_features import build_plan_spec
+
+
+class CachedEntitySpace(EntitySpace):
+    """
+    Modelspace entity storage that keeps the ASCII DXF text of every entity
+    once it has been written, so writing the document again only serializes
+    entities added since. Entities must not change after they are written;
+    plans only ever add and delete them.
+    """
+
+    def __init__(self, entities=None):
+        super().__init__(entities)
+        self.chunks = {}
+
+    def export_dxf(self, tagwriter):
+        # Binary DXF and the other tag writers go the usual way
+        if type(tagwriter) is not TagWriter:
+            super().export_dxf(tagwriter)
+            return
+        chunks = self.chunks
+        for entity in self:
+            handle = entity.dxf.handle
+            text = chunks.get(handle)
+            if text is None:
+                stream = io.StringIO()
+                entity.export_dxf(TagWriter(stream, tagwriter.dxfversion, tagwriter.write_handles))
+                text = chunks[handle] = stream.getvalue()
+            tagwriter.write_str(text)
+
+    def discard(self, handle):
+        self.chunks.pop(handle, None)
+
+    def __getstate__(self):
+        # Pickled copies start without the text; PlanState.copy shares it instead
+        return dict(self.__dict__, chunks={})
+
+
+class PlanState:
+    """
+    A plan's drawing kept for editing: the document and, for every batch of
+    plan_batches, which entities draw which rows. update() compares a new
+    spec's rows with these and only deletes and emits the difference, so
+    adding a window touches the openings on one wall, not the whole plan.
+    A held state is edited through copy(), so it can be edited again.
+    """
+
+    def __init__(self, doc=None, rows=None):
+        if doc is None:
+            with stage_timer("document"):
+                doc = templates.new_document("architectural")
+            msp = doc.modelspace()
+            msp.block_record.entity_space = msp.entity_space = CachedEntitySpace(msp.entity_space.entities)
+        self.doc = doc
+        self.space = doc.modelspace().entity_space
+        # (batch name, style) -> {row: [entity handles]}
+        self.rows = rows if rows is not None else {}
+        # Pickled document, kept from the first copy() until the drawing changes
+        self.snapshot = None
+
+    def copy(self):
+        """
+        A copy to edit, leaving this drawing as it is. Handles survive the
+        copy, so the rows and the written entity text carry over as they are.
+        """
+        with stage_timer("document"):
+            if self.snapshot is None:
+                self.snapshot = pickle.dumps(self.doc, pickle.HIGHEST_PROTOCOL)
+            doc = pickle.loads(self.snapshot)
+        rows = {key: {row: list(handles) for row, handles in kept.items()} for key, kept in self.rows.items()}
+        state = PlanState(doc, rows)
+        # Entity text is never changed, only added and dropped, so sharing the strings is safe
+        state.space.chunks = dict(self.space.chunks)
+        return state
+
+    def update(self, spec):
+        """
+        Bring the drawing in line with spec. Returns (entities added,
+        entities deleted, entities in the plan).
+        """
+        self.snapshot = None
+        with stage_timer("analysis"):
+            plan = build_plan_spec(spec["prompt"], spec["scale"], spec["building_type"])
+            layout = layout_plan(plan)
+            batches = plan_batches(plan, layout, spec["prompt"], spec["scale"])
+
+        with stage_timer("emit"):
+            msp = self.doc.modelspace()
+            emit = BulkEmitter(msp)
+            previous, self.rows = self.rows, {}
+            added = total = 0
+            for key, rows in batches.items():
+                old = previous.pop(key, {})
+                kept = self.rows[key] = {}
+                missing = []
+                for row in batch_rows(rows):
+                    handles = old.get(row)
+                    if handles:
+                        kept.setdefault(row, []).append(handles.pop())
+                    else:
+                        missing.append(row)
+                    total += 1
+                # Rows nobody claimed stay behind in old and are deleted below
+                previous[key] = old
+                if missing:
+                    first = len(self.space)
+                    BATCH_EMITTERS[key[0]](msp, emit, missing, *key[1])
+                    for row, entity in zip(missing, self.space[first:]):
+                        kept.setdefault(row, []).append(entity.dxf.handle)
+                    added += len(missing)
+
+            deleted = self.delete(handle for old in previous.values() for handles in old.values()
+                                  for handle in handles)
+        return added, deleted, total
+
+    def delete(self, handles):
+        entitydb = self.doc.entitydb
+        count = 0
+        for handle in handles:
+            entitydb.delete_entity(entitydb[handle])
+            self.space.discard(handle)
+            count += 1
+        if count:
+            # One pass over the modelspace instead of a list.remove() per entity
+            self.space.purge()
+        return count
+
+    def serialize(self, fmt):
+        with stage_timer("serialize"):
+            return serialize(self.doc, fmt)
+
+
+def batch_rows(rows):
+    """Rows of a batch as hashable tuples."""
+    if hasattr(rows, "tolist"):
+        return [tuple(row) for row in rows.tolist()]
+    return rows
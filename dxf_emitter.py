@@ -0,0 +1,140 @@
+# dxf_emitter.py - Bulk emission of DXF entities from coordinate arrays
+# File: /dxf_emitter.py
+import gc
+from contextlib import contextmanager
+
+import numpy as np
+from ezdxf.entities import Arc, Line, LWPolyline, Text
+from ezdxf.math import Vec3
+
+# Namespace entries that belong to one entity and never to a shared style
+PER_ENTITY_KEYS = {"handle", "owner", "_entity"}
+
+
+@contextmanager
+def paused_gc():
+    """
+    Hold off cyclic garbage collection while a batch is built. Every entity
+    references its namespace and back, so large batches otherwise trigger
+    repeated full collections over objects that are all still alive.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+class BulkEmitter:
+    """
+    Appends many entities of one kind to a layout in a tight loop.
+
+    msp.add_line() and friends copy a fresh dxfattribs dict, validate every
+    attribute and walk the generic layout code for each entity. Here the
+    shared attributes (layer, lineweight, text height, alignment) are
+    validated once on a prototype entity and copied into each new entity's
+    namespace, and the geometry comes straight from NumPy arrays. The
+    entities end up exactly as the per-call path would create them.
+    """
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.doc = layout.doc
+        self._styles = {}
+
+        block_record = layout.block_record
+        self._owner = block_record.dxf.handle
+        self._paperspace = int(block_record.is_any_paperspace)
+        self._entity_space = block_record.entity_space
+        self._add_to_db = self.doc.entitydb.add
+
+    def style(self, cls, dxfattribs, align=None):
+        """Validated attributes shared by every entity of cls with dxfattribs."""
+        key = (cls, tuple(sorted(dxfattribs.items())), align)
+        shared = self._styles.get(key)
+        if shared is None:
+            prototype = cls.new(dxfattribs=dxfattribs)
+            if align is not None:
+                prototype.set_align_enum(align)
+            shared = {
+                name: value for name, value in prototype.dxf.__dict__.items()
+                if name not in PER_ENTITY_KEYS
+            }
+            if self._paperspace:
+                shared["paperspace"] = self._paperspace
+            self._styles[key] = shared
+        return shared
+
+    def lines(self, segments, **dxfattribs):
+        """Add a LINE per row of segments, (n, 4) as x1, y1, x2, y2."""
+        shared = self.style(Line, dxfattribs)
+        rows = np.asarray(segments, dtype=float).reshape(-1, 4).tolist()
+        with paused_gc():
+            for x1, y1, x2, y2 in rows:
+                self._append(Line(), shared, {"start": Vec3(x1, y1), "end": Vec3(x2, y2)})
+        return len(rows)
+
+    def arcs(self, centers, radii, angles, **dxfattribs):
+        """Add an ARC per center (n, 2), radius (n,) and start/end angle pair (n, 2)."""
+        shared = self.style(Arc, dxfattribs)
+        rows = zip(
+            np.asarray(centers, dtype=float).reshape(-1, 2).tolist(),
+            np.asarray(radii, dtype=float).ravel().tolist(),
+            np.asarray(angles, dtype=float).reshape(-1, 2).tolist(),
+        )
+        count = 0
+        with paused_gc():
+            for (x, y), radius, (start, end) in rows:
+                self._append(Arc(), shared, {
+                    "center": Vec3(x, y),
+                    "radius": radius,
+                    "start_angle": start,
+                    "end_angle": end,
+                })
+                count += 1
+        return count
+
+    def polylines(self, points, close=False, **dxfattribs):
+        """Add an LWPOLYLINE per (k, 2) vertex list in points, shaped (n, k, 2)."""
+        points = np.asarray(points, dtype=float)
+        if not points.size:
+            return 0
+        if close:
+            dxfattribs = {**dxfattribs, "flags": 1}
+        shared = self.style(LWPolyline, dxfattribs)
+
+        # LWPOLYLINE keeps x, y, start width, end width and bulge per vertex
+        vertices = np.zeros(points.shape[:2] + (5,))
+        vertices[..., :2] = points
+        with paused_gc():
+            for polyline in vertices:
+                entity = LWPolyline()
+                entity.lwpoints.values = polyline
+                self._append(entity, shared, None)
+        return len(vertices)
+
+    def texts(self, labels, positions, align=None, **dxfattribs):
+        """Add a TEXT per label, placed at the matching (n, 2) position."""
+        shared = self.style(Text, dxfattribs, align)
+        count = 0
+        with paused_gc():
+            for label, (x, y) in zip(labels, np.asarray(positions, dtype=float).reshape(-1, 2).tolist()):
+                point = Vec3(x, y)
+                entity = Text()
+                self._append(entity, shared, {"insert": point, "align_point": point})
+                # Label content is the only attribute still worth validating
+                entity.dxf.text = label
+                count += 1
+        return count
+
+    def _append(self, entity, shared, geometry):
+        entity.doc = self.doc
+        namespace = entity.dxf.__dict__
+        namespace.update(shared)
+        if geometry:
+            namespace.update(geometry)
+        self._add_to_db(entity)
+        namespace["owner"] = self._owner
+        self._entity_space.add(entity)
@@ -0,0 +1,402 @@
+# dxf_engine.py - Plan generation shared by the HTTP app and the MCP server
+# File: /dxf_engine.py
+import concurrent.futures
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from dxf_cache import cache_key
+from dxf_formats import DEFAULT_FORMAT, FORMATS, normalize_format
+from dxf_metrics import BYTES_WRITTEN, GENERATIONS, stage_timer
+from dxf_profiling import PROFILE_SUFFIX, should_profile
+from prompt_features import MAX_FEATURE_COUNT, ROOM_WORDS, describe_plan, extract_features
+
+# Bump whenever dxf_render's drawing output changes so stale cache entries are ignored
+GENERATOR_VERSION = "2.0"
+
+# Anything but ASCII letters, digits, "_" and "-" becomes "_" in file names
+UNSAFE_FILENAME_CHARS = re.compile(r"[^A-Za-z0-9_-]+")
+
+# Batch ZIPs above this size are spooled to a temporary file instead of memory
+SPOOL_THRESHOLD = int(os.environ.get("DXF_SPOOL_THRESHOLD", 8 * 1024 * 1024))
+
+# Finished batch renders stored (written and published) at once, so uploads overlap
+BATCH_STORE_THREADS = 4
+
+
+def normalize_spec(prompt, scale=1.0, building_type=None, fmt=None):
+    """
+    Validate generation inputs into a plan spec, the dict every render,
+    cache key and job is built from. Without an explicit building_type the
+    one mentioned in the prompt is used, else "house".
+    """
+    with stage_timer("parse"):
+        return _normalize_spec(prompt, scale, building_type, fmt)
+
+
+def _normalize_spec(prompt, scale, building_type, fmt):
+    if not isinstance(prompt, str) or not prompt.strip():
+        raise ValueError("prompt must be a non-empty string")
+    try:
+        scale = float(scale)
+    except (TypeError, ValueError):
+        raise ValueError(f"scale must be a number, got {scale!r}") from None
+    if not scale > 0:
+        raise ValueError(f"scale must be positive, got {scale}")
+    if building_type:
+        building_type = str(building_type).strip().lower()
+    else:
+        building_type = extract_features(prompt).building_type or "house"
+    return {"prompt": prompt, "scale": scale, "building_type": building_type, "format": normalize_format(fmt)}
+
+
+def spec_key(spec):
+    """Cache key of a plan spec; also how identical in-flight generations are recognized."""
+    return cache_key(
+        GENERATOR_VERSION, prompt=spec["prompt"], scale=spec["scale"],
+        building_type=spec["building_type"], format=spec["format"],
+    )
+
+
+def edit_spec(spec, add_doors=0, remove_doors=0, add_windows=0, remove_windows=0,
+              add_rooms=(), remove_rooms=(), scale=None):
+    """
+    The spec of spec's plan with openings or rooms added or removed, or
+    redrawn at another scale. Its prompt is rewritten to describe the
+    result (see describe_plan); ValueError if an edit is impossible.
+    """
+    features = extract_features(spec["prompt"])
+    doors = features.doors + edit_count(add_doors, "add_doors") - edit_count(remove_doors, "remove_doors")
+    windows = features.windows + edit_count(add_windows, "add_windows") - edit_count(remove_windows, "remove_windows")
+    for name, count in (("doors", doors), ("windows", windows)):
+        if not 0 <= count <= MAX_FEATURE_COUNT:
+            raise ValueError(f"The plan would have {count} {name} (0 to {MAX_FEATURE_COUNT} allowed)")
+
+    rooms = list(features.rooms)
+    for room in map(room_word, remove_rooms or ()):
+        if room not in rooms:
+            raise ValueError(f"The plan has no {room} to remove")
+        # The last one goes, so the rooms before it keep their place
+        del rooms[len(rooms) - 1 - rooms[::-1].index(room)]
+    rooms.extend(map(room_word, add_rooms or ()))
+    if len(rooms) > MAX_FEATURE_COUNT:
+        raise ValueError(f"The plan would have {len(rooms)} rooms (0 to {MAX_FEATURE_COUNT} allowed)")
+
+    prompt = describe_plan(spec["building_type"], doors, windows, rooms)
+    return normalize_spec(prompt, spec["scale"] if scale is None else scale, spec["building_type"], spec["format"])
+
+
+def edit_count(value, name):
+    try:
+        count = int(value or 0)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a whole number, got {value!r}") from None
+    if count < 0:
+        raise ValueError(f"{name} must not be negative, got {count}")
+    return count
+
+
+def room_word(name):
+    """A room kind as prompts name it: "Bedrooms" -> "bedroom"."""
+    word = " ".join(str(name).lower().split())
+    if word not in ROOM_WORDS and word.endswith("s"):
+        word = word[:-1]
+    if word not in ROOM_WORDS:
+        raise ValueError(f"Unknown room: {name!r} (expected one of {', '.join(sorted(ROOM_WORDS))})")
+    return word
+
+
+def plan_filename(prompt, fmt=DEFAULT_FORMAT):
+    """Download name for a plan: the prompt, made safe for paths, URLs and headers."""
+    name = UNSAFE_FILENAME_CHARS.sub("_", prompt).strip("_")[:50] or "plan"
+    return name + FORMATS[fmt].extension
+
+
+def render_plan_bytes(prompt, scale=1.0, building_type="house", fmt=DEFAULT_FORMAT):
+    """
+    Render one plan to bytes in the given output format (ASCII DXF by
+    default). Module-level so batch worker processes can run it too.
+    """
+    # The drawing code is imported by the first render, not when a server starts
+    from dxf_render import render_plan_bytes as render
+    return render(prompt, scale, building_type, fmt)
+
+
+def render_spec(spec):
+    """render_plan_bytes for a plan spec, in the calling thread."""
+    return render_plan_bytes(spec["prompt"], spec["scale"], spec["building_type"], spec["format"])
+
+
+def load_renderer():
+    """
+    Import the drawing code (dxf_render, with ezdxf) ahead of the first
+    render. Render pools run it in each worker as it starts.
+    """
+    import dxf_render  # noqa: F401
+
+
+class Artifact:
+    """
+    A generated plan: where it is stored and published, and how it was made.
+    filename is the content-addressed stored name, name the human-readable one.
+    profiled is set when its render profile was stored next to it, changes
+    to (entities added, removed, total) when it was made by an edit.
+    """
+
+    __slots__ = ("key", "filename", "name", "url", "size", "cached", "generation_ms", "entry", "profiled",
+                 "changes")
+
+    def __init__(self, key, filename, name, url, size, cached, generation_ms=None, entry=None):
+        self.key = key
+        self.filename = filename
+        self.name = name
+        self.url = url
+        self.size = size
+        self.cached = cached
+        self.generation_ms = generation_ms
+        self.entry = entry
+        self.profiled = False
+        self.changes = None
+
+
+class GenerationEngine:
+    """
+    Spec in, artifact out, the same way for every front end: plans are
+    rendered in a BatchRenderer pool, published, and cached by content so
+    identical specs are only ever rendered once.
+
+    publish(filename, data) makes freshly rendered bytes reachable and
+    returns their URL: an Appwrite upload for the MCP server, a download
+    route on the HTTP app (where the cache directory is what gets served).
+
+    The drawings of the max_plans most recently edited plans (before and
+    after each edit) stay in memory so that the next edit of each only
+    redraws what changed (see edit).
+    """
+
+    def __init__(self, cache, renderer, publish, store_encoding=None, max_plans=16):
+        self.cache = cache
+        self.renderer = renderer
+        self.publish = publish
+        self.store_encoding = store_encoding
+        self.max_plans = max_plans
+        self._plans = OrderedDict()
+        self._plans_lock = threading.Lock()
+
+    def filename(self, spec):
+        """Content-addressed name a spec's artifact is stored and published under."""
+        return f"{spec_key(spec)}_{plan_filename(spec['prompt'], spec['format'])}"
+
+    def lookup(self, spec):
+        """The cached, published artifact for spec, or None."""
+        key = spec_key(spec)
+        entry = self.cache.get(key)
+        if entry is None or entry.url is None:
+            return None
+        GENERATIONS.inc(result="cached")
+        return Artifact(key, entry.filename, plan_filename(spec["prompt"], spec["format"]),
+                        entry.url, entry.size, cached=True, entry=entry)
+
+    def read(self, artifact):
+        """The bytes of a cached artifact."""
+        return self.cache.read(artifact.entry)
+
+    def submit(self, spec, profile=False):
+        """
+        Render spec in the pool; returns a concurrent.futures.Future of its
+        bytes, or of (bytes, profile) with profile=True.
+        """
+        return self.renderer.submit(spec, profile)
+
+    def profile_path(self, artifact_filename):
+        """The stored render profile of an artifact, or None."""
+        entry = self.cache.lookup(artifact_filename)
+        if entry is None:
+            return None
+        path = self.cache.sidecar_path(entry, PROFILE_SUFFIX)
+        return path if os.path.exists(path) else None
+
+    def store(self, spec, data, generation_ms=None, url=None):
+        """Publish rendered bytes (unless their url is already known) and cache them."""
+        key = spec_key(spec)
+        filename = self.filename(spec)
+        if url is None:
+            with stage_timer("publish"):
+                url = self.publish(filename, data)
+        with stage_timer("write"):
+            entry = self.cache.put(key, filename, data, url=url, encoding=self.store_encoding)
+        BYTES_WRITTEN.inc(len(data), format=spec["format"])
+        GENERATIONS.inc(result="rendered")
+        return Artifact(key, filename, plan_filename(spec["prompt"], spec["format"]),
+                        url, len(data), cached=False, generation_ms=generation_ms, entry=entry)
+
+    def generate(self, spec, report=None, profile=False):
+        """
+        Return the artifact for spec, rendering and publishing it on a cache
+        miss. Blocks the calling thread; report(stage) is told what it waits on.
+
+        With profile=True the plan is rendered under cProfile even when it is
+        cached, and the profile is stored next to the artifact (see
+        profile_path). DXF_PROFILE_SAMPLE_RATE profiles some misses unasked.
+        """
+        if not profile:
+            artifact = self.lookup(spec)
+            if artifact is not None:
+                return artifact
+            profile = should_profile()
+
+        if report is not None:
+            report("rendering")
+        start = time.perf_counter()
+        try:
+            data = self.submit(spec, profile).result()
+        except Exception:
+            GENERATIONS.inc(result="failed")
+            raise
+        generation_ms = (time.perf_counter() - start) * 1000
+        if profile:
+            data, stats = data
+
+        if report is not None:
+            report("publishing")
+        artifact = self.store(spec, data, generation_ms)
+        if profile:
+            self.cache.put_sidecar(artifact.entry, PROFILE_SUFFIX, stats)
+            artifact.profiled = True
+        return artifact
+
+    def generate_batch(self, specs, report=None):
+        """
+        Generate many specs and pack them into one ZIP. Each distinct spec is
+        looked up, or rendered in the pool and stored, once. Blocks the
+        calling thread; report(index, outcome) is called in it as each item
+        finishes (cached ones first), outcome being the item's Artifact or
+        the exception that failed it.
+
+        Returns (outcomes, archive), archive being the published Artifact of
+        the ZIP, itself cached by the keys of the items it holds.
+        """
+        outcomes = [None] * len(specs)
+        keys = [spec_key(spec) for spec in specs]
+
+        def finish(indices, outcome):
+            for index in indices:
+                outcomes[index] = outcome
+                if report is not None:
+                    report(index, outcome)
+
+        # Cache key -> indices of the items that need it rendered
+        missing = {}
+        for index, (spec, key) in enumerate(zip(specs, keys)):
+            if key in missing:
+                missing[key].append(index)
+                continue
+            artifact = self.lookup(spec)
+            if artifact is not None and os.path.exists(artifact.entry.path):
+                finish([index], artifact)
+            else:
+                missing[key] = [index]
+
+        def produce(spec, rendering, start):
+            try:
+                data = rendering.result()
+            except Exception:
+                GENERATIONS.inc(result="failed")
+                raise
+            return self.store(spec, data, (time.perf_counter() - start) * 1000)
+
+        with concurrent.futures.ThreadPoolExecutor(BATCH_STORE_THREADS, thread_name_prefix="dxf-store") as storing:
+            # Everything goes to the pool at once; the store threads take the
+            # renders in the order they were submitted, which is roughly the
+            # order the pool finishes them
+            producing = {}
+            for indices in missing.values():
+                spec = specs[indices[0]]
+                producing[storing.submit(produce, spec, self.submit(spec), time.perf_counter())] = indices
+            for future in concurrent.futures.as_completed(producing):
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    outcome = e
+                finish(producing[future], outcome)
+
+        return outcomes, self.archive(specs, outcomes)
+
+    def archive(self, specs, outcomes):
+        """
+        The ZIP artifact of the batch items that completed (outcomes as
+        generate_batch returns them), built and published unless cached.
+        """
+        # dxf_batch imports this module, so its ZIP writer is imported here
+        from dxf_batch import build_zip
+
+        indices = [index for index, outcome in enumerate(outcomes) if isinstance(outcome, Artifact)]
+        # Names carry each item's place in the batch, so the key covers them too
+        arcnames = {index: f"{index + 1:03d}_{outcomes[index].name}" for index in indices}
+        key = cache_key(GENERATOR_VERSION, batch=[[arcnames[index], spec_key(specs[index])] for index in indices])
+        filename = f"{key}_batch.zip"
+        entry = self.cache.get(key)
+        if entry is not None and entry.url is not None:
+            return Artifact(key, entry.filename, "batch.zip", entry.url, entry.size, cached=True, entry=entry)
+
+        def files():
+            # One item in memory at a time, read back from the cache
+            for index in indices:
+                artifact = outcomes[index]
+                try:
+                    data = self.read(artifact)
+                except FileNotFoundError:
+                    # Evicted since it was rendered or looked up
+                    data = self.submit(specs[index]).result()
+                yield arcnames[index], data
+
+        # Large batches make big archives; spill to disk above the threshold
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_THRESHOLD) as archive:
+            build_zip(files(), archive)
+            archive.seek(0)
+            with stage_timer("publish"):
+                url = self.publish(filename, archive)
+            archive.seek(0)
+            with stage_timer("write"):
+                entry = self.cache.put(key, filename, archive, url=url)
+        return Artifact(key, filename, "batch.zip", url, entry.size, cached=False, entry=entry)
+
+    def edit(self, spec, edited):
+        """
+        Return the artifact for edited, a plan derived from spec by edit_spec.
+        A copy of spec's drawing is changed, so only the entities that differ
+        are emitted and serialized; when spec's drawing is not held it is
+        drawn again from spec first. Both drawings are then held, so spec can
+        be edited again another way and edited can be edited further. Runs in
+        the calling thread, since the drawings live in this process.
+        """
+        # Like render_plan_bytes, the drawing code is only imported when needed
+        from dxf_delta import PlanState
+
+        base_key, edited_key = spec_key(spec), spec_key(edited)
+        # Held drawings never change, so concurrent edits can copy the same one
+        with self._plans_lock:
+            base = self._plans.get(base_key)
+        start = time.perf_counter()
+        if base is None:
+            base = PlanState()
+            base.update(spec)
+        state = base.copy()
+        changes = state.update(edited)
+
+        artifact = self.lookup(edited)
+        if artifact is None:
+            data = state.serialize(edited["format"])
+            artifact = self.store(edited, data, (time.perf_counter() - start) * 1000)
+        artifact.changes = changes
+
+        with self._plans_lock:
+            for key, held in ((base_key, base), (edited_key, state)):
+                self._plans[key] = held
+                self._plans.move_to_end(key)
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+        return artifact
@@ -0,0 +1,249 @@
+# dxf_formats.py - Output formats for a rendered plan: ASCII/binary DXF and JSON/SVG previews
+# File: /dxf_formats.py
+import io
+import json
+import math
+from xml.sax.saxutils import escape, quoteattr
+
+
+class OutputFormat:
+    """How one output format is named, stored and served."""
+
+    __slots__ = ("name", "extension", "mime_type")
+
+    def __init__(self, name, extension, mime_type):
+        self.name = name
+        self.extension = extension
+        self.mime_type = mime_type
+
+
+FORMATS = {
+    "dxf": OutputFormat("dxf", ".dxf", "application/dxf"),
+    "dxf-binary": OutputFormat("dxf-binary", ".dxf", "application/dxf"),
+    "json": OutputFormat("json", ".json", "application/json"),
+    "svg": OutputFormat("svg", ".svg", "image/svg+xml"),
+}
+DEFAULT_FORMAT = "dxf"
+
+# Previews round coordinates to this many decimals (drawing units are mm)
+PREVIEW_PRECISION = 1
+
+# Average glyph width relative to text height, for estimating text extents
+TEXT_WIDTH_FACTOR = 0.6
+
+# DXF TEXT alignment codes to SVG text-anchor / dominant-baseline
+SVG_TEXT_ANCHORS = {0: "start", 1: "middle", 2: "end"}
+SVG_BASELINES = {0: "auto", 1: "text-after-edge", 2: "central", 3: "hanging"}
+
+
+def normalize_format(fmt):
+    """Validate a requested format name; None selects the default ASCII DXF."""
+    if fmt is None:
+        return DEFAULT_FORMAT
+    name = str(fmt).strip().lower()
+    if name not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt!r} (expected one of {', '.join(FORMATS)})")
+    return name
+
+
+def serialize(doc, fmt=DEFAULT_FORMAT):
+    """Encode a finished drawing in the given output format."""
+    if fmt == "dxf":
+        stream = io.StringIO()
+        doc.write(stream)
+        return doc.encode(stream.getvalue())
+    if fmt == "dxf-binary":
+        stream = io.BytesIO()
+        doc.write(stream, fmt="bin")
+        return stream.getvalue()
+    if fmt == "json":
+        return plan_json(doc)
+    if fmt == "svg":
+        return plan_svg(doc)
+    raise ValueError(f"Unknown format: {fmt!r} (expected one of {', '.join(FORMATS)})")
+
+
+def plan_primitives(doc):
+    """
+    The modelspace as plain drawing primitives (line, arc, polyline, text),
+    the common source of the JSON and SVG previews.
+    """
+    primitives = []
+    for entity in doc.modelspace():
+        dxftype = entity.dxftype()
+        layer = entity.dxf.layer
+        if dxftype == "LINE":
+            primitives.append({
+                "type": "line",
+                "layer": layer,
+                "points": [point_2d(entity.dxf.start), point_2d(entity.dxf.end)],
+            })
+        elif dxftype == "ARC":
+            primitives.append({
+                "type": "arc",
+                "layer": layer,
+                "center": point_2d(entity.dxf.center),
+                "radius": round(entity.dxf.radius, PREVIEW_PRECISION),
+                "start_angle": entity.dxf.start_angle,
+                "end_angle": entity.dxf.end_angle,
+            })
+        elif dxftype == "LWPOLYLINE":
+            primitives.append({
+                "type": "polyline",
+                "layer": layer,
+                "points": [point_2d(point) for point in entity.get_points("xy")],
+                "closed": entity.closed,
+            })
+        elif dxftype == "TEXT":
+            halign, valign = entity.dxf.halign, entity.dxf.valign
+            location = entity.dxf.insert if halign == 0 and valign == 0 else entity.dxf.align_point
+            primitives.append({
+                "type": "text",
+                "layer": layer,
+                "text": entity.dxf.text,
+                "position": point_2d(location),
+                "height": round(entity.dxf.height, PREVIEW_PRECISION),
+                "rotation": entity.dxf.rotation,
+                "halign": halign,
+                "valign": valign,
+            })
+    return primitives
+
+
+def point_2d(point):
+    return [round(point[0], PREVIEW_PRECISION), round(point[1], PREVIEW_PRECISION)]
+
+
+def primitive_extents(primitives):
+    """((min_x, min_y), (max_x, max_y)) over all primitives."""
+    xs, ys = [], []
+    for primitive in primitives:
+        kind = primitive["type"]
+        if kind == "arc":
+            points = arc_extreme_points(primitive)
+            xs += [point[0] for point in points]
+            ys += [point[1] for point in points]
+        elif kind == "text":
+            x, y = primitive["position"]
+            xs.append(x)
+            ys.append(y)
+            if not primitive["rotation"]:
+                # Rough text width so long titles are not cut off
+                width = len(primitive["text"]) * primitive["height"] * TEXT_WIDTH_FACTOR
+                offset = {0: 0.0, 1: 0.5, 2: 1.0}.get(primitive["halign"], 0.0) * width
+                xs += (x - offset, x - offset + width)
+                ys.append(y + primitive["height"])
+        else:
+            xs += [point[0] for point in primitive["points"]]
+            ys += [point[1] for point in primitive["points"]]
+    if not xs:
+        return (0.0, 0.0), (0.0, 0.0)
+    return (min(xs), min(ys)), (max(xs), max(ys))
+
+
+def arc_extreme_points(arc):
+    """End points of an arc plus the axis crossings it sweeps through."""
+    (cx, cy), radius = arc["center"], arc["radius"]
+    start = arc["start_angle"] % 360
+    span = (arc["end_angle"] - arc["start_angle"]) % 360 or 360
+    angles = [start, start + span]
+    angles += [quadrant for quadrant in (0, 90, 180, 270, 360, 450, 540, 630) if start < quadrant < start + span]
+    return [
+        (cx + radius * math.cos(math.radians(angle)), cy + radius * math.sin(math.radians(angle)))
+        for angle in angles
+    ]
+
+
+def plan_json(doc):
+    primitives = plan_primitives(doc)
+    low, high = primitive_extents(primitives)
+    preview = {
+        "units": "mm",
+        "extents": {"min": point_2d(low), "max": point_2d(high)},
+        "entities": primitives,
+    }
+    return json.dumps(preview, separators=(",", ":")).encode("utf-8")
+
+
+def plan_svg(doc):
+    """
+    Flat SVG of the modelspace: one path per layer for lines, arcs and
+    polylines, plus the texts. DXF is y-up, so y is negated throughout.
+    """
+    primitives = plan_primitives(doc)
+    (min_x, min_y), (max_x, max_y) = primitive_extents(primitives)
+    margin = max(max_x - min_x, max_y - min_y, 1.0) * 0.05
+    view_box = (
+        min_x - margin,
+        -(max_y + margin),
+        max_x - min_x + 2 * margin,
+        max_y - min_y + 2 * margin,
+    )
+
+    paths = {}
+    texts = []
+    for primitive in primitives:
+        kind = primitive["type"]
+        layer = primitive["layer"]
+        if kind == "text":
+            texts.append(primitive)
+        elif kind == "arc":
+            paths.setdefault(layer, []).append(svg_arc(primitive))
+        else:
+            points = primitive["points"]
+            commands = [f"M{points[0][0]} {-points[0][1]}"]
+            commands += [f"L{x} {-y}" for x, y in points[1:]]
+            if primitive.get("closed"):
+                commands.append("Z")
+            paths.setdefault(layer, []).append("".join(commands))
+
+    colors = {}
+    parts = [
+        '<svg xmlns="http://www.w3.org/2000/svg" '
+        f'viewBox="{" ".join(f"{value:g}" for value in view_box)}">',
+        f'<rect x="{view_box[0]:g}" y="{view_box[1]:g}" width="100%" height="100%" fill="#1e1e1e"/>',
+    ]
+    for layer, commands in paths.items():
+        color = layer_color(doc, layer, colors)
+        parts.append(
+            f'<path data-layer={quoteattr(layer)} stroke="{color}" fill="none" '
+            f'vector-effect="non-scaling-stroke" d="{"".join(commands)}"/>'
+        )
+    for text in texts:
+        x, y = text["position"]
+        transform = f' transform="rotate({-text["rotation"]:g} {x} {-y})"' if text["rotation"] else ""
+        parts.append(
+            f'<text x="{x}" y="{-y}" font-size="{text["height"]}" font-family="sans-serif" '
+            f'fill="{layer_color(doc, text["layer"], colors)}" '
+            f'text-anchor="{SVG_TEXT_ANCHORS.get(text["halign"], "start")}" '
+            f'dominant-baseline="{SVG_BASELINES.get(text["valign"], "auto")}"{transform}>'
+            f'{escape(text["text"])}</text>'
+        )
+    parts.append("</svg>")
+    return "\n".join(parts).encode("utf-8")
+
+
+def svg_arc(arc):
+    """SVG path for a counter-clockwise DXF arc, with y negated."""
+    (cx, cy), radius = arc["center"], arc["radius"]
+    start, end = arc["start_angle"], arc["end_angle"]
+    span = (end - start) % 360 or 360
+    x1 = cx + radius * math.cos(math.radians(start))
+    y1 = cy + radius * math.sin(math.radians(start))
+    x2 = cx + radius * math.cos(math.radians(end))
+    y2 = cy + radius * math.sin(math.radians(end))
+    # Counter-clockwise in y-up is sweep-flag 0 once y points down
+    return f"M{x1:.1f} {-y1:.1f}A{radius} {radius} 0 {int(span > 180)} 0 {x2:.1f} {-y2:.1f}"
+
+
+def layer_color(doc, layer, cache):
+    """Hex color of a layer's ACI color; white/black (7) is drawn white on the dark background."""
+    # Imported here so the format registry can be used without loading ezdxf
+    from ezdxf.colors import aci2rgb
+
+    color = cache.get(layer)
+    if color is None:
+        aci = doc.layers.get(layer).color if doc.layers.has_entry(layer) else 7
+        red, green, blue = aci2rgb(abs(aci) or 7)
+        color = cache[layer] = f"#{red:02x}{green:02x}{blue:02x}"
+    return color
@@ -0,0 +1,413 @@
+# dxf_jobs.py - Durable generation job queue with priorities and per-client fairness
+# File: /dxf_jobs.py
+import concurrent.futures
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED_STATES = (DONE, FAILED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    client TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    stage TEXT,
+    spec TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    heartbeat REAL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    version INTEGER NOT NULL DEFAULT 0,
+    key TEXT,
+    coalesced INTEGER NOT NULL DEFAULT 0,
+    scope TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, priority DESC, seq);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished) WHERE finished IS NOT NULL;
+
+-- When each client last had a job started, for round-robin between clients
+CREATE TABLE IF NOT EXISTS clients (
+    client TEXT PRIMARY KEY,
+    last_served REAL NOT NULL
+);
+"""
+
+JOB_COLUMNS = ("seq", "id", "client", "priority", "state", "stage", "spec", "result", "error",
+               "attempts", "created", "started", "finished", "version", "coalesced")
+
+# Jobs per state, kept by triggers so health checks never count the jobs table.
+# Created (and filled from the jobs already there) in one transaction, see __init__.
+JOB_STATES_SCHEMA = (
+    "CREATE TABLE job_states (state TEXT PRIMARY KEY, count INTEGER NOT NULL)",
+    "INSERT INTO job_states SELECT state, COUNT(*) FROM jobs GROUP BY state",
+    "INSERT OR IGNORE INTO job_states VALUES ('queued', 0), ('running', 0), ('done', 0), ('failed', 0)",
+    "CREATE TRIGGER jobs_insert AFTER INSERT ON jobs BEGIN"
+    " UPDATE job_states SET count = count + 1 WHERE state = NEW.state; END",
+    "CREATE TRIGGER jobs_delete AFTER DELETE ON jobs BEGIN"
+    " UPDATE job_states SET count = count - 1 WHERE state = OLD.state; END",
+    "CREATE TRIGGER jobs_state AFTER UPDATE OF state ON jobs WHEN OLD.state != NEW.state BEGIN"
+    " UPDATE job_states SET count = count - 1 WHERE state = OLD.state;"
+    " UPDATE job_states SET count = count + 1 WHERE state = NEW.state; END",
+)
+
+# Unfinished jobs by key, to find one an identical request can join. The
+# state literals must match the query for SQLite to use this partial index.
+KEY_INDEX = "CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key) WHERE state IN ('queued', 'running')"
+
+# Claims look for the next queued job of one scope
+SCOPE_INDEX = "CREATE INDEX IF NOT EXISTS jobs_scope ON jobs (scope, state, priority DESC, seq)"
+
+MAX_PRIORITY = 100
+
+# Running jobs renew their heartbeat this often; a job whose owner has been
+# silent for STALE_AFTER seconds (crash, kill -9, restart) is queued again
+HEARTBEAT_INTERVAL = 10
+STALE_AFTER = 60
+
+
+def normalize_priority(priority):
+    """Validate a requested priority; higher runs first, 0 is the default."""
+    if priority is None:
+        return 0
+    if isinstance(priority, bool) or not isinstance(priority, (int, float)) or priority != int(priority):
+        raise ValueError(f"priority must be an integer, got {priority!r}")
+    return max(-MAX_PRIORITY, min(int(priority), MAX_PRIORITY))
+
+
+class JobQueue:
+    """
+    Generation jobs stored in SQLite (WAL mode), so queued work survives
+    restarts and every process sharing the database shares one queue.
+
+    handler(spec, report) runs each job in one of `workers` threads and
+    returns a JSON-serializable result; report(stage) publishes progress.
+    Higher priorities run first. Within a priority, clients take turns: the
+    client whose last job started longest ago goes next, so one client
+    submitting hundreds of jobs cannot starve the others.
+
+    Jobs submitted with a key (e.g. the cache key of their inputs) are
+    coalesced: while a job with that key is queued or running, submitting
+    another returns the existing job, so identical concurrent requests share
+    one render and upload, across every process using the database.
+
+    Queues with different scopes can share a database without running each
+    other's jobs: a queue only claims, and only joins, jobs of its own scope.
+    Processes whose handlers publish to different places (e.g. another
+    storage bucket) must use different scopes.
+    """
+
+    def __init__(self, path, handler, workers=4, poll_interval=1.0, retention=24 * 3600, max_attempts=3,
+                 scope=""):
+        self.path = path
+        self.handler = handler
+        self.scope = scope
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.max_attempts = max_attempts
+
+        self._local = threading.local()
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+        # Signalled when this process changes a job, so waiters re-read it
+        self._changed = threading.Condition()
+        # Futures of jobs someone in this process is waiting on
+        self._watched = {}
+        self._watched_lock = threading.Lock()
+
+        # Per-process counters: jobs created, and submissions that joined one instead
+        self.submitted = 0
+        self.coalesced = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = self._db()
+        db.executescript(SCHEMA)
+        # Databases created before jobs had keys
+        columns = {row[1] for row in db.execute("PRAGMA table_info(jobs)")}
+        if "key" not in columns:
+            db.execute("ALTER TABLE jobs ADD COLUMN key TEXT")
+            db.execute("ALTER TABLE jobs ADD COLUMN coalesced INTEGER NOT NULL DEFAULT 0")
+        # Databases created before scopes
+        if "scope" not in columns:
+            db.execute("ALTER TABLE jobs ADD COLUMN scope TEXT NOT NULL DEFAULT ''")
+        db.execute(KEY_INDEX)
+        db.execute(SCOPE_INDEX)
+        # Databases created before the per-state counts
+        with self._transaction() as db:
+            if db.execute("SELECT 1 FROM sqlite_master WHERE name = 'job_states'").fetchone() is None:
+                for statement in JOB_STATES_SCHEMA:
+                    db.execute(statement)
+
+    def start(self):
+        """Start this process's dispatcher and workers (again after a fork)."""
+        if self._started_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            self._owner = f"{socket.gethostname()}:{os.getpid()}"
+            self._wakeup = threading.Event()
+            self._stopping = threading.Event()
+            self._free = threading.Semaphore(self.workers)
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="dxf-job",
+            )
+            threading.Thread(target=self._dispatch_forever, name="dxf-job-dispatcher", daemon=True).start()
+
+    def shutdown(self):
+        """Stop claiming jobs and wait for the ones this process is running."""
+        if self._started_pid != os.getpid():
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._executor.shutdown(wait=True)
+
+    def submit(self, spec, client="anonymous", priority=0, key=None):
+        """
+        Queue spec and return the new job, without waiting for it to run.
+        With a key, an unfinished job with the same key is returned instead
+        (its priority raised to this one if higher).
+        """
+        self.start()
+        priority = normalize_priority(priority)
+        with self._transaction() as db:
+            row = None
+            if key is not None:
+                row = db.execute(
+                    "SELECT id FROM jobs WHERE key = ? AND state IN ('queued', 'running') AND scope = ?",
+                    (key, self.scope),
+                ).fetchone()
+            if row is not None:
+                job_id = row[0]
+                db.execute(
+                    "UPDATE jobs SET coalesced = coalesced + 1, priority = MAX(priority, ?) WHERE id = ?",
+                    (priority, job_id),
+                )
+            else:
+                job_id = uuid.uuid4().hex
+                db.execute(
+                    "INSERT INTO jobs (id, client, priority, state, spec, created, key, scope)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, str(client)[:200], priority, QUEUED,
+                     json.dumps(spec, ensure_ascii=False), time.time(), key, self.scope),
+                )
+        if row is not None:
+            self.coalesced += 1
+        else:
+            self.submitted += 1
+            self._wakeup.set()
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """The job as a dict, or None for an unknown (or pruned) id."""
+        db = self._db()
+        row = db.execute(f"SELECT scope, {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        scope, job = row[0], dict(zip(JOB_COLUMNS, row[1:]))
+        seq = job.pop("seq")
+        job["spec"] = json.loads(job["spec"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        if job["state"] == QUEUED:
+            job["queued_ahead"] = db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE scope = ? AND state = ? AND (priority > ? OR (priority = ? AND seq < ?))",
+                (scope, QUEUED, job["priority"], job["priority"], seq),
+            ).fetchone()[0]
+        return job
+
+    def wait(self, job_id, version=None, timeout=15.0):
+        """
+        Block until the job changes from the given version, finishes, or
+        timeout seconds pass; returns the job as it is then. Changes made by
+        other processes are noticed within poll_interval.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["version"] != version or job["state"] in FINISHED_STATES:
+                return job
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return job
+            with self._changed:
+                self._changed.wait(min(remaining, self.poll_interval))
+
+    def future(self, job_id):
+        """A concurrent.futures.Future resolved with the job once it has finished."""
+        self.start()
+        future = concurrent.futures.Future()
+        with self._watched_lock:
+            self._watched.setdefault(job_id, []).append(future)
+        job = self.get(job_id)
+        if job is None or job["state"] in FINISHED_STATES:
+            self._resolve(job_id, job)
+        return future
+
+    def stats(self):
+        """Jobs per state, plus this process's submission counters, for health checks."""
+        counts = dict(self._db().execute("SELECT state, count FROM job_states").fetchall())
+        stats = {state: counts.get(state, 0) for state in (QUEUED, RUNNING, DONE, FAILED)}
+        stats["submitted"] = self.submitted
+        stats["coalesced"] = self.coalesced
+        return stats
+
+    def _dispatch_forever(self):
+        last_housekeeping = 0.0
+        while not self._stopping.is_set():
+            try:
+                if time.monotonic() - last_housekeeping > HEARTBEAT_INTERVAL:
+                    self._housekeeping()
+                    last_housekeeping = time.monotonic()
+                self._resolve_finished_elsewhere()
+                while not self._stopping.is_set() and self._free.acquire(blocking=False):
+                    job = self._claim()
+                    if job is None:
+                        self._free.release()
+                        break
+                    self._executor.submit(self._run, job)
+            except sqlite3.Error as e:
+                print(f"Job dispatch failed: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _claim(self):
+        """Mark the next job (highest priority, then fairest client) as ours."""
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT jobs.seq, jobs.client FROM jobs LEFT JOIN clients ON clients.client = jobs.client"
+                " WHERE jobs.scope = ? AND jobs.state = ?"
+                " ORDER BY jobs.priority DESC, COALESCE(clients.last_served, 0), jobs.seq LIMIT 1",
+                (self.scope, QUEUED),
+            ).fetchone()
+            if row is None:
+                return None
+            seq, client = row
+            job_id, spec = db.execute(
+                "UPDATE jobs SET state = ?, stage = NULL, owner = ?, heartbeat = ?, started = ?,"
+                " attempts = attempts + 1, version = version + 1 WHERE seq = ? RETURNING id, spec",
+                (RUNNING, self._owner, now, now, seq),
+            ).fetchone()
+            db.execute(
+                "INSERT INTO clients (client, last_served) VALUES (?, ?)"
+                " ON CONFLICT (client) DO UPDATE SET last_served = excluded.last_served",
+                (client, now),
+            )
+        self._notify()
+        return {"id": job_id, "spec": json.loads(spec)}
+
+    def _run(self, job):
+        try:
+            result = self.handler(job["spec"], lambda stage: self._set_stage(job["id"], stage))
+        except Exception as e:
+            self._finish(job["id"], FAILED, error=str(e))
+        else:
+            self._finish(job["id"], DONE, result=result)
+        finally:
+            self._free.release()
+            self._wakeup.set()
+
+    def _set_stage(self, job_id, stage):
+        self._db().execute("UPDATE jobs SET stage = ?, version = version + 1 WHERE id = ?", (stage, job_id))
+        self._notify()
+
+    def _finish(self, job_id, state, result=None, error=None):
+        try:
+            self._db().execute(
+                "UPDATE jobs SET state = ?, result = ?, error = ?, finished = ?, owner = NULL,"
+                " version = version + 1 WHERE id = ?",
+                (state, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+            )
+        except sqlite3.Error as e:
+            # Left running; another process requeues it once the heartbeat is stale
+            print(f"Could not record job {job_id}: {e}")
+            return
+        self._notify()
+        self._resolve(job_id, self.get(job_id))
+
+    def _housekeeping(self):
+        """Renew our heartbeats, requeue jobs of dead owners and prune old jobs."""
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("UPDATE jobs SET heartbeat = ? WHERE state = ? AND owner = ?", (now, RUNNING, self._owner))
+            # Interrupted jobs run again, unless they have already been tried too often
+            db.execute(
+                "UPDATE jobs SET state = ?, finished = ?, owner = NULL, error = 'interrupted too many times',"
+                " version = version + 1 WHERE state = ? AND heartbeat < ? AND attempts >= ?",
+                (FAILED, now, RUNNING, now - STALE_AFTER, self.max_attempts),
+            )
+            requeued = db.execute(
+                "UPDATE jobs SET state = ?, stage = NULL, owner = NULL, version = version + 1"
+                " WHERE state = ? AND heartbeat < ?",
+                (QUEUED, RUNNING, now - STALE_AFTER),
+            ).rowcount
+            if self.retention is not None:
+                db.execute("DELETE FROM jobs WHERE finished < ?", (now - self.retention,))
+        if requeued:
+            self._notify()
+            self._wakeup.set()
+
+    def _resolve_finished_elsewhere(self):
+        with self._watched_lock:
+            job_ids = list(self._watched)
+        for job_id in job_ids:
+            job = self.get(job_id)
+            if job is None or job["state"] in FINISHED_STATES:
+                self._resolve(job_id, job)
+
+    def _resolve(self, job_id, job):
+        with self._watched_lock:
+            futures = self._watched.pop(job_id, [])
+        for future in futures:
+            if job is None:
+                future.set_exception(KeyError(f"Unknown job: {job_id}"))
+            else:
+                future.set_result(job)
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so two processes
+        # cannot both claim the same row
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _db(self):
+        # One connection per thread, and never one inherited across fork()
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            # isolation_level=None: statements autocommit unless inside _transaction()
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            local.db = db
+            local.pid = os.getpid()
+        return local.db
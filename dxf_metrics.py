@@ -0,0 +1,289 @@
+# dxf_metrics.py - Counters, histograms and per-stage timings, Prometheus text format
+# File: /dxf_metrics.py
+import bisect
+import os
+import random
+import threading
+import time
+
+# Fraction of renders and requests whose timings are recorded; counters are always exact
+SAMPLE_RATE = float(os.environ.get("DXF_METRICS_SAMPLE_RATE", 1.0))
+
+# Upper bounds in seconds, from sub-millisecond parses to slow uploads
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def sampled():
+    """Whether to time this render or request."""
+    return SAMPLE_RATE >= 1 or (SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names, values, extra=None):
+    """{name="value",...} for a series, with extra (e.g. the le bucket bound) appended."""
+    pairs = list(zip(names, values)) + ([extra] if extra is not None else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing count, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def exposition(self):
+        for key, value in sorted(self.values().items()):
+            yield f"{self.name}{format_labels(self.labels, key)} {format_value(value)}"
+
+    def snapshot(self):
+        return {",".join(key) or "total": value for key, value in sorted(self.values().items())}
+
+
+class Callback:
+    """
+    A value read from somewhere else when scraped, such as a queue's depth or
+    a cache's hit counter. func returns a number, or {label values: number}.
+    """
+
+    def __init__(self, name, help, func, kind="gauge", labels=()):
+        self.name = name
+        self.help = help
+        self.func = func
+        self.kind = kind
+        self.labels = tuple(labels)
+
+    def values(self):
+        value = self.func()
+        return value if isinstance(value, dict) else {(): value}
+
+    def exposition(self):
+        for key, value in sorted(self.values().items()):
+            yield f"{self.name}{format_labels(self.labels, key)} {format_value(value)}"
+
+    def snapshot(self):
+        return {",".join(key) or "total": value for key, value in sorted(self.values().items())}
+
+
+class Histogram:
+    """Observations counted into cumulative buckets, per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        # Bucket counts are stored per bucket and accumulated when read
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def values(self):
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+
+    def exposition(self):
+        for key, (counts, total, count) in sorted(self.values().items()):
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                labels = format_labels(self.labels, key, ("le", format_value(bound)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labels, key)} {format_value(total)}"
+            yield f"{self.name}_count{format_labels(self.labels, key)} {count}"
+
+    def quantile(self, q, counts, count):
+        """Estimate a quantile by interpolating inside its bucket, as histogram_quantile() does."""
+        rank = q * count
+        cumulative = 0
+        lower = 0.0
+        for bound, bucket in zip(self.buckets, counts):
+            if bucket and cumulative + bucket >= rank:
+                if bound == float("inf"):
+                    return lower
+                return lower + (bound - lower) * (rank - cumulative) / bucket
+            cumulative += bucket
+            lower = bound
+        return lower
+
+    def snapshot(self):
+        snapshot = {}
+        for key, (counts, total, count) in sorted(self.values().items()):
+            snapshot[",".join(key) or "total"] = {
+                "count": count,
+                "mean_ms": round(total / count * 1000, 3),
+                "p50_ms": round(self.quantile(0.5, counts, count) * 1000, 3),
+                "p95_ms": round(self.quantile(0.95, counts, count) * 1000, 3),
+                "p99_ms": round(self.quantile(0.99, counts, count) * 1000, 3),
+            }
+        return snapshot
+
+
+class Registry:
+    """The metrics of one process, rendered for /metrics or as a dict for get_metrics."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _add(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def callback(self, name, help, func, kind="gauge", labels=()):
+        """
+        A metric read from func when scraped. Registering the name again
+        replaces the callback, e.g. when a second server's state is set up in
+        the same process (tests, benchmarks); the latest one is reported.
+        """
+        if isinstance(self._metrics.get(name), Callback):
+            del self._metrics[name]
+        return self._add(Callback(name, help, func, kind, labels))
+
+    def exposition(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.exposition())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """All metrics as plain data; histograms summarized as count, mean and percentiles."""
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+
+metrics = Registry()
+
+STAGE_SECONDS = metrics.histogram(
+    "dxf_stage_seconds", "Time spent in each generation stage (sampled)", ["stage"]
+)
+REQUESTS = metrics.counter(
+    "dxf_requests_total", "Requests and tool calls handled", ["transport", "endpoint", "status"]
+)
+REQUEST_SECONDS = metrics.histogram(
+    "dxf_request_seconds", "Time from receiving a request to the end of its response (sampled)",
+    ["transport", "endpoint"],
+)
+GENERATIONS = metrics.counter(
+    "dxf_generations_total", "Plans generated, by whether they came from the cache", ["result"]
+)
+BYTES_WRITTEN = metrics.counter(
+    "dxf_bytes_written_total", "Bytes of rendered plans written to the cache", ["format"]
+)
+
+# Per-thread stage collector while a pool worker runs a render (see run_timed):
+# a list to append to, False when the render is not sampled
+_local = threading.local()
+
+
+class stage_timer:
+    """
+    with stage_timer("serialize"): ... records the block's duration in
+    dxf_stage_seconds, for sampled renders only. Inside a pool worker the
+    timing goes back to the submitting process with the result instead.
+    """
+
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.start = None
+
+    def __enter__(self):
+        collector = getattr(_local, "collector", None)
+        if sampled() if collector is None else collector is not False:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.start is None:
+            return
+        elapsed = time.perf_counter() - self.start
+        collector = getattr(_local, "collector", None)
+        if collector is None:
+            STAGE_SECONDS.observe(elapsed, stage=self.stage)
+        else:
+            collector.append((self.stage, elapsed))
+
+
+def run_timed(func, sample, *args):
+    """
+    Pool entry point: func(*args) with its stage timings collected, since a
+    worker process's own metrics are never scraped. Returns (result, timings).
+    """
+    timings = [] if sample else False
+    _local.collector = timings
+    try:
+        return func(*args), timings or []
+    finally:
+        _local.collector = None
+
+
+def record_stages(timings):
+    """Add stage timings collected by run_timed to this process's histograms."""
+    for stage, seconds in timings:
+        STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+def register_service_metrics(cache, renderer, jobs, uploads=None):
+    """Expose a server's cache counters and queue depths, read when scraped."""
+    metrics.callback("dxf_cache_hits_total", "Cache lookups that found a stored plan",
+                     lambda: cache.hits, kind="counter")
+    metrics.callback("dxf_cache_misses_total", "Cache lookups that found nothing",
+                     lambda: cache.misses, kind="counter")
+    metrics.callback("dxf_cache_bytes", "Bytes stored in the cache", lambda: cache.stats()["bytes"])
+    metrics.callback("dxf_render_queue_depth", "Renders waiting for a free pool worker",
+                     lambda: renderer.stats()["queued"])
+    metrics.callback("dxf_render_busy_workers", "Pool workers rendering right now",
+                     lambda: renderer.stats()["busy"])
+    metrics.callback("dxf_jobs", "Jobs in the job store by state",
+                     lambda: {(state,): count for state, count in jobs.stats().items()
+                              if state not in ("submitted", "coalesced")},
+                     labels=["state"])
+    if uploads is not None:
+        metrics.callback("dxf_upload_queue_depth", "Uploads waiting for a free upload worker", uploads.qsize)
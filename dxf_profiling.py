@@ -0,0 +1,43 @@
+# dxf_profiling.py - Opt-in cProfile runs of the render hot path
+# File: /dxf_profiling.py
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import random
+
+# Fraction of cache-miss renders profiled without being asked; 0 turns sampling off
+SAMPLE_RATE = float(os.environ.get("DXF_PROFILE_SAMPLE_RATE", 0))
+
+# Stored next to the artifact in the cache, in the format pstats, snakeviz and gprof2dot read
+PROFILE_SUFFIX = ".prof"
+
+REPORT_SORTS = ("cumulative", "tottime", "calls")
+
+
+def should_profile(requested=False):
+    """Profile this render: asked for explicitly, or picked by DXF_PROFILE_SAMPLE_RATE."""
+    return bool(requested) or (SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE)
+
+
+def profile_call(func, *args):
+    """
+    func(*args) under cProfile. Module-level so pool workers can run it.
+    Returns (result, stats), stats being the bytes of a .prof file.
+    """
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args)
+    profiler.create_stats()
+    # What Profile.dump_stats() writes, without a temporary file
+    return result, marshal.dumps(profiler.stats)
+
+
+def profile_report(path, sort="cumulative", limit=40):
+    """A stored profile as text: the top functions by sort, as python -m pstats prints them."""
+    if sort not in REPORT_SORTS:
+        raise ValueError(f"sort must be one of {', '.join(REPORT_SORTS)}")
+    output = io.StringIO()
+    stats = pstats.Stats(path, stream=output)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
@@ -0,0 +1,160 @@
+# dxf_render.py - Drawing architectural plans with ezdxf
+# File: /dxf_render.py
+#
+# Everything here needs ezdxf (and numpy), which take a noticeable part of a
+# second to import, so dxf_engine only loads this module when a plan is first
+# rendered (see dxf_engine.load_renderer).
+import numpy as np
+from ezdxf.enums import TextEntityAlignment
+
+from dxf_emitter import BulkEmitter
+from dxf_formats import DEFAULT_FORMAT, serialize
+from dxf_metrics import stage_timer
+from dxf_templates import DocumentTemplates
+from plan_layout import layout_plan
+from prompt_features import build_plan_spec
+
+# Layer name -> ACI color used by every architectural drawing
+ARCHITECTURAL_LAYERS = [
+    ("WALLS", 1),       # Red
+    ("DOORS", 2),       # Yellow
+    ("WINDOWS", 3),     # Green
+    ("TEXT", 4),        # Cyan
+    ("DIMENSIONS", 5),  # Blue
+]
+
+
+def setup_layers(doc):
+    """Create the architectural layers that are not already in doc."""
+    for name, color in ARCHITECTURAL_LAYERS:
+        if not doc.layers.has_entry(name):
+            doc.layers.new(name, dxfattribs={"color": color})
+
+
+# Template document with the layers in place, copied for every drawing
+templates = DocumentTemplates()
+templates.register("architectural", setup_layers)
+
+
+def draw_architectural_plan(doc, prompt_text, scale=1.0, building_type="house"):
+    """
+    Enhanced drawing function with better architectural elements.
+    The prompt is analyzed into a PlanSpec, plan_layout computes all geometry
+    in bulk, and this function only emits the resulting entities.
+    """
+    msp = doc.modelspace()
+
+    # Define layers for better organization (already present on template copies)
+    setup_layers(doc)
+
+    # Analyze prompt for specific features (memoized, single pass)
+    with stage_timer("analysis"):
+        spec = build_plan_spec(prompt_text, scale, building_type)
+        layout = layout_plan(spec)
+    with stage_timer("emit"):
+        emit_plan(msp, spec, layout, prompt_text, scale)
+
+
+def emit_plan(msp, spec, layout, prompt_text, scale):
+    """Add the entities of a computed layout to the modelspace."""
+    # Doors, windows and interior walls go in as bulk batches per layer
+    emit = BulkEmitter(msp)
+    for (name, style), rows in plan_batches(spec, layout, prompt_text, scale).items():
+        BATCH_EMITTERS[name](msp, emit, rows, *style)
+
+
+def plan_batches(spec, layout, prompt_text, scale):
+    """
+    The entities of a plan as {(batch name, style): rows}, in drawing order.
+    Every row becomes one entity and holds what sets it apart from the rest
+    of its batch (coordinates, label text), so two plans can be compared row
+    by row (see dxf_delta). Rows are arrays for geometry and (text, x, y)
+    tuples for labels.
+    """
+    base_width = layout.width
+    base_height = layout.height
+    centers, radii, angles = layout.door_arcs()
+    text_height = 300 * scale
+    dim_text_height = 150 * scale
+    return {
+        # Main building outline (outer walls)
+        ("outline", ()): [(base_width, base_height)],
+        # Doors: opening in the wall plus a swing arc into the building
+        ("door_lines", ()): layout.door_segments(),
+        ("door_arcs", ()): np.column_stack([centers, radii, angles]),
+        # Windows: opening in the wall plus a frame on the inside
+        ("window_lines", ()): layout.window_segments(),
+        ("window_frames", ()): layout.window_frames().reshape(-1, 8),
+        # Interior walls and room labels
+        ("partitions", ()): layout.partitions,
+        ("room_labels", (layout.room_text_height,)): [
+            (label, x, y) for label, (x, y) in zip(layout.room_labels, layout.room_centers.tolist())
+        ],
+        # Main title and dimensions
+        ("title", (text_height,)): [
+            (f"{spec.building_type.title()}: {prompt_text}", 100 * scale, base_height + 500 * scale)
+        ],
+        ("width_label", (dim_text_height,)): [(f"Width: {base_width/1000:.1f}m", base_width/2, -400 * scale)],
+        ("height_label", (dim_text_height,)): [(f"Height: {base_height/1000:.1f}m", -400 * scale, base_height/2)],
+    }
+
+
+def emit_outline(msp, emit, rows):
+    for width, height in rows:
+        msp.add_lwpolyline([(0, 0), (width, 0), (width, height), (0, height)], close=True,
+                           dxfattribs={"layer": "WALLS", "lineweight": 50})
+
+
+def emit_door_arcs(msp, emit, rows):
+    arcs = np.asarray(rows, dtype=float).reshape(-1, 5)
+    emit.arcs(arcs[:, :2], arcs[:, 2], arcs[:, 3:], layer="DOORS")
+
+
+def emit_window_frames(msp, emit, rows):
+    emit.polylines(np.asarray(rows, dtype=float).reshape(-1, 4, 2), close=True, layer="WINDOWS")
+
+
+def emit_room_labels(msp, emit, rows, height):
+    emit.texts([label for label, _, _ in rows], [(x, y) for _, x, y in rows],
+               align=TextEntityAlignment.MIDDLE_CENTER, height=height, layer="TEXT")
+
+
+def emit_title(msp, emit, rows, height):
+    for text, x, y in rows:
+        msp.add_text(text, dxfattribs={'height': height, 'layer': 'TEXT'}
+                     ).set_placement((x, y), align=TextEntityAlignment.LEFT)
+
+
+def emit_dimension(msp, emit, rows, height, rotation=None):
+    dxfattribs = {'height': height, 'layer': 'DIMENSIONS'}
+    if rotation is not None:
+        dxfattribs['rotation'] = rotation
+    for text, x, y in rows:
+        msp.add_text(text, dxfattribs=dxfattribs).set_placement((x, y), align=TextEntityAlignment.MIDDLE_CENTER)
+
+
+# Batch name -> emitter(msp, emit, rows, *style)
+BATCH_EMITTERS = {
+    "outline": emit_outline,
+    "door_lines": lambda msp, emit, rows: emit.lines(rows, layer="DOORS", lineweight=30),
+    "door_arcs": emit_door_arcs,
+    "window_lines": lambda msp, emit, rows: emit.lines(rows, layer="WINDOWS", lineweight=25),
+    "window_frames": emit_window_frames,
+    "partitions": lambda msp, emit, rows: emit.lines(rows, layer="WALLS", lineweight=30),
+    "room_labels": emit_room_labels,
+    "title": emit_title,
+    "width_label": emit_dimension,
+    "height_label": lambda msp, emit, rows, height: emit_dimension(msp, emit, rows, height, rotation=90),
+}
+
+
+def render_plan_bytes(prompt, scale=1.0, building_type="house", fmt=DEFAULT_FORMAT):
+    """
+    Render one plan to bytes in the given output format (ASCII DXF by
+    default). Called through dxf_engine.render_plan_bytes.
+    """
+    with stage_timer("document"):
+        doc = templates.new_document("architectural")
+    draw_architectural_plan(doc, prompt, scale, building_type)
+    with stage_timer("serialize"):
+        return serialize(doc, fmt)
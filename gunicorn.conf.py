@@ -0,0 +1,67 @@
+# gunicorn.conf.py - Production serving settings for the Flask app in main.py
+# File: /gunicorn.conf.py
+#
+# Usage: gunicorn main:app   (this file is picked up from the working directory)
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 80)}"
+
+# Renders are CPU bound, so one worker process per core by default. Threads
+# per worker serve the SSE streams, which mostly wait on the client or on a
+# render, without tying up a whole process each.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+
+# Every worker starts its own render pool (see main.py); by default they split
+# the cores between them instead of each starting one process per core
+os.environ.setdefault("DXF_BATCH_WORKERS", str(max(1, multiprocessing.cpu_count() // workers)))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+
+# Keep client connections open between requests; long enough to sit behind
+# a load balancer that reuses connections
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# A worker whose heartbeat stops for this long is killed and restarted. With
+# gthread workers the heartbeat comes from the worker's main loop, so this
+# catches a hung process; slow renders and long SSE streams are not cut off.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+
+# On SIGTERM (e.g. a redeploy) workers stop accepting and get this long to
+# finish in-flight renders and streams before they are killed
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+
+# Recycle workers now and then so a leak in a long-lived worker cannot grow
+# forever (GUNICORN_MAX_REQUESTS=0 turns it off). The jitter spreads the
+# restarts so the workers do not all go down together.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+# Import main (ezdxf, template documents) once in the master; forked workers
+# start warm and share those pages copy-on-write
+preload_app = True
+
+# Downloads go out with sendfile(2), straight from the page cache
+sendfile = True
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+
+def post_fork(server, worker):
+    """Pick up queued generation jobs in each worker, including ones left from before a restart."""
+    from main import jobs
+
+    jobs.start()
+
+
+def worker_exit(server, worker):
+    """
+    Let the worker's running jobs finish, then stop its batch render
+    processes so they do not outlive it.
+    """
+    from main import batch_renderer, jobs
+
+    jobs.shutdown()
+    batch_renderer.shutdown()
@@ -1,111 +1,579 @@
-from flask import Flask, Response, request, stream_with_context, send_file
-import ezdxf
+from flask import Flask, Response, g, request, stream_with_context, send_file
+from werkzeug.exceptions import HTTPException
+import base64
+import hashlib
+import hmac
+import io
 import os
-import uuid
 import json
+import queue
+import re
+import threading
+import time
+from functools import lru_cache
+from dxf_batch import BatchRenderer, normalize_batch_specs
+from dxf_cache import DXFCache
+from dxf_compression import (
+    MIN_COMPRESS_SIZE, available_encodings, compress, decompress,
+    store_encoding_from_env,
+)
+from dxf_engine import (
+    GenerationEngine, edit_spec, load_renderer, normalize_spec, plan_filename,
+    render_plan_bytes, render_spec, spec_key,
+)
+from dxf_formats import DEFAULT_FORMAT, FORMATS, normalize_format
+from dxf_jobs import DONE, FAILED, FINISHED_STATES, QUEUED, RUNNING, JobQueue
+from dxf_metrics import REQUEST_SECONDS, REQUESTS, metrics, register_service_metrics, sampled
+from dxf_profiling import REPORT_SORTS, profile_report
+from prompt_features import ROOM_WORDS, extract_features
 
 app = Flask(__name__)
+# Let a front-end server (nginx, Apache) send downloads itself
+app.config["USE_X_SENDFILE"] = os.environ.get("DXF_X_SENDFILE") == "1"
+
+# Inline responses are sent in chunks of this size
+INLINE_CHUNK_SIZE = 64 * 1024
+
+# Cached downloads are named "<cache key>_...", so a name always holds the same drawing
+CONTENT_ADDRESSED_NAME = re.compile(r"[0-9a-f]{32}_")
+DOWNLOAD_MAX_AGE = 365 * 24 * 3600
+
+# Downloads worth compressing for clients; ZIP archives already are
+COMPRESSIBLE_SUFFIXES = (".dxf", ".json", ".svg")
+
+BATCH_MAX_ITEMS = int(os.environ.get("DXF_BATCH_MAX_ITEMS", 500))
+
+# Bearer token for /admin routes; without one they do not exist
+ADMIN_TOKEN = os.environ.get("DXF_ADMIN_TOKEN")
+
+# Keep rendered DXF files compressed on disk ("gzip" or "br"); ZIPs stay as they are
+STORE_ENCODING = store_encoding_from_env()
+
+# Absolute: send_file resolves relative paths against the app's root, not the working directory
+UPLOADS_DIR = os.path.abspath("uploads")
+os.makedirs(UPLOADS_DIR, exist_ok=True)
+dxf_cache = DXFCache(
+    UPLOADS_DIR,
+    max_entries=int(os.environ.get("DXF_CACHE_MAX_ENTRIES", 512)),
+    max_bytes=int(os.environ.get("DXF_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+    max_age=int(os.environ.get("DXF_CACHE_MAX_AGE", 24 * 3600)),
+    sweep_interval=int(os.environ.get("DXF_CACHE_SWEEP_INTERVAL", 60)),
+)
+
+STARTED_AT = time.monotonic()
+
+
+def sse_frame(payload):
+    """Encode payload as a single SSE data frame."""
+    return f"data: {json.dumps(payload)}\n\n".encode("utf-8")
+
+
+class StaticFrame:
+    """An SSE frame whose payload never changes, serialized once at startup."""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, payload):
+        self.body = sse_frame(payload)
+        self.etag = hashlib.sha256(self.body).hexdigest()[:16]
+
+
+SERVICE_INFO_FRAME = StaticFrame({
+    "jsonrpc": "2.0",
+    "id": "status",
+    "result": {
+        "service": "DXF Generator",
+        "status": "active",
+        "description": "Genera archivos DXF arquitectónicos",
+        "ready": True,
+        "version": "1.0"
+    }
+})
+
+STATUS_FRAME = StaticFrame({
+    "jsonrpc": "2.0",
+    "id": "simple_status",
+    "result": {
+        "status": "active",
+        "service": "dxf-generator",
+        "ready": True
+    }
+})
+
+
+def static_sse_response(frame):
+    """
+    Serve a StaticFrame. Pollers that send the ETag back get an empty 304;
+    HEAD requests get the headers only (Flask strips the body).
+    """
+    if frame.etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(frame.body, content_type="text/event-stream")
+    response.set_etag(frame.etag)
+    # Clients may keep the frame but must revalidate it on every poll
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 
-os.makedirs("uploads", exist_ok=True)
 print(" Railway deployment ready - no external dependencies needed!")
 
 
+# Single and batch renders run in worker processes, started on first use
+batch_renderer = BatchRenderer(
+    render_plan_bytes,
+    max_workers=int(os.environ.get("DXF_BATCH_WORKERS", 0)) or None,
+    initializer=load_renderer,
+)
 
-def draw_architectural_plan(doc, prompt_text):
-    msp = doc.modelspace()
-    msp.add_lwpolyline([
-        (0, 0), (6000, 0), (6000, 4000), (0, 4000), (0, 0)
-    ], dxfattribs={"closed": True})
-    msp.add_text(prompt_text, dxfattribs={'height': 250, 'layer': 'TEXT'}).set_pos((100, 3800), align='LEFT')
+# Inline responses render in this process. gunicorn preloads the app, so the
+# drawing code is imported once here and shared by every forked worker.
+load_renderer()
+
+
+def publish_download(filename, data):
+    """Engine publish hook: stored files are served from uploads/ by /download."""
+    return f"/download/{filename}"
+
+
+# Rendering, caching and naming shared with the MCP server; identical specs
+# map to the same content-addressed file in uploads/. Each gunicorn worker
+# holds the drawings of its own recently edited plans (DXF_PLAN_STATES).
+engine = GenerationEngine(dxf_cache, batch_renderer, publish_download, store_encoding=STORE_ENCODING,
+                          max_plans=int(os.environ.get("DXF_PLAN_STATES", 16)))
+
+
+def run_generation_job(spec, report):
+    """Job handler: render (or reuse) one drawing and return where to download it."""
+    # Jobs queued by older versions carry only prompt and format
+    artifact = engine.generate(request_spec(spec), report, profile=spec.get("profile", False))
+    result = {"filename": artifact.name, "url": artifact.url, "cached": artifact.cached}
+    if artifact.profiled:
+        result["profile_url"] = f"/admin/profiles/{artifact.filename}"
+    return result
+
+
+# Single generations run as durable jobs, so a client that disconnects does
+# not waste the render and queued work survives a restart
+jobs = JobQueue(
+    os.environ.get("DXF_JOB_DB", "jobs.sqlite3"),
+    run_generation_job,
+    workers=int(os.environ.get("DXF_JOB_WORKERS", 4)),
+)
+
+# Seconds between keep-alive comments while a job stream has nothing to report
+JOB_KEEPALIVE = 15
+
+register_service_metrics(dxf_cache, batch_renderer, jobs)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter() if sampled() else None
+
+
+@app.after_request
+def count_request(response):
+    """Count every response; sampled ones are timed until their last byte is sent."""
+    endpoint = request.endpoint or "unknown"
+    REQUESTS.inc(transport="http", endpoint=endpoint, status=response.status_code)
+    started = g.get("request_started")
+    if started is not None:
+        response.call_on_close(lambda: REQUEST_SECONDS.observe(
+            time.perf_counter() - started, transport="http", endpoint=endpoint
+        ))
+    return response
+
+
+def submit_generation(spec, client, priority=None, profile=False):
+    """
+    Queue a generation job for a plan spec. While an identical one (same
+    cache key) is queued or running, its job is returned instead, so
+    concurrent identical requests share one render. Profiled generations
+    always render on their own.
+    """
+    if profile:
+        return jobs.submit(dict(spec, profile=True), client, priority)
+    return jobs.submit(spec, client, priority, key=spec_key(spec))
+
+
+def profile_requested(data):
+    """Whether a request asks for its render to be profiled: X-DXF-Profile: 1 or "profile": true."""
+    return request.headers.get("X-DXF-Profile") == "1" or data.get("profile") is True
+
+
+def request_spec(data):
+    """Plan spec from a request body or tool arguments; ValueError if invalid."""
+    return normalize_spec(
+        data.get("prompt"), data.get("scale", 1.0), data.get("building_type"), data.get("format")
+    )
+
+
+def job_client():
+    """Who a job is queued for, for fair scheduling between clients."""
+    if request.headers.get("X-Client-Id"):
+        return request.headers["X-Client-Id"]
+    return request.access_route[0] if request.access_route else "anonymous"
+
+
+def job_progress(job_id):
+    """
+    Follow a job until it finishes, yielding an SSE frame each time its
+    state changes and a keep-alive comment while nothing happens.
+    """
+    job = jobs.get(job_id)
+    version = None
+    while job is not None:
+        if job["version"] == version:
+            yield ": keep-alive\n\n"
+        elif job["state"] == QUEUED:
+            text = f" En cola ({job['queued_ahead']} por delante)"
+            yield f"data: {json.dumps({'text': text, 'job_id': job_id, 'state': QUEUED})}\n\n"
+        elif job["state"] == RUNNING:
+            yield f"data: {json.dumps({'text': ' Generando DXF', 'job_id': job_id, 'state': RUNNING})}\n\n"
+        elif job["state"] == DONE:
+            result = job["result"]
+            if result["cached"]:
+                yield f"data: {json.dumps({'text': ' DXF recuperado de caché', 'job_id': job_id})}\n\n"
+            else:
+                yield f"data: {json.dumps({'text': ' DXF generado', 'job_id': job_id})}\n\n"
+            yield f"data: {json.dumps({'text': ' Archivo listo', 'url': result['url'], 'job_id': job_id, 'state': DONE})}\n\n"
+            if "profile_url" in result:
+                yield f"data: {json.dumps({'text': ' Perfil disponible', 'profile_url': result['profile_url']})}\n\n"
+            yield f"data: {json.dumps({'text': '  Archivo disponible para descarga'})}\n\n"
+            return
+        else:
+            yield f"data: {json.dumps({'error': job['error'], 'job_id': job_id, 'state': FAILED})}\n\n"
+            return
+        version = job["version"]
+        job = jobs.wait(job_id, version, timeout=JOB_KEEPALIVE)
+
+
+def wait_for_job(job_id):
+    """Block until a job has finished; returns the finished job."""
+    job = jobs.get(job_id)
+    while job is not None and job["state"] not in FINISHED_STATES:
+        job = jobs.wait(job_id, job["version"], timeout=JOB_KEEPALIVE)
+    return job
+
+
+def job_frame(job, status=200):
+    """A job's status as a JSON-RPC result in SSE format, like /health."""
+    response_data = {"jsonrpc": "2.0", "id": "job", "result": job}
+    response = Response(sse_frame(response_data), status=status, content_type="text/event-stream")
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+def run_batch(specs):
+    """
+    Generate batch specs with the engine in a background thread. Yields one
+    event per item as it finishes (cached items first), then a final event
+    with the ZIP of all files.
+    """
+    events = queue.SimpleQueue()
+
+    def report(index, outcome):
+        if isinstance(outcome, Exception):
+            events.put({"index": index, "error": str(outcome)})
+        else:
+            events.put({"index": index, "url": outcome.url, "cached": outcome.cached})
+
+    def generate():
+        try:
+            outcomes, archive = engine.generate_batch(specs, report)
+        except Exception as e:
+            events.put(e)
+            return
+        completed = sum(not isinstance(outcome, Exception) for outcome in outcomes)
+        events.put({"done": True, "url": archive.url, "completed": completed, "failed": len(specs) - completed})
+
+    threading.Thread(target=generate, name="dxf-batch", daemon=True).start()
+    while True:
+        event = events.get()
+        if isinstance(event, Exception):
+            raise event
+        yield event
+        if event.get("done"):
+            return
 
 @app.route("/", methods=["GET"])
 def service_info():
     """GET endpoint for Agent Zero - returns JSON-RPC in SSE format"""
-    def status_stream():
-        response_data = {
-            "jsonrpc": "2.0",
-            "id": "status",
-            "result": {
-                "service": "DXF Generator",
-                "status": "active", 
-                "description": "Genera archivos DXF arquitectónicos",
-                "ready": True,
-                "version": "1.0"
-            }
-        }
-        yield f"data: {json.dumps(response_data)}\n\n"
-    
-    return Response(status_stream(), content_type="text/event-stream")
+    return static_sse_response(SERVICE_INFO_FRAME)
 
 @app.route("/", methods=["POST"])
 def generate_dxf():
+    data = request.get_json(silent=True)
+    # Anything but an object goes on to the stream, which reports it
+    if isinstance(data, dict) and data.get("inline") and "prompt" in data:
+        return inline_dxf_response(data)
+
+    client = job_client()
+    profile = profile_requested(data if isinstance(data, dict) else {})
+
     def event_stream():
         try:
             data = request.get_json()
+            if data is not None and not isinstance(data, dict):
+                yield f"data: {json.dumps({'text': ' Datos inválidos: se esperaba un objeto JSON'})}\n\n"
+                return
             if not data or "prompt" not in data:
                 yield f"data: {json.dumps({'text': ' Falta el campo prompt'})}\n\n"
                 return
 
-            prompt = data["prompt"]
-            yield f"data: {json.dumps({'text': f' Recibido: {prompt}'})}\n\n"
+            spec = request_spec(data)
+            prompt = spec["prompt"]
+            features = extract_features(prompt)
+            detected = {
+                "doors": features.doors,
+                "windows": features.windows,
+                "rooms": list(features.rooms),
+                "building_type": spec["building_type"],
+            }
+            job = submit_generation(spec, client, data.get("priority"), profile)
+            yield f"data: {json.dumps({'text': f' Recibido: {prompt}', 'features': detected, 'job_id': job['id']})}\n\n"
 
-            file_id = uuid.uuid4().hex
-            filename = f"{file_id}_{prompt.replace(' ', '_')[:30]}.dxf"
-            
-            doc = ezdxf.new()
-            draw_architectural_plan(doc, prompt)
+            # The job keeps running if the client goes away; its result stays at /jobs/<id>
+            yield from job_progress(job["id"])
 
-+            file_path = os.path.join("uploads", filename)
-            doc.saveas(file_path)
-            yield f"data: {json.dumps({'text': ' DXF generado'})}\n\n"
+        except Exception as e:
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
 
-            download_url = f"/download/{filename}"
-            yield f"data: {json.dumps({'text': ' Archivo listo', 'url': download_url})}\n\n"
-            yield f"data: {json.dumps({'text': '  Archivo disponible para descarga'})}\n\n"
+    return Response(stream_with_context(event_stream()), content_type="text/event-stream")
+
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """Queue a generation and return its job id at once (202), without waiting for it."""
+    data = request.get_json(silent=True) or {}
+    try:
+        if not isinstance(data, dict):
+            raise ValueError("Datos inválidos: se esperaba un objeto JSON")
+        if not isinstance(data.get("prompt"), str):
+            raise ValueError("Falta el campo prompt")
+        job = submit_generation(request_spec(data), job_client(), data.get("priority"), profile_requested(data))
+    except ValueError as e:
+        error_data = {"jsonrpc": "2.0", "id": "job", "error": {"code": -32602, "message": str(e)}}
+        return Response(sse_frame(error_data), status=400, content_type="text/event-stream")
+    job["status_url"] = f"/jobs/{job['id']}"
+    job["events_url"] = f"/jobs/{job['id']}/events"
+    return job_frame(job, status=202)
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """State, queue position, progress and result of a job."""
+    job = jobs.get(job_id)
+    if job is None:
+        return "Job not found", 404
+    return job_frame(job)
+
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """SSE progress of a job until it finishes, as on the POST / stream."""
+    if jobs.get(job_id) is None:
+        return "Job not found", 404
+    return Response(stream_with_context(job_progress(job_id)), content_type="text/event-stream")
+
+
+@app.route("/batch", methods=["POST"])
+def generate_dxf_batch():
+    """Render many prompts in parallel; one SSE event per finished item, then the ZIP."""
+    def batch_stream():
+        try:
+            data = request.get_json()
+            data = data or {}
+            specs = normalize_batch_specs(
+                data.get("items"), BATCH_MAX_ITEMS, normalize_format(data.get("format"))
+            )
+            yield f"data: {json.dumps({'text': f' Lote recibido: {len(specs)} elementos'})}\n\n"
+
+            for event in run_batch(specs):
+                if event.get("done"):
+                    event["text"] = " Lote completo"
+                elif "error" in event:
+                    event["text"] = f" Error en el elemento {event['index']}"
+                else:
+                    event["text"] = f" Elemento {event['index']} listo"
+                yield f"data: {json.dumps(event)}\n\n"
 
         except Exception as e:
             yield f"data: {json.dumps({'error': str(e)})}\n\n"
 
-    return Response(stream_with_context(event_stream()), content_type="text/event-stream")
+    return Response(stream_with_context(batch_stream()), content_type="text/event-stream")
+
+
+def inline_dxf_response(data):
+    """
+    One-shot mode: render in the request thread and return the drawing itself
+    as a chunked binary response instead of saving it to uploads/ and handing
+    out a download URL.
+    """
+    try:
+        spec = request_spec(data)
+    except ValueError as e:
+        return Response(json.dumps({"error": str(e)}), status=400, content_type="application/json")
+    try:
+        body = render_spec(spec)
+    except Exception as e:
+        return Response(json.dumps({"error": str(e)}), status=500, content_type="application/json")
+
+    def chunks():
+        view = memoryview(body)
+        for start in range(0, len(view), INLINE_CHUNK_SIZE):
+            yield view[start:start + INLINE_CHUNK_SIZE].tobytes()
+
+    response = Response(chunks(), content_type=FORMATS[spec["format"]].mime_type)
+    response.headers.set("Content-Disposition", "attachment", filename=plan_filename(spec["prompt"], spec["format"]))
+    return response
+
+
+@lru_cache(maxsize=4096)
+def file_etag(path, mtime_ns, size):
+    """Strong ETag for a file: SHA-256 of its content, memoized per file version."""
+    with open(path, "rb") as file:
+        return hashlib.file_digest(file, "sha256").hexdigest()[:32]
+
+
+def stored_etag(path):
+    stat = os.stat(path)
+    return file_etag(path, stat.st_mtime_ns, stat.st_size)
+
+
+def send_download(source, filename, etag, encoding=None):
+    """
+    send_file() for one representation of a download: a path on disk or an
+    in-memory body, sent with the given content encoding (None for identity).
+    """
+    immutable = CONTENT_ADDRESSED_NAME.match(filename) is not None
+    response = send_file(
+        source,
+        as_attachment=True,
+        download_name=filename,
+        etag=etag,
+        max_age=DOWNLOAD_MAX_AGE if immutable else None,
+    )
+    if immutable:
+        response.cache_control.immutable = True
+    if encoding is not None:
+        response.content_encoding = encoding
+    response.vary.add("Accept-Encoding")
+    if response.status_code == 206 and isinstance(source, str):
+        sendfile_range(response, source)
+    return response
+
+
+def sendfile_range(response, path):
+    """
+    werkzeug serves a 206 through an iterator over the file, which hides the
+    file from the server's sendfile(). Hand the server a file positioned at
+    the range start instead; it sends Content-Length bytes from there.
+    """
+    file_wrapper = request.environ.get("wsgi.file_wrapper")
+    if file_wrapper is None or response.response is None:
+        # Development server, or X-Sendfile where the front end sends the file
+        return
+    file = open(path, "rb")
+    file.seek(response.content_range.start)
+    response.response.close()
+    response.response = file_wrapper(file)
 
 
 @app.route("/health", methods=["GET"])
 def health_check():
-    """Health check endpoint for Agent Zero - returns JSON-RPC in SSE format"""
-    def health_stream():
-        response_data = {
-            "jsonrpc": "2.0",
-            "id": "health",
-            "result": {
-                "status": "healthy",
-                "service": "dxf-generator",
-                "ready": True
-            }
+    """
+    Health check endpoint for Agent Zero - returns JSON-RPC in SSE format.
+    Reports render pool saturation, queue depth and cache hit rate from
+    counters the pool and cache keep up to date as they work.
+    """
+    response_data = {
+        "jsonrpc": "2.0",
+        "id": "health",
+        "result": {
+            "status": "healthy",
+            "service": "dxf-generator",
+            "ready": True,
+            "uptime_seconds": round(time.monotonic() - STARTED_AT, 1),
+            "render_pool": batch_renderer.stats(),
+            "cache": dxf_cache.stats(),
+            "jobs": jobs.stats(),
         }
-        yield f"data: {json.dumps(response_data)}\n\n"
-    
-    return Response(health_stream(), content_type="text/event-stream")
+    }
+    response = Response(sse_frame(response_data), content_type="text/event-stream")
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """
+    Counters, queue depths and stage timing histograms of this process in the
+    Prometheus text format; ?format=json returns the get_metrics summary.
+    """
+    if request.args.get("format") == "json":
+        response = Response(json.dumps(metrics.snapshot()), content_type="application/json")
+    else:
+        response = Response(metrics.exposition(), content_type="text/plain; version=0.0.4; charset=utf-8")
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+def admin_authorized():
+    expected = f"Bearer {ADMIN_TOKEN}"
+    return ADMIN_TOKEN is not None and hmac.compare_digest(request.headers.get("Authorization", ""), expected)
+
+
+@app.route("/admin/profiles/<filename>", methods=["GET"])
+def profile_endpoint(filename):
+    """
+    The cProfile run stored for a generated file: a pstats text report
+    (?sort=cumulative|tottime|calls, ?limit=N), or the .prof file itself
+    with ?format=raw for snakeviz or gprof2dot. Needs DXF_ADMIN_TOKEN.
+    """
+    if not admin_authorized():
+        return "Not found", 404
+    path = engine.profile_path(filename)
+    if path is None:
+        return "Profile not found", 404
+    if request.args.get("format") == "raw":
+        return send_file(path, mimetype="application/octet-stream", as_attachment=True,
+                         download_name=os.path.basename(path))
+    sort = request.args.get("sort", "cumulative")
+    if sort not in REPORT_SORTS:
+        return f"sort must be one of {', '.join(REPORT_SORTS)}", 400
+    limit = request.args.get("limit", 40, type=int)
+    response = Response(profile_report(path, sort, limit), content_type="text/plain; charset=utf-8")
+    response.headers["Cache-Control"] = "no-store"
+    return response
 
 
 @app.route("/status", methods=["GET"])
 def simple_status():
     """Simple JSON status for Agent Zero - JSON-RPC in SSE format"""
-    def simple_stream():
-        response_data = {
-            "jsonrpc": "2.0",
-            "id": "simple_status", 
-            "result": {
-                "status": "active",
-                "service": "dxf-generator", 
-                "ready": True
-            }
-        }
-        yield f"data: {json.dumps(response_data)}\n\n"
-    
-    return Response(simple_stream(), content_type="text/event-stream")
+    return static_sse_response(STATUS_FRAME)
+
+
+def job_status_text(job):
+    """Tool result text for a job in any state."""
+    if job["state"] == DONE:
+        filename, download_url = job["result"]["filename"], job["result"]["url"]
+        text = f" DXF generado con éxito\n📁 Archivo: {filename}\n🔗 URL: {download_url}"
+        if "profile_url" in job["result"]:
+            text += f"\n⏱️ Perfil: {job['result']['profile_url']}"
+        return text
+    if job["state"] == FAILED:
+        return f"❌ Error en el trabajo {job['id']}: {job['error']}"
+    if job["state"] == QUEUED:
+        return f"🕒 Trabajo {job['id']} en cola ({job['queued_ahead']} por delante)"
+    return f"⚙️ Trabajo {job['id']} en curso"
+
+
 @app.route("/mcp", methods=["POST"])
 def mcp_endpoint():
+    client = job_client()
+
     def mcp_stream():
         data = None
         try:
@@ -144,10 +612,149 @@ def mcp_endpoint():
                                         "prompt": {
                                             "type": "string",
                                             "description": "Descripción del plano arquitectónico"
+                                        },
+                                        "scale": {
+                                            "type": "number",
+                                            "description": "Factor de escala del dibujo",
+                                            "default": 1.0
+                                        },
+                                        "building_type": {
+                                            "type": "string",
+                                            "description": "Tipo de edificio (house, office, warehouse...); por defecto el que indique el prompt"
+                                        },
+                                        "inline": {
+                                            "type": "boolean",
+                                            "description": "Devuelve el DXF en base64 dentro del resultado en lugar de una URL",
+                                            "default": False
+                                        },
+                                        "format": {
+                                            "type": "string",
+                                            "enum": list(FORMATS),
+                                            "description": "dxf (ASCII), dxf-binary, o una vista previa json / svg",
+                                            "default": DEFAULT_FORMAT
+                                        },
+                                        "wait": {
+                                            "type": "boolean",
+                                            "description": "Espera al resultado; con false devuelve solo el job_id para consultarlo con get_job_status",
+                                            "default": True
+                                        },
+                                        "priority": {
+                                            "type": "integer",
+                                            "description": "Prioridad del trabajo; los valores más altos se generan antes",
+                                            "default": 0
+                                        },
+                                        "profile": {
+                                            "type": "boolean",
+                                            "description": "Genera el plano bajo cProfile y guarda el perfil (ver /admin/profiles)",
+                                            "default": False
+                                        }
+                                    },
+                                    "required": ["prompt"]
+                                }
+                            },
+                            {
+                                "name": "modify_dxf",
+                                "description": "Modifica un plano ya generado: añade o quita puertas, ventanas o habitaciones, o cambia su escala. Solo se redibuja lo que cambia",
+                                "inputSchema": {
+                                    "type": "object",
+                                    "properties": {
+                                        "prompt": {
+                                            "type": "string",
+                                            "description": "Prompt del plano a modificar, tal como se generó"
+                                        },
+                                        "scale": {
+                                            "type": "number",
+                                            "description": "Escala con la que se generó el plano",
+                                            "default": 1.0
+                                        },
+                                        "building_type": {
+                                            "type": "string",
+                                            "description": "Tipo de edificio con el que se generó el plano"
+                                        },
+                                        "format": {
+                                            "type": "string",
+                                            "enum": list(FORMATS),
+                                            "description": "Formato del plano",
+                                            "default": DEFAULT_FORMAT
+                                        },
+                                        "add_doors": {"type": "integer", "default": 0},
+                                        "remove_doors": {"type": "integer", "default": 0},
+                                        "add_windows": {"type": "integer", "default": 0},
+                                        "remove_windows": {"type": "integer", "default": 0},
+                                        "add_rooms": {
+                                            "type": "array",
+                                            "description": "Habitaciones a añadir",
+                                            "items": {"type": "string", "enum": sorted(ROOM_WORDS)}
+                                        },
+                                        "remove_rooms": {
+                                            "type": "array",
+                                            "description": "Habitaciones a quitar; se quita la última de cada tipo",
+                                            "items": {"type": "string", "enum": sorted(ROOM_WORDS)}
+                                        },
+                                        "new_scale": {
+                                            "type": "number",
+                                            "description": "Nueva escala del plano"
                                         }
                                     },
                                     "required": ["prompt"]
                                 }
+                            },
+                            {
+                                "name": "get_job_status",
+                                "description": "Consulta el estado y el resultado de un trabajo de generación",
+                                "inputSchema": {
+                                    "type": "object",
+                                    "properties": {
+                                        "job_id": {
+                                            "type": "string",
+                                            "description": "job_id devuelto por generate_dxf"
+                                        }
+                                    },
+                                    "required": ["job_id"]
+                                }
+                            },
+                            {
+                                "name": "get_metrics",
+                                "description": "Contadores, colas y tiempos por etapa de la generación (p50/p95/p99)",
+                                "inputSchema": {
+                                    "type": "object",
+                                    "properties": {}
+                                }
+                            },
+                            {
+                                "name": "generate_dxf_batch",
+                                "description": "Genera varios planos DXF en paralelo y devuelve un ZIP con todos",
+                                "inputSchema": {
+                                    "type": "object",
+                                    "properties": {
+                                        "items": {
+                                            "type": "array",
+                                            "description": "Lista de planos a generar: prompts, u objetos con prompt y opciones",
+                                            "items": {
+                                                "oneOf": [
+                                                    {"type": "string"},
+                                                    {
+                                                        "type": "object",
+                                                        "properties": {
+                                                            "prompt": {"type": "string"},
+                                                            "scale": {"type": "number", "default": 1.0},
+                                                            "building_type": {"type": "string"},
+                                                            "format": {"type": "string", "enum": list(FORMATS)}
+                                                        },
+                                                        "required": ["prompt"]
+                                                    }
+                                                ]
+                                            }
+                                        },
+                                        "format": {
+                                            "type": "string",
+                                            "enum": list(FORMATS),
+                                            "description": "Formato de los elementos que no indican uno",
+                                            "default": DEFAULT_FORMAT
+                                        }
+                                    },
+                                    "required": ["items"]
+                                }
                             }
                         ]
                     }
@@ -158,18 +765,144 @@ def mcp_endpoint():
                 params = data.get("params", {})
                 if params.get("name") == "generate_dxf":
                     arguments = params.get("arguments", {})
-                    prompt = arguments.get("prompt", "")
+                    spec = request_spec(arguments)
+
+                    if arguments.get("inline"):
+                        # Serialize in memory and embed the bytes; nothing is written to uploads/
+                        filename = plan_filename(spec["prompt"], spec["format"])
+                        blob = base64.b64encode(render_spec(spec)).decode("ascii")
+                        response_data = {
+                            "jsonrpc": "2.0",
+                            "id": data.get("id"),
+                            "result": {
+                                "content": [
+                                    {
+                                        "type": "text",
+                                        "text": f" DXF generado con éxito\n📁 Archivo: {filename}"
+                                    },
+                                    {
+                                        "type": "resource",
+                                        "resource": {
+                                            "uri": f"dxf:///{filename}",
+                                            "mimeType": FORMATS[spec["format"]].mime_type,
+                                            "blob": blob
+                                        }
+                                    }
+                                ]
+                            }
+                        }
+                        yield f"data: {json.dumps(response_data)}\n\n"
+                        return
 
-                    file_id = uuid.uuid4().hex
-                    filename = f"{file_id}_{prompt.replace(' ', '_')[:30]}.dxf"
+                    job = submit_generation(spec, client, arguments.get("priority"), arguments.get("profile") is True)
+                    if arguments.get("wait", True):
+                        job = wait_for_job(job["id"])
+                    text = job_status_text(job)
 
-                    doc = ezdxf.new()
-                    draw_architectural_plan(doc, prompt)
+                    response_data = {
+                        "jsonrpc": "2.0",
+                        "id": data.get("id"),
+                        "result": {
+                            "content": [
+                                {
+                                    "type": "text",
+                                    "text": text
+                                }
+                            ]
+                        }
+                    }
+                    yield f"data: {json.dumps(response_data)}\n\n"
 
-                    file_path = os.path.join("uploads", filename)
-                    doc.saveas(file_path)
+                elif params.get("name") == "modify_dxf":
+                    arguments = params.get("arguments", {})
+                    spec = request_spec(arguments)
+                    edited = edit_spec(
+                        spec,
+                        arguments.get("add_doors"), arguments.get("remove_doors"),
+                        arguments.get("add_windows"), arguments.get("remove_windows"),
+                        arguments.get("add_rooms"), arguments.get("remove_rooms"),
+                        scale=arguments.get("new_scale"),
+                    )
+
+                    # Drawn in this worker, which holds the plan's drawing from earlier edits
+                    artifact = engine.edit(spec, edited)
+                    added, removed, total = artifact.changes
+                    response_data = {
+                        "jsonrpc": "2.0",
+                        "id": data.get("id"),
+                        "result": {
+                            "content": [
+                                {
+                                    "type": "text",
+                                    "text": f" DXF modificado con éxito\n📁 Archivo: {artifact.name}\n"
+                                            f"📝 Prompt: {edited['prompt']}\n📏 Escala: {edited['scale']}\n"
+                                            f"✏️ Entidades: {added} añadidas, {removed} eliminadas, {total - added} sin cambios\n"
+                                            f"🔗 URL: {artifact.url}"
+                                }
+                            ]
+                        }
+                    }
+                    yield f"data: {json.dumps(response_data)}\n\n"
+
+                elif params.get("name") == "get_job_status":
+                    job_id = params.get("arguments", {}).get("job_id", "")
+                    job = jobs.get(job_id)
+                    response_data = {
+                        "jsonrpc": "2.0",
+                        "id": data.get("id"),
+                        "result": {
+                            "content": [
+                                {
+                                    "type": "text",
+                                    "text": job_status_text(job) if job is not None else f"❌ Trabajo no encontrado: {job_id}"
+                                }
+                            ]
+                        }
+                    }
+                    yield f"data: {json.dumps(response_data)}\n\n"
+
+                elif params.get("name") == "get_metrics":
+                    response_data = {
+                        "jsonrpc": "2.0",
+                        "id": data.get("id"),
+                        "result": {
+                            "content": [
+                                {
+                                    "type": "text",
+                                    "text": json.dumps(metrics.snapshot(), indent=2)
+                                }
+                            ]
+                        }
+                    }
+                    yield f"data: {json.dumps(response_data)}\n\n"
 
-                    download_url = f"/download/{filename}"
+                elif params.get("name") == "generate_dxf_batch":
+                    arguments = params.get("arguments", {})
+                    specs = normalize_batch_specs(
+                        arguments.get("items"), BATCH_MAX_ITEMS, normalize_format(arguments.get("format"))
+                    )
+                    progress_token = params.get("_meta", {}).get("progressToken")
+
+                    lines = {}
+                    for finished, event in enumerate(run_batch(specs), 1):
+                        if event.get("done"):
+                            zip_url = event["url"]
+                            continue
+                        if "error" in event:
+                            lines[event["index"]] = f"{event['index'] + 1}. ❌ {event['error']}"
+                        else:
+                            lines[event["index"]] = f"{event['index'] + 1}. 🔗 {event['url']}"
+                        if progress_token is not None:
+                            progress = {
+                                "jsonrpc": "2.0",
+                                "method": "notifications/progress",
+                                "params": {
+                                    "progressToken": progress_token,
+                                    "progress": finished,
+                                    "total": len(specs)
+                                }
+                            }
+                            yield f"data: {json.dumps(progress)}\n\n"
 
                     response_data = {
                         "jsonrpc": "2.0",
@@ -178,7 +911,7 @@ def mcp_endpoint():
                             "content": [
                                 {
                                     "type": "text",
-                                    "text": f" DXF generado con éxito\n📁 Archivo: {filename}\n🔗 URL: {download_url}"
+                                    "text": f" Lote generado: {len(specs)} planos\n📦 ZIP: {zip_url}\n\n" + "\n".join(lines[index] for index in sorted(lines))
                                 }
                             ]
                         }
@@ -212,17 +945,63 @@ def mcp_endpoint():
 
 @app.route("/download/<filename>")
 def download_file(filename):
-    """Serve DXF files for download"""
+    """
+    Serve DXF files for download. Conditional and Range requests are handled
+    by send_file with a strong, content-derived ETag; content-addressed names
+    are cacheable for a year since their content never changes.
+
+    Clients that accept gzip or brotli get a compressed body: a pre-compressed
+    file from the cache when one is stored, otherwise compressed on the fly.
+    """
     try:
-        file_path = os.path.join("uploads", filename)
-        if os.path.exists(file_path):
-            return send_file(file_path, as_attachment=True, download_name=filename)
-        else:
+        # Resolved through the cache index, never by joining the name onto a path
+        entry = dxf_cache.lookup(filename)
+        if entry is None:
             return "File not found", 404
+
+        # The stored representation of the file, keyed by content encoding
+        stored = {entry.encoding: entry.path}
+        file_path = entry.path
+
+        offered = [encoding for encoding in available_encodings() if encoding in stored]
+        encoding = request.accept_encodings.best_match(offered)
+        if encoding is not None:
+            # Already-compressed bytes straight from disk
+            path = stored[encoding]
+            return send_download(path, filename, stored_etag(path), encoding)
+
+        if None in stored:
+            encoding = None
+            if (filename.endswith(COMPRESSIBLE_SUFFIXES)
+                    and entry.size >= MIN_COMPRESS_SIZE):
+                encoding = request.accept_encodings.best_match(available_encodings())
+            if encoding is None:
+                return send_download(file_path, filename, stored_etag(file_path))
+
+            etag = f"{stored_etag(file_path)}-{encoding}"
+            # Nothing to compress when the client already holds this representation
+            body = b""
+            if etag not in request.if_none_match:
+                with open(file_path, "rb") as file:
+                    body = compress(file.read(), encoding)
+            return send_download(io.BytesIO(body), filename, etag, encoding)
+
+        # Only a compressed copy is stored and the client cannot decode it
+        stored_encoding, path = next(iter(stored.items()))
+        etag = f"{stored_etag(path)}-identity"
+        body = b""
+        if etag not in request.if_none_match:
+            with open(path, "rb") as file:
+                body = decompress(file.read(), stored_encoding)
+        return send_download(io.BytesIO(body), filename, etag)
+    except HTTPException:
+        # 416 for unsatisfiable ranges
+        raise
     except Exception as e:
         return f"Error: {str(e)}", 500
 
 
 if __name__ == "__main__":
+    jobs.start()
     port = int(os.environ.get("PORT", 80))
     app.run(host="0.0.0.0", port=port)
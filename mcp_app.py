@@ -0,0 +1,674 @@
+# mcp_app.py - MCP Server for DXF Generation Service (started by mcp_server.py)
+# File: /mcp_app.py
+import asyncio
+import json
+import sys
+import tempfile
+import os
+import time
+from mcp.server import Server, NotificationOptions
+from mcp.server.stdio import stdio_server
+from mcp.types import Tool, TextContent
+from appwrite_storage import UploadQueue, get_storage, storage_scope
+from artifact_index import ArtifactIndex
+from dxf_batch import BatchRenderer, normalize_batch_specs
+from dxf_cache import DXFCache
+from dxf_engine import GenerationEngine, edit_spec, load_renderer, normalize_spec, render_plan_bytes, spec_key
+from dxf_formats import DEFAULT_FORMAT, FORMATS, normalize_format
+from dxf_jobs import DONE, FAILED, QUEUED, JobQueue
+from dxf_metrics import REQUEST_SECONDS, REQUESTS, metrics, register_service_metrics, sampled
+from dxf_profiling import REPORT_SORTS, profile_report
+from prompt_features import ROOM_WORDS
+
+# Initialize the MCP server
+app = Server("dxf-generator")
+
+BATCH_MAX_ITEMS = int(os.environ.get("DXF_BATCH_MAX_ITEMS", 500))
+
+# Renders and uploads run off the event loop so the stdio server stays responsive
+MAX_CONCURRENT_RENDERS = int(os.environ.get("DXF_MAX_CONCURRENCY", 4))
+render_slots = asyncio.Semaphore(MAX_CONCURRENT_RENDERS)
+upload_queue = UploadQueue(
+    workers=int(os.environ.get("DXF_UPLOAD_WORKERS", 4)),
+    maxsize=int(os.environ.get("DXF_UPLOAD_QUEUE_SIZE", 64)),
+)
+
+# Where uploads go; cached URLs and queued jobs are only shared with server
+# processes that upload to the same endpoint, project and bucket
+STORAGE_SCOPE = storage_scope()
+
+# Rendered drawings and their Appwrite URLs, so repeated prompts skip render + upload
+dxf_cache = DXFCache(
+    os.path.join(tempfile.gettempdir(), f"dxf-cache-{STORAGE_SCOPE}"),
+    max_entries=int(os.environ.get("DXF_CACHE_MAX_ENTRIES", 512)),
+    max_bytes=int(os.environ.get("DXF_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+    max_age=int(os.environ.get("DXF_CACHE_MAX_AGE", 24 * 3600)),
+    sweep_interval=int(os.environ.get("DXF_CACHE_SWEEP_INTERVAL", 60)),
+)
+
+# Every generated drawing, kept across restarts for list_recent_dxf_files
+artifacts = ArtifactIndex(
+    os.environ.get("DXF_ARTIFACT_DB", os.path.join(os.path.expanduser("~"), ".dxf-generator", "artifacts.sqlite3")),
+    max_rows=int(os.environ.get("DXF_ARTIFACT_MAX_ROWS", 100_000)),
+)
+
+@app.list_tools()
+async def handle_list_tools() -> list[Tool]:
+    """
+    List available tools for Agent Zero to discover.
+    This replaces the need for hardcoded API specs.
+    """
+    return [
+        Tool(
+            name="generate_architectural_dxf",
+            description="Generate DXF architectural plans from text descriptions. Creates CAD drawings based on natural language input.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "prompt": {
+                        "type": "string", 
+                        "description": "Description of the architectural plan to generate (e.g., 'house with 2 doors and 3 windows')"
+                    },
+                    "scale": {
+                        "type": "number",
+                        "description": "Optional scale factor for the drawing (default: 1.0)",
+                        "default": 1.0
+                    },
+                    "building_type": {
+                        "type": "string",
+                        "description": "Type of building (house, office, warehouse, etc.); default: the one the prompt mentions, else house"
+                    },
+                    "format": {
+                        "type": "string",
+                        "enum": list(FORMATS),
+                        "description": "Output format: ASCII DXF, binary DXF (smaller, faster to parse), or a JSON/SVG preview",
+                        "default": DEFAULT_FORMAT
+                    },
+                    "wait": {
+                        "type": "boolean",
+                        "description": "Wait for the result; false returns a job id at once, to check with get_job_status",
+                        "default": True
+                    },
+                    "priority": {
+                        "type": "integer",
+                        "description": "Job priority; higher values are generated first",
+                        "default": 0
+                    },
+                    "profile": {
+                        "type": "boolean",
+                        "description": "Render under cProfile, even if cached, and keep the profile for get_profile",
+                        "default": False
+                    }
+                },
+                "required": ["prompt"]
+            }
+        ),
+        Tool(
+            name="get_job_status",
+            description="Check the state and result of a DXF generation job started by generate_architectural_dxf.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "job_id": {
+                        "type": "string",
+                        "description": "Job id returned by generate_architectural_dxf"
+                    }
+                },
+                "required": ["job_id"]
+            }
+        ),
+        Tool(
+            name="modify_architectural_dxf",
+            description="Change a generated plan: add or remove doors, windows or rooms, or redraw it at another scale. Only the parts that change are redrawn. Returns the new plan and its prompt, to pass back for further changes.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "prompt": {
+                        "type": "string",
+                        "description": "Prompt of the plan to change, as it was generated"
+                    },
+                    "scale": {
+                        "type": "number",
+                        "description": "Scale the plan was generated at",
+                        "default": 1.0
+                    },
+                    "building_type": {
+                        "type": "string",
+                        "description": "Building type the plan was generated with, if one was given"
+                    },
+                    "format": {
+                        "type": "string",
+                        "enum": list(FORMATS),
+                        "description": "Output format of the plan",
+                        "default": DEFAULT_FORMAT
+                    },
+                    "add_doors": {"type": "integer", "default": 0},
+                    "remove_doors": {"type": "integer", "default": 0},
+                    "add_windows": {"type": "integer", "default": 0},
+                    "remove_windows": {"type": "integer", "default": 0},
+                    "add_rooms": {
+                        "type": "array",
+                        "description": "Rooms to add",
+                        "items": {"type": "string", "enum": sorted(ROOM_WORDS)}
+                    },
+                    "remove_rooms": {
+                        "type": "array",
+                        "description": "Rooms to remove; the last one of each kind goes",
+                        "items": {"type": "string", "enum": sorted(ROOM_WORDS)}
+                    },
+                    "new_scale": {
+                        "type": "number",
+                        "description": "Redraw the plan at this scale"
+                    }
+                },
+                "required": ["prompt"]
+            }
+        ),
+        Tool(
+            name="generate_dxf_batch",
+            description="Generate many DXF plans in parallel and bundle them into a ZIP. Reports progress as each plan finishes.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "items": {
+                        "type": "array",
+                        "description": "Plans to generate: prompts, or objects with a prompt and options",
+                        "items": {
+                            "oneOf": [
+                                {"type": "string"},
+                                {
+                                    "type": "object",
+                                    "properties": {
+                                        "prompt": {"type": "string"},
+                                        "scale": {"type": "number", "default": 1.0},
+                                        "building_type": {"type": "string"},
+                                        "format": {"type": "string", "enum": list(FORMATS)}
+                                    },
+                                    "required": ["prompt"]
+                                }
+                            ]
+                        }
+                    },
+                    "format": {
+                        "type": "string",
+                        "enum": list(FORMATS),
+                        "description": "Output format for items that do not set their own",
+                        "default": DEFAULT_FORMAT
+                    }
+                },
+                "required": ["items"]
+            }
+        ),
+        Tool(
+            name="get_metrics",
+            description="Request and generation counters, queue depths and per-stage timings (p50/p95/p99) of this server.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "format": {
+                        "type": "string",
+                        "enum": ["summary", "prometheus"],
+                        "description": "JSON summary, or the raw Prometheus text exposition",
+                        "default": "summary"
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="get_profile",
+            description="Report of a profiled render (generate_architectural_dxf with profile=true): the functions it spent its time in.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "profile": {
+                        "type": "string",
+                        "description": "Profile name returned by the profiled generation"
+                    },
+                    "sort": {
+                        "type": "string",
+                        "enum": list(REPORT_SORTS),
+                        "description": "Order functions by cumulative time, own time or call count",
+                        "default": "cumulative"
+                    },
+                    "limit": {
+                        "type": "number",
+                        "description": "Number of functions to list",
+                        "default": 40
+                    }
+                },
+                "required": ["profile"]
+            }
+        ),
+        Tool(
+            name="list_recent_dxf_files",
+            description="List previously generated DXF files, newest first. Filter by building type, format or prompt text and page through the history.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "limit": {
+                        "type": "number",
+                        "description": "Maximum number of files to return",
+                        "default": 10
+                    },
+                    "cursor": {
+                        "type": "number",
+                        "description": "Next-page cursor returned by a previous call"
+                    },
+                    "building_type": {
+                        "type": "string",
+                        "description": "Only files of this building type"
+                    },
+                    "format": {
+                        "type": "string",
+                        "enum": list(FORMATS),
+                        "description": "Only files in this output format"
+                    },
+                    "search": {
+                        "type": "string",
+                        "description": "Words the prompt must contain (prefix match, e.g. 'kitch')"
+                    }
+                }
+            }
+        )
+    ]
+
+# Largest page list_recent_dxf_files returns
+MAX_LIST_LIMIT = 100
+
+def remember_file(filename, prompt, url, scale, building_type, fmt=DEFAULT_FORMAT,
+                  size=None, generation_ms=None, cached=False):
+    """Record a generated file in the persistent artifact index."""
+    artifacts.record(filename, prompt, url, scale, building_type, fmt,
+                     size=size, generation_ms=generation_ms, cached=cached)
+
+# Single and batch renders share one worker pool, warmed up once the server
+# is answering requests (see main); workers load the drawing code as they start
+plan_renderer = BatchRenderer(
+    render_plan_bytes,
+    max_workers=int(os.environ.get("DXF_BATCH_WORKERS", 0)) or None,
+    kind=os.environ.get("DXF_RENDER_EXECUTOR", "process"),
+    initializer=load_renderer,
+)
+
+def publish_plan(filename, data):
+    """Engine publish hook, run in a job worker thread: upload through the bounded queue."""
+    # Bytes go straight into the upload body; no temp file to write, reread or collide on
+    return upload_queue.submit(upload_data_to_appwrite, data, filename).result()
+
+# Rendering, caching and publishing shared with the HTTP app in main.py
+engine = GenerationEngine(dxf_cache, plan_renderer, publish_plan,
+                          max_plans=int(os.environ.get("DXF_PLAN_STATES", 16)))
+
+def run_plan_job(spec, report):
+    """
+    Job handler, run in a job worker thread: render and upload one plan,
+    unless the cache already has it, and record it in the artifact index.
+    """
+    artifact = engine.generate(spec, report, profile=spec.get("profile", False))
+    remember_file(artifact.name, spec["prompt"], artifact.url, spec["scale"], spec["building_type"], spec["format"],
+                  size=artifact.size, generation_ms=artifact.generation_ms, cached=artifact.cached)
+    result = {"filename": artifact.name, "url": artifact.url, "cached": artifact.cached,
+              "size": artifact.size, "generation_ms": artifact.generation_ms}
+    if artifact.profiled:
+        result["profile"] = artifact.filename
+    return result
+
+# Single generations run as durable jobs: queued work survives a restart and
+# can be followed with get_job_status instead of holding the tool call open.
+# Every server process of the user shares the database (one per Agent Zero
+# session), but each only runs jobs meant for its own Appwrite bucket.
+jobs = JobQueue(
+    os.environ.get("DXF_JOB_DB", os.path.join(os.path.expanduser("~"), ".dxf-generator", "jobs.sqlite3")),
+    run_plan_job,
+    workers=int(os.environ.get("DXF_JOB_WORKERS", MAX_CONCURRENT_RENDERS)),
+    scope=STORAGE_SCOPE,
+)
+
+register_service_metrics(dxf_cache, plan_renderer, jobs, upload_queue)
+
+def job_status_text(job):
+    """Tool result text for a job in any state."""
+    spec = job["spec"]
+    if job["state"] == DONE:
+        result = job["result"]
+        return (f"✅ Successfully generated DXF file: {result['filename']}\n"
+                f"📝 Based on prompt: {spec['prompt']}\n"
+                f"📏 Scale: {spec['scale']}\n"
+                f"🏢 Building type: {spec['building_type']}\n"
+                f"📄 Format: {spec['format']}\n"
+                f"🔗 Download URL: {result['url']}\n"
+                + (f"⏱️ Profile: {result['profile']} (see get_profile)\n" if "profile" in result else "")
+                + "\n💡 The DXF file contains architectural elements based on your description and can be opened in any CAD software.")
+    if job["state"] == FAILED:
+        return (f"❌ Error generating DXF: {job['error']}\n"
+                f"Please check your prompt and try again. Make sure all environment variables are properly configured.")
+    if job["state"] == QUEUED:
+        return (f"🕒 Job {job['id']} is queued ({job['queued_ahead']} ahead of it)\n"
+                f"📝 Prompt: {spec['prompt']}\n"
+                f"💡 Call get_job_status with this job id for the result.")
+    return (f"⚙️ Job {job['id']} is running ({job['stage'] or 'starting'})\n"
+            f"📝 Prompt: {spec['prompt']}\n"
+            f"💡 Call get_job_status with this job id for the result.")
+
+async def generate_batch(specs):
+    """
+    Generate specs with the engine in a worker thread: renders go to the
+    process pool, uploads through the upload queue. Each plan is recorded
+    and progress reported as it finishes.
+    Returns (outcomes, zip_url) where outcomes[i] is an Artifact or an Exception.
+    """
+    try:
+        ctx = app.request_context
+        progress_token = ctx.meta.progressToken if ctx.meta else None
+    except LookupError:
+        # Called outside of a tool request, nobody to report progress to
+        progress_token = None
+    
+    loop = asyncio.get_running_loop()
+    finished = 0
+    
+    def report(index, outcome):
+        # Runs in the engine's thread, as each item finishes
+        nonlocal finished
+        finished += 1
+        if not isinstance(outcome, Exception):
+            spec = specs[index]
+            remember_file(outcome.name, spec["prompt"], outcome.url, spec["scale"], spec["building_type"], spec["format"],
+                          size=outcome.size, generation_ms=outcome.generation_ms, cached=outcome.cached)
+        if progress_token is not None:
+            asyncio.run_coroutine_threadsafe(
+                ctx.session.send_progress_notification(progress_token, finished, len(specs)), loop
+            ).result()
+    
+    outcomes, archive = await asyncio.to_thread(engine.generate_batch, specs, report)
+    return outcomes, archive.url
+
+@app.call_tool()
+async def handle_call_tool(name: str, arguments: dict) -> list[TextContent]:
+    """
+    Handle tool calls from Agent Zero, counting and (sampled) timing each one.
+    """
+    started = time.perf_counter() if sampled() else None
+    status = "error"
+    try:
+        result = await call_tool(name, arguments)
+        status = "ok"
+        return result
+    finally:
+        REQUESTS.inc(transport="mcp", endpoint=name, status=status)
+        if started is not None:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, transport="mcp", endpoint=name)
+
+async def call_tool(name, arguments):
+    """
+    This is where the actual DXF generation logic executes.
+    """
+    if name == "generate_architectural_dxf":
+        try:
+            spec = normalize_spec(
+                arguments.get("prompt"),
+                arguments.get("scale", 1.0),
+                arguments.get("building_type"),
+                arguments.get("format"),
+            )
+            
+            # Queued in the durable job store; the render and upload happen in a job worker.
+            # An identical job already queued or running is joined instead of repeated,
+            # unless this one is to be profiled.
+            if arguments.get("profile") is True:
+                job = jobs.submit(dict(spec, profile=True), "mcp", arguments.get("priority"))
+            else:
+                job = jobs.submit(spec, "mcp", arguments.get("priority"), key=spec_key(spec))
+            if arguments.get("wait", True):
+                job = await asyncio.wrap_future(jobs.future(job["id"]))
+            
+            return [
+                TextContent(
+                    type="text",
+                    text=job_status_text(job)
+                )
+            ]
+            
+        except Exception as e:
+            return [
+                TextContent(
+                    type="text", 
+                    text=f"❌ Error generating DXF: {str(e)}\n"
+                         f"Please check your prompt and try again. Make sure all environment variables are properly configured."
+                )
+            ]
+    
+    elif name == "generate_dxf_batch":
+        try:
+            specs = normalize_batch_specs(
+                arguments.get("items"), BATCH_MAX_ITEMS, normalize_format(arguments.get("format"))
+            )
+            results, zip_url = await generate_batch(specs)
+            
+            lines = []
+            for i, result in enumerate(results, 1):
+                if isinstance(result, Exception):
+                    lines.append(f"{i}. ❌ {result}")
+                else:
+                    lines.append(f"{i}. **{result.name}**\n   🔗 URL: {result.url}")
+            failed = sum(isinstance(result, Exception) for result in results)
+            
+            return [
+                TextContent(
+                    type="text",
+                    text=f"✅ Generated {len(results) - failed} of {len(results)} DXF files\n"
+                         f"📦 ZIP: {zip_url}\n\n" + "\n".join(lines)
+                )
+            ]
+            
+        except Exception as e:
+            return [
+                TextContent(
+                    type="text",
+                    text=f"❌ Error generating batch: {str(e)}"
+                )
+            ]
+    
+    elif name == "modify_architectural_dxf":
+        try:
+            spec = normalize_spec(
+                arguments.get("prompt"),
+                arguments.get("scale", 1.0),
+                arguments.get("building_type"),
+                arguments.get("format"),
+            )
+            edited = edit_spec(
+                spec,
+                arguments.get("add_doors"), arguments.get("remove_doors"),
+                arguments.get("add_windows"), arguments.get("remove_windows"),
+                arguments.get("add_rooms"), arguments.get("remove_rooms"),
+                scale=arguments.get("new_scale"),
+            )
+            
+            # The plan's drawing is held in this process, so the edit runs in a thread here, not in the pool
+            async with render_slots:
+                artifact = await asyncio.to_thread(engine.edit, spec, edited)
+            remember_file(artifact.name, edited["prompt"], artifact.url, edited["scale"], edited["building_type"],
+                          edited["format"], size=artifact.size, generation_ms=artifact.generation_ms,
+                          cached=artifact.cached)
+            added, removed, total = artifact.changes
+            
+            return [
+                TextContent(
+                    type="text",
+                    text=f"✅ Modified DXF file: **{artifact.name}**\n\n"
+                         f"📝 Prompt: {edited['prompt']}\n"
+                         f"📏 Scale: {edited['scale']}\n"
+                         f"🏢 Building type: {edited['building_type']}\n"
+                         f"✏️ Redrawn: {added} entities added, {removed} removed, {total - added} unchanged\n"
+                         f"🔗 URL: {artifact.url}\n\n"
+                         f"To change this plan again, pass the prompt and scale above."
+                )
+            ]
+            
+        except Exception as e:
+            return [
+                TextContent(
+                    type="text",
+                    text=f"❌ Error modifying DXF: {str(e)}"
+                )
+            ]
+    
+    elif name == "get_job_status":
+        job = jobs.get(arguments.get("job_id", ""))
+        if job is None:
+            return [
+                TextContent(
+                    type="text",
+                    text=f"❌ Unknown job: {arguments.get('job_id')}"
+                )
+            ]
+        return [
+            TextContent(
+                type="text",
+                text=job_status_text(job)
+            )
+        ]
+    
+    elif name == "get_metrics":
+        if arguments.get("format") == "prometheus":
+            text = metrics.exposition()
+        else:
+            text = json.dumps(metrics.snapshot(), indent=2)
+        return [
+            TextContent(
+                type="text",
+                text=text
+            )
+        ]
+    
+    elif name == "get_profile":
+        try:
+            path = engine.profile_path(arguments.get("profile", ""))
+            if path is None:
+                return [
+                    TextContent(
+                        type="text",
+                        text=f"❌ No profile stored for: {arguments.get('profile')}"
+                    )
+                ]
+            report = await asyncio.to_thread(
+                profile_report, path, arguments.get("sort", "cumulative"), int(arguments.get("limit", 40))
+            )
+            return [
+                TextContent(
+                    type="text",
+                    text=f"⏱️ Profile of {arguments['profile']}\n💾 {path}\n\n{report}"
+                )
+            ]
+            
+        except Exception as e:
+            return [
+                TextContent(
+                    type="text",
+                    text=f"❌ Error reading profile: {str(e)}"
+                )
+            ]
+    
+    elif name == "list_recent_dxf_files":
+        try:
+            limit = max(1, min(int(arguments.get("limit", 10)), MAX_LIST_LIMIT))
+            fmt = arguments.get("format")
+            recent_subset, next_cursor = artifacts.recent(
+                limit,
+                before=arguments.get("cursor"),
+                building_type=arguments.get("building_type"),
+                fmt=normalize_format(fmt) if fmt else None,
+                search=arguments.get("search"),
+            )
+            
+            if not recent_subset:
+                return [
+                    TextContent(
+                        type="text",
+                        text="📁 No matching DXF files have been generated yet.\n"
+                             "Use the 'generate_architectural_dxf' tool to create some!"
+                    )
+                ]
+            
+            lines = ["📁 Recent DXF Files:\n"]
+            for i, file_info in enumerate(recent_subset, 1):
+                created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(file_info["created"]))
+                if file_info["cached"]:
+                    generated = "reused from cache"
+                elif file_info["generation_ms"] is not None:
+                    generated = f"rendered in {file_info['generation_ms']:.0f} ms"
+                else:
+                    generated = "rendered"
+                lines.append(
+                    f"{i}. **{file_info['filename']}**\n"
+                    f"   📝 Prompt: {file_info['prompt']}\n"
+                    f"   📏 Scale: {file_info['scale']}\n"
+                    f"   🏢 Type: {file_info['building_type']}\n"
+                    f"   📄 Format: {file_info['format']} ({file_info['size'] or 0:,} bytes)\n"
+                    f"   🕒 {created}, {generated}\n"
+                    f"   🔗 URL: {file_info['url']}\n"
+                )
+            if next_cursor is not None:
+                lines.append(f"➡️ More files: call again with cursor={next_cursor}")
+            
+            return [
+                TextContent(
+                    type="text",
+                    text="\n".join(lines)
+                )
+            ]
+            
+        except Exception as e:
+            return [
+                TextContent(
+                    type="text",
+                    text=f"❌ Error listing files: {str(e)}"
+                )
+            ]
+    else:
+        raise ValueError(f"Unknown tool: {name}")
+
+async def upload_to_appwrite(data, filename):
+    """
+    Upload bytes (or a binary file object) to Appwrite storage through the
+    bounded upload queue, so the blocking HTTP call does not stall the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    # submit() blocks while the queue is full, so wait for a slot off the loop
+    future = await loop.run_in_executor(None, upload_queue.submit, upload_data_to_appwrite, data, filename)
+    return await asyncio.wrap_future(future)
+
+def upload_data_to_appwrite(data, filename):
+    """
+    Upload to Appwrite storage with the shared pooled client, which retries
+    transient failures. Validates environment variables on first use.
+    """
+    return get_storage().upload(data, filename)
+
+async def main():
+    """
+    Main function to run the MCP server using stdio transport.
+    This enables Agent Zero to communicate with the server via stdin/stdout.
+    """
+    try:
+        # Resume jobs that were still queued when the server last stopped
+        jobs.start()
+        
+        # ezdxf and the render pool are not needed to answer initialize or
+        # list_tools, so they load in the background while the client connects
+        asyncio.get_running_loop().run_in_executor(None, plan_renderer.warm)
+        
+        # Run the MCP server using stdio transport
+        async with stdio_server() as (read_stream, write_stream):
+            await app.run(
+                read_stream, 
+                write_stream,
+                app.create_initialization_options(
+                    notification_options=NotificationOptions(),
+                    experimental_capabilities={}
+                )
+            )
+    except Exception as e:
+        print(f"Error starting MCP server: {e}", file=sys.stderr)
+        raise
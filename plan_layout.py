@@ -0,0 +1,183 @@
+# plan_layout.py - Declarative plan geometry computed in bulk with NumPy
+# File: /plan_layout.py
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+# Outer walls, in the order openings are handed out to them
+FRONT, BACK, LEFT, RIGHT = range(4)
+WALL_NAMES = ("front", "back", "left", "right")
+
+# Per wall: direction along the wall and the normal pointing into the building
+WALL_DIRECTIONS = np.array([(1.0, 0.0), (1.0, 0.0), (0.0, 1.0), (0.0, 1.0)])
+WALL_NORMALS = np.array([(0.0, 1.0), (0.0, -1.0), (1.0, 0.0), (-1.0, 0.0)])
+
+# Door swing arcs (start, end angle in degrees), hinged at the door start and
+# opening into the building
+DOOR_SWING_ANGLES = np.array([(0.0, 90.0), (270.0, 360.0), (0.0, 90.0), (90.0, 180.0)])
+
+DOOR, WINDOW = 0, 1
+
+# Opening sizes in drawing units (mm) before scaling
+DOOR_WIDTH = 800
+WINDOW_WIDTH = 1200
+WINDOW_DEPTH = 150
+OPENING_GAP = 200
+
+
+@dataclass
+class PlanLayout:
+    """
+    Intermediate representation of a plan: outer walls as segments, openings
+    as parametric positions along them, interior partitions and room labels.
+    All geometry is held in arrays so thousands of elements cost the same
+    handful of NumPy operations as ten.
+    """
+    spec: object
+    width: float
+    height: float
+    walls: np.ndarray              # (4, 4) x1, y1, x2, y2 for FRONT, BACK, LEFT, RIGHT
+    opening_kind: np.ndarray       # (n,) DOOR or WINDOW
+    opening_wall: np.ndarray       # (n,) wall index
+    opening_offset: np.ndarray     # (n,) distance of the opening start from the wall start
+    opening_width: np.ndarray      # (n,) opening width along the wall
+    window_depth: float
+    partitions: np.ndarray         # (k, 4) interior wall segments
+    room_labels: list
+    room_centers: np.ndarray       # (m, 2)
+    room_text_height: float
+
+    @property
+    def doors(self):
+        return self.opening_kind == DOOR
+
+    @property
+    def windows(self):
+        return self.opening_kind == WINDOW
+
+    def opening_segments(self, mask):
+        """(n, 4) segments covered by the selected openings."""
+        wall = self.opening_wall[mask]
+        start = self.walls[wall, :2] + WALL_DIRECTIONS[wall] * self.opening_offset[mask, None]
+        end = start + WALL_DIRECTIONS[wall] * self.opening_width[mask, None]
+        return np.hstack([start, end])
+
+    def door_segments(self):
+        return self.opening_segments(self.doors)
+
+    def window_segments(self):
+        return self.opening_segments(self.windows)
+
+    def door_arcs(self):
+        """Centers (n, 2), radii (n,) and start/end angles (n, 2) of door swings."""
+        segments = self.door_segments()
+        wall = self.opening_wall[self.doors]
+        return segments[:, :2], self.opening_width[self.doors], DOOR_SWING_ANGLES[wall]
+
+    def window_frames(self):
+        """(n, 4, 2) corners of each window frame, drawn on the inside of the wall."""
+        segments = self.window_segments()
+        depth = WALL_NORMALS[self.opening_wall[self.windows]] * self.window_depth
+        start, end = segments[:, :2], segments[:, 2:]
+        return np.stack([start, end, end + depth, start + depth], axis=1)
+
+    def outline(self):
+        return [(0, 0), (self.width, 0), (self.width, self.height), (0, self.height)]
+
+
+def distribute(count, walls=4):
+    """Wall index for each of count openings, handed out round-robin."""
+    return np.arange(count) % walls
+
+
+def layout_plan(spec):
+    """
+    Compute the full plan geometry for a PlanSpec. The footprint grows past
+    the building type's base size when the requested openings would not fit.
+    """
+    scale = spec.scale
+    gap = OPENING_GAP * scale
+
+    kind = np.concatenate([
+        np.full(spec.doors, DOOR, dtype=np.int8),
+        np.full(spec.windows, WINDOW, dtype=np.int8),
+    ])
+    wall = np.concatenate([distribute(spec.doors), distribute(spec.windows)])
+    opening_width = np.where(kind == DOOR, DOOR_WIDTH * scale, WINDOW_WIDTH * scale)
+
+    # Openings per wall, and each opening's slot on its wall (doors first)
+    per_wall = np.bincount(wall, minlength=4)
+    order = np.argsort(wall, kind="stable")
+    first_slot = np.concatenate([[0], np.cumsum(per_wall)[:-1]])
+    slot = np.empty_like(wall)
+    slot[order] = np.arange(len(wall)) - first_slot[wall[order]]
+
+    # Evenly spaced slots need room for the widest opening plus a gap each
+    pitch = WINDOW_WIDTH * scale + gap if spec.windows else DOOR_WIDTH * scale + gap
+    needed = (per_wall + 1) * pitch
+    width = max(spec.width, needed[FRONT], needed[BACK])
+    height = max(spec.height, needed[LEFT], needed[RIGHT])
+
+    walls = np.array([
+        (0.0, 0.0, width, 0.0),
+        (0.0, height, width, height),
+        (0.0, 0.0, 0.0, height),
+        (width, 0.0, width, height),
+    ])
+    wall_length = np.array([width, width, height, height])
+
+    center = wall_length[wall] * (slot + 1) / (per_wall[wall] + 1)
+    opening_offset = center - opening_width / 2
+
+    partitions, room_labels, room_centers, room_text_height = layout_rooms(spec, width, height)
+
+    return PlanLayout(
+        spec=spec,
+        width=width,
+        height=height,
+        walls=walls,
+        opening_kind=kind,
+        opening_wall=wall,
+        opening_offset=opening_offset,
+        opening_width=opening_width,
+        window_depth=WINDOW_DEPTH * scale,
+        partitions=partitions,
+        room_labels=room_labels,
+        room_centers=room_centers,
+        room_text_height=room_text_height,
+    )
+
+
+def layout_rooms(spec, width, height):
+    """
+    Split the footprint into a grid with one cell per room.
+    Returns (partitions, labels, centers, text height).
+    """
+    if not spec.rooms:
+        return np.empty((0, 4)), [], np.empty((0, 2)), 0.0
+
+    labels = [room.title() for room in spec.rooms]
+    if len(labels) < 2:
+        labels.insert(0, "Living Room")
+
+    count = len(labels)
+    # Roughly square cells regardless of the footprint's aspect ratio
+    cols = max(1, min(count, round(math.sqrt(count * width / height))))
+    rows = math.ceil(count / cols)
+    cell_width, cell_height = width / cols, height / rows
+
+    xs = np.arange(1, cols) * cell_width
+    ys = np.arange(1, rows) * cell_height
+    partitions = np.vstack([
+        np.column_stack([xs, np.zeros_like(xs), xs, np.full_like(xs, height)]),
+        np.column_stack([np.zeros_like(ys), ys, np.full_like(ys, width), ys]),
+    ])
+
+    index = np.arange(count)
+    centers = np.column_stack([
+        (index % cols + 0.5) * cell_width,
+        (index // cols + 0.5) * cell_height,
+    ])
+    text_height = min(200 * spec.scale, cell_height / 4)
+    return partitions, labels, centers, text_height
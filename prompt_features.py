@@ -0,0 +1,172 @@
+# prompt_features.py - Single-pass prompt analysis into a structured plan spec
+# File: /prompt_features.py
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+# One alternation for every feature keyword. Longer words come first so
+# "bedroom" is not also counted as "room". Matches are substrings on purpose:
+# "doors" and "doorway" both count as a door mention.
+FEATURE_PATTERN = re.compile(
+    r"door|window|living room|dining room|bedroom|bathroom|kitchen|room"
+    r"|house|home|residential|office|commercial|warehouse|industrial"
+)
+
+# Upper bound for any single count so a prompt cannot ask for millions of entities
+MAX_FEATURE_COUNT = 1000
+
+ROOM_WORDS = {"living room", "dining room", "bedroom", "bathroom", "kitchen", "room"}
+
+BUILDING_TYPE_ALIASES = {
+    "house": "house",
+    "home": "house",
+    "residential": "house",
+    "office": "office",
+    "commercial": "office",
+    "warehouse": "warehouse",
+    "industrial": "warehouse",
+}
+
+# Base footprint in drawing units (mm) per building type, before scaling
+BUILDING_DIMENSIONS = {
+    "house": (8000, 6000),       # 8m x 6m
+    "office": (12000, 8000),     # 12m x 8m
+    "warehouse": (20000, 15000), # 20m x 15m
+}
+DEFAULT_DIMENSIONS = (6000, 4000)
+
+
+@dataclass(frozen=True)
+class PromptFeatures:
+    """What a prompt asks for, independent of scale or explicit arguments."""
+    doors: int
+    windows: int
+    rooms: tuple
+    building_type: str | None
+
+
+@dataclass(frozen=True)
+class PlanSpec:
+    """Everything the drawing code needs to lay out one plan."""
+    prompt: str
+    scale: float
+    building_type: str
+    width: float
+    height: float
+    doors: int
+    windows: int
+    rooms: tuple
+
+
+def normalize_prompt(prompt):
+    """Lowercase and collapse whitespace; the memoization key for features."""
+    return " ".join(prompt.lower().split())
+
+
+def count_before(text, start):
+    """
+    The number written right before text[start] ("3 windows"), or None.
+    Looked up only for actual matches; a leading optional count group in
+    FEATURE_PATTERN would make the scan try it at every position instead.
+    """
+    end = start
+    if end and text[end - 1] == " ":
+        end -= 1
+    begin = end
+    while begin and text[begin - 1].isdigit():
+        begin -= 1
+    if begin == end:
+        return None
+    return min(int(text[begin:end]), MAX_FEATURE_COUNT)
+
+
+def extract_features(prompt):
+    """Analyze prompt in one regex pass. Results are memoized per normalized prompt."""
+    return _extract_features(normalize_prompt(prompt))
+
+
+@lru_cache(maxsize=1024)
+def _extract_features(normalized):
+    mentions = {"door": 0, "window": 0}
+    explicit = {}
+    rooms = []
+    building_type = None
+
+    for match in FEATURE_PATTERN.finditer(normalized):
+        word = match.group()
+        if word in mentions:
+            mentions[word] += 1
+            # The first explicit number wins, e.g. "3 windows"
+            if word not in explicit:
+                count = count_before(normalized, match.start())
+                if count is not None:
+                    explicit[word] = count
+        elif word in ROOM_WORDS:
+            count = count_before(normalized, match.start())
+            # Every mention adds rooms, so the total is capped, not just each count
+            count = min(count if count is not None else 1, MAX_FEATURE_COUNT - len(rooms))
+            rooms.extend([word] * count)
+        elif building_type is None:
+            building_type = BUILDING_TYPE_ALIASES[word]
+
+    # "door door door ..." counts mentions, which need the same cap as numbers
+    return PromptFeatures(
+        doors=min(max(mentions["door"], explicit.get("door", 0)), MAX_FEATURE_COUNT),
+        windows=min(max(mentions["window"], explicit.get("window", 0)), MAX_FEATURE_COUNT),
+        rooms=tuple(rooms),
+        building_type=building_type,
+    )
+
+
+def building_dimensions(building_type, scale=1.0):
+    """Scaled (width, height) of the outer walls for a building type."""
+    canonical = BUILDING_TYPE_ALIASES.get(building_type.lower())
+    width, height = BUILDING_DIMENSIONS.get(canonical, DEFAULT_DIMENSIONS)
+    return width * scale, height * scale
+
+
+def build_plan_spec(prompt, scale=1.0, building_type=None):
+    """
+    Combine prompt features with the explicit arguments. An explicit
+    building_type wins over one mentioned in the prompt; "house" is the fallback.
+    """
+    features = extract_features(prompt)
+    building_type = building_type or features.building_type or "house"
+    width, height = building_dimensions(building_type, scale)
+    return PlanSpec(
+        prompt=prompt,
+        scale=scale,
+        building_type=building_type,
+        width=width,
+        height=height,
+        doors=features.doors,
+        windows=features.windows,
+        rooms=features.rooms,
+    )
+
+
+def describe_plan(building_type, doors, windows, rooms):
+    """
+    A prompt that extract_features reads back as exactly these features,
+    e.g. "house with 2 doors, 3 windows, 2 bedrooms and kitchen". Names plans
+    made by editing another one, so they cache and render like any prompt.
+    """
+    parts = [plural_phrase(count, word) for count, word in ((doors, "door"), (windows, "window")) if count]
+    # Consecutive rooms of a kind are grouped; the order of rooms is kept
+    run_start = 0
+    for index in range(1, len(rooms) + 1):
+        if index == len(rooms) or rooms[index] != rooms[run_start]:
+            parts.append(plural_phrase(index - run_start, rooms[run_start]))
+            run_start = index
+
+    # Unknown building types could contain feature words ("showroom")
+    subject = building_type if building_type in BUILDING_TYPE_ALIASES else "building"
+    if not parts:
+        return subject
+    if len(parts) == 1:
+        return f"{subject} with {parts[0]}"
+    return f"{subject} with {', '.join(parts[:-1])} and {parts[-1]}"
+
+
+def plural_phrase(count, word):
+    return word if count == 1 else f"{count} {word}s"
@@ -0,0 +1,161 @@
+# test_cache.py - Tests for the sharded, swept DXF cache (dxf_cache.py)
+# File: /test_cache.py
+#
+# Usage: python -m pytest test_cache.py
+import os
+import time
+
+from dxf_cache import DXFCache, TOUCH_INTERVAL
+
+KEYS = [f"{n:032x}" for n in range(1, 6)]
+
+
+def make_cache(tmp_path, **kwargs):
+    kwargs.setdefault("sweep_interval", 0)
+    return DXFCache(str(tmp_path / "cache"), **kwargs)
+
+
+def put(cache, key, data=b"0\nSECTION\n0\nEOF\n"):
+    return cache.put(key, f"{key}_plan.dxf", data, url=f"https://files/{key}")
+
+
+def backdate(cache, key, created=None, last_access=None):
+    with cache._db() as db:
+        if created is not None:
+            db.execute("UPDATE artifacts SET created = ? WHERE key = ?", (created, key))
+        if last_access is not None:
+            db.execute("UPDATE artifacts SET last_access = ? WHERE key = ?", (last_access, key))
+
+
+def counted(cache):
+    """Entries and bytes as the index actually holds them, to check the trigger-kept totals."""
+    return cache._db().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+
+
+def test_files_are_sharded_by_key(tmp_path):
+    cache = make_cache(tmp_path)
+    entry = put(cache, KEYS[0])
+    assert entry.path == os.path.join(cache.directory, KEYS[0][:2], KEYS[0][2:4], f"{KEYS[0]}_plan.dxf")
+    assert cache.get(KEYS[0]).url == f"https://files/{KEYS[0]}"
+
+
+def test_sweep_evicts_expired_entries(tmp_path):
+    cache = make_cache(tmp_path, max_age=3600)
+    old, fresh = put(cache, KEYS[0]), put(cache, KEYS[1])
+    backdate(cache, KEYS[0], created=time.time() - 7200)
+
+    # Expired entries already miss before the sweeper gets to them
+    assert cache.get(KEYS[0]) is None
+    assert cache.sweep() == 1
+    assert not os.path.exists(old.path)
+    assert os.path.exists(fresh.path)
+    assert cache.stats()["entries"] == 1
+
+
+def test_sweep_evicts_least_recently_used_over_the_entry_quota(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2)
+    now = time.time()
+    for age, key in zip((300, 200, 100), KEYS):
+        put(cache, key)
+        backdate(cache, key, last_access=now - age)
+
+    # A hit on the oldest entry makes it the most recently used
+    assert cache.get(KEYS[0]) is not None
+    assert cache.sweep() == 1
+    assert cache.get(KEYS[1]) is None
+    assert cache.get(KEYS[0]) is not None and cache.get(KEYS[2]) is not None
+
+
+def test_recent_hits_do_not_rewrite_last_access(tmp_path):
+    cache = make_cache(tmp_path)
+    put(cache, KEYS[0])
+    stamp = time.time() - TOUCH_INTERVAL / 2
+    backdate(cache, KEYS[0], last_access=stamp)
+    cache.get(KEYS[0])
+    assert cache._db().execute("SELECT last_access FROM artifacts").fetchone()[0] == stamp
+
+
+def test_sweep_evicts_until_under_the_byte_quota(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=250)
+    now = time.time()
+    for age, key in zip((400, 300, 200, 100), KEYS):
+        put(cache, key, b"x" * 100)
+        backdate(cache, key, last_access=now - age)
+
+    assert cache.sweep() == 2
+    assert [cache.get(key) is not None for key in KEYS[:4]] == [False, False, True, True]
+    assert cache.stats()["bytes"] == 200
+
+
+def test_totals_follow_inserts_overwrites_and_evictions(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2)
+    put(cache, KEYS[0], b"a" * 10)
+    put(cache, KEYS[1], b"b" * 20)
+    put(cache, KEYS[0], b"a" * 35)
+    put(cache, KEYS[2], b"c" * 5)
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"]) == counted(cache) == (3, 60)
+
+    cache.sweep()
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"]) == counted(cache)
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+
+
+def test_lookup_drops_an_entry_whose_file_is_missing(tmp_path):
+    cache = make_cache(tmp_path)
+    entry = put(cache, KEYS[0], b"x" * 50)
+    profile = cache.put_sidecar(entry, ".prof", b"profile")
+    os.unlink(entry.path)
+
+    assert cache.get(KEYS[0]) is None
+    assert not os.path.exists(profile)
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"]) == counted(cache) == (0, 0)
+
+    # The next render stores it again
+    put(cache, KEYS[0], b"x" * 50)
+    assert cache.get(KEYS[0]) is not None
+
+
+def test_sidecars_are_evicted_with_their_entry(tmp_path):
+    cache = make_cache(tmp_path, max_age=60)
+    entry = put(cache, KEYS[0])
+    profile = cache.put_sidecar(entry, ".prof", b"profile")
+    backdate(cache, KEYS[0], created=time.time() - 120)
+    cache.sweep()
+    assert not os.path.exists(entry.path)
+    assert not os.path.exists(profile)
+
+
+def test_compressed_entries_read_back_as_the_original_bytes(tmp_path):
+    cache = make_cache(tmp_path)
+    data = b"0\nLINE\n" * 500
+    entry = cache.put(KEYS[0], f"{KEYS[0]}_plan.dxf", data, encoding="gzip")
+    assert entry.path.endswith(".gz")
+    assert entry.size < len(data)
+    assert cache.read(cache.get(KEYS[0])) == data
+
+
+def test_background_sweeper_evicts_without_being_asked(tmp_path):
+    cache = make_cache(tmp_path, max_age=60, sweep_interval=0.05)
+    entry = put(cache, KEYS[0])
+    backdate(cache, KEYS[0], created=time.time() - 120)
+    deadline = time.monotonic() + 5
+    while os.path.exists(entry.path) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not os.path.exists(entry.path)
+    assert cache.stats()["entries"] == 0
+
+
+def test_flat_files_from_the_old_layout_are_adopted(tmp_path):
+    directory = tmp_path / "cache"
+    directory.mkdir()
+    (directory / f"{KEYS[0]}_plan.dxf").write_bytes(b"flat")
+
+    cache = make_cache(tmp_path)
+    entry = cache.get(KEYS[0])
+    assert entry is not None
+    assert entry.path == os.path.join(cache.directory, KEYS[0][:2], KEYS[0][2:4], f"{KEYS[0]}_plan.dxf")
+    assert cache.read(entry) == b"flat"
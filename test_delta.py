@@ -0,0 +1,156 @@
+# test_delta.py - Tests for plan edits redrawn as deltas (dxf_delta.py, GenerationEngine.edit)
+# File: /test_delta.py
+#
+# Usage: python -m pytest test_delta.py
+import collections
+import io
+import json
+
+import ezdxf
+import pytest
+
+from dxf_batch import BatchRenderer
+from dxf_cache import DXFCache
+from dxf_delta import PlanState
+from dxf_engine import MAX_FEATURE_COUNT, GenerationEngine, edit_spec, normalize_spec, render_plan_bytes, render_spec
+
+EDITS = [
+    {"add_windows": 3},
+    {"add_rooms": ["bedroom"]},
+    {"add_rooms": ["kitchen", "bathroom"]},
+    {"remove_doors": 1},
+    {"scale": 1.5},
+    {"remove_rooms": ["bedroom"]},
+    {"add_doors": 5, "add_windows": 2},
+    {"remove_windows": 5, "remove_doors": 6},
+]
+
+
+def entities(data):
+    """The modelspace of a DXF document as a multiset of entities, handles left out."""
+    doc = ezdxf.read(io.StringIO(data.decode("utf-8")))
+    found = collections.Counter()
+    for entity in doc.modelspace():
+        attribs = entity.dxfattribs(drop={"handle", "owner"})
+        if entity.dxftype() == "LWPOLYLINE":
+            attribs["points"] = tuple(map(tuple, entity.get_points()))
+        found[entity.dxftype(), tuple(sorted((name, str(value)) for name, value in attribs.items()))] += 1
+    return found
+
+
+def drawn(spec):
+    state = PlanState()
+    state.update(spec)
+    return state
+
+
+@pytest.fixture
+def engine(tmp_path):
+    renderer = BatchRenderer(render_plan_bytes, max_workers=1, kind="thread")
+    yield GenerationEngine(DXFCache(str(tmp_path / "cache"), sweep_interval=0), renderer,
+                           lambda filename, data: f"https://files/{filename}", max_plans=4)
+    renderer.shutdown()
+
+
+def test_chained_edits_match_a_full_render():
+    spec = normalize_spec("house with 2 doors")
+    state = drawn(spec)
+    for edits in EDITS:
+        spec = edit_spec(spec, **edits)
+        added, deleted, total = state.update(spec)
+        data = state.serialize("dxf")
+        assert entities(data) == entities(render_spec(spec)), edits
+        assert total == sum(entities(data).values())
+
+
+def test_an_edit_only_redraws_what_changed():
+    spec = normalize_spec("house with 4 doors, 6 windows, 3 bedrooms, kitchen and bathroom")
+    state = drawn(spec)
+    added, deleted, total = state.update(edit_spec(spec, add_windows=1))
+    assert 0 < added < total
+    assert deleted < total
+
+
+def test_copies_are_edited_without_changing_the_original():
+    spec = normalize_spec("house with 3 doors, 4 windows and 2 bedrooms")
+    state = drawn(spec)
+    state.serialize("dxf")
+    for edits in ({"add_windows": 2}, {"remove_doors": 1}, {"add_rooms": ["kitchen"]}):
+        edited = edit_spec(spec, **edits)
+        copy = state.copy()
+        copy.update(edited)
+        assert entities(copy.serialize("dxf")) == entities(render_spec(edited)), edits
+    assert entities(state.serialize("dxf")) == entities(render_spec(spec))
+
+
+def content(fmt, data, tmp_path):
+    """What a plan draws in a format, independent of the order entities were added in."""
+    if fmt == "dxf-binary":
+        path = tmp_path / "plan.dxf"
+        path.write_bytes(data)
+        stream = io.StringIO()
+        ezdxf.readfile(str(path)).write(stream)
+        return entities(stream.getvalue().encode("utf-8"))
+    if fmt == "json":
+        plan = json.loads(data)
+        return plan["extents"], sorted(json.dumps(entity, sort_keys=True) for entity in plan["entities"])
+    # SVG: one element per line, each path's subpaths in any order
+    elements = collections.Counter()
+    for line in data.decode("utf-8").splitlines():
+        head, _, path = line.partition(' d="')
+        elements[head, tuple(sorted("M" + part for part in path.split("M") if part))] += 1
+    return elements
+
+
+@pytest.mark.parametrize("fmt", ["dxf-binary", "json", "svg"])
+def test_edited_plans_serialize_to_every_format(fmt, tmp_path):
+    spec = normalize_spec("office with 2 doors and 3 windows", fmt=fmt)
+    state = drawn(spec)
+    edited = edit_spec(spec, add_doors=1)
+    state.update(edited)
+    assert content(fmt, state.serialize(fmt), tmp_path) == content(fmt, render_spec(edited), tmp_path)
+
+
+def test_engine_edits_a_plan_it_has_not_held_as_a_delta(engine):
+    spec = normalize_spec("house with 4 doors, 6 windows, 3 bedrooms, kitchen and bathroom")
+    engine.generate(spec)
+    edited = edit_spec(spec, add_windows=1)
+    artifact = engine.edit(spec, edited)
+    added, deleted, total = artifact.changes
+    assert added < total
+    assert entities(engine.read(artifact)) == entities(render_spec(edited))
+
+
+def test_engine_keeps_the_base_plan_for_further_edits(engine):
+    spec = normalize_spec("house with 3 doors, 4 windows and 2 bedrooms")
+    first = edit_spec(spec, add_windows=1)
+    second = edit_spec(spec, remove_doors=1)
+    engine.edit(spec, first)
+    artifact = engine.edit(spec, second)
+    assert artifact.changes[0] < artifact.changes[2]
+    assert entities(engine.read(artifact)) == entities(render_spec(second))
+
+    # An edit of an edit starts from the edited drawing
+    chained = edit_spec(first, add_rooms=["kitchen"])
+    artifact = engine.edit(first, chained)
+    assert entities(engine.read(artifact)) == entities(render_spec(chained))
+    assert len(engine._plans) <= engine.max_plans
+
+
+@pytest.mark.parametrize("edits, message", [
+    ({"remove_doors": 3}, "would have -1 doors"),
+    ({"add_windows": -1}, "must not be negative"),
+    ({"add_doors": "two"}, "must be a whole number"),
+    ({"remove_rooms": ["garage"]}, "Unknown room"),
+    ({"remove_rooms": ["kitchen"]}, "no kitchen to remove"),
+])
+def test_impossible_edits_are_rejected(edits, message):
+    spec = normalize_spec("house with 2 doors and a bedroom")
+    with pytest.raises(ValueError, match=message):
+        edit_spec(spec, **edits)
+
+
+def test_edits_cannot_exceed_the_room_limit():
+    spec = normalize_spec(f"house with {MAX_FEATURE_COUNT} rooms")
+    with pytest.raises(ValueError, match="rooms"):
+        edit_spec(spec, add_rooms=["kitchen"])
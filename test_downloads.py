@@ -0,0 +1,174 @@
+# test_downloads.py - Tests for /download in the HTTP app (main.py), through the Flask test client
+# File: /test_downloads.py
+#
+# Usage: python -m pytest test_downloads.py
+import gzip
+import hashlib
+import importlib
+import os
+
+import pytest
+
+from dxf_compression import brotli, compress
+from dxf_engine import normalize_spec
+
+needs_brotli = pytest.mark.skipif(brotli is None, reason="brotli is not installed")
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    """main imported in a scratch directory: uploads/ and the job store are created where it starts."""
+    directory = tmp_path_factory.mktemp("server")
+    cwd = os.getcwd()
+    os.environ["DXF_JOB_DB"] = str(directory / "jobs.sqlite3")
+    os.chdir(directory)
+    try:
+        main = importlib.import_module("main")
+    finally:
+        os.chdir(cwd)
+    yield main
+    main.batch_renderer.shutdown()
+
+
+@pytest.fixture(scope="module")
+def client(server):
+    return server.app.test_client()
+
+
+@pytest.fixture(scope="module")
+def plan(server):
+    """A generated plan: its download URL and its bytes."""
+    artifact = server.engine.generate(normalize_spec("house with 3 doors, 4 windows and 2 bedrooms"))
+    return artifact.url, server.engine.read(artifact)
+
+
+def test_download_sends_the_file_with_a_strong_etag(client, plan):
+    url, data = plan
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.data == data
+    assert response.headers["ETag"].startswith('"')
+    assert "attachment" in response.headers["Content-Disposition"]
+    # Content-addressed names never change content
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age == 365 * 24 * 3600
+
+
+def test_matching_etag_gets_304(client, plan):
+    url, _ = plan
+    etag = client.get(url).headers["ETag"]
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_head_sends_the_headers_only(client, plan):
+    url, data = plan
+    response = client.head(url)
+    assert response.status_code == 200
+    assert response.data == b""
+    assert int(response.headers["Content-Length"]) == len(data)
+
+
+def test_range_gets_206_with_the_requested_bytes(client, plan):
+    url, data = plan
+    response = client.get(url, headers={"Range": "bytes=10-109"})
+    assert response.status_code == 206
+    assert response.data == data[10:110]
+    assert response.headers["Content-Range"] == f"bytes 10-109/{len(data)}"
+
+    response = client.get(url, headers={"Range": "bytes=-50"})
+    assert response.status_code == 206
+    assert response.data == data[-50:]
+
+
+def test_range_resumes_only_an_unchanged_file(client, plan):
+    url, data = plan
+    etag = client.get(url).headers["ETag"]
+    response = client.get(url, headers={"Range": "bytes=100-", "If-Range": etag})
+    assert response.status_code == 206
+    assert response.data == data[100:]
+    response = client.get(url, headers={"Range": "bytes=100-", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.data == data
+
+
+def test_unsatisfiable_range_gets_416(client, plan):
+    url, data = plan
+    response = client.get(url, headers={"Range": f"bytes={len(data) + 10}-"})
+    assert response.status_code == 416
+
+
+@pytest.mark.parametrize("filename", ["missing.dxf", "..%2Fmain.py", "index.sqlite3"])
+def test_unknown_files_get_404(client, filename):
+    assert client.get(f"/download/{filename}").status_code == 404
+
+
+def stored(server, name, data, encoding=None):
+    """Put data in the cache under a content-addressed name; returns its download URL."""
+    key = hashlib.md5(f"{name}:{encoding}".encode("utf-8")).hexdigest()
+    filename = f"{key}_{name}"
+    server.dxf_cache.put(key, filename, data, encoding=encoding)
+    return f"/download/{filename}"
+
+
+def test_identity_unless_the_client_accepts_an_encoding(client, plan):
+    url, data = plan
+    response = client.get(url)
+    assert response.content_encoding is None
+    assert "Accept-Encoding" in response.vary
+    assert response.data == data
+
+
+def test_gzip_is_negotiated_and_has_its_own_etag(client, plan):
+    url, data = plan
+    identity_etag = client.get(url).headers["ETag"]
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.content_encoding == "gzip"
+    assert gzip.decompress(response.data) == data
+    assert len(response.data) < len(data)
+    etag = response.headers["ETag"]
+    assert etag != identity_etag
+
+    assert client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag}).status_code == 304
+    # The identity ETag does not validate the gzip representation
+    assert client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": identity_etag}).status_code == 200
+
+
+@needs_brotli
+def test_brotli_is_preferred_when_accepted(client, plan):
+    url, data = plan
+    response = client.get(url, headers={"Accept-Encoding": "gzip, deflate, br"})
+    assert response.content_encoding == "br"
+    assert brotli.decompress(response.data) == data
+
+    response = client.get(url, headers={"Accept-Encoding": "br;q=0, gzip"})
+    assert response.content_encoding == "gzip"
+
+
+def test_small_files_are_sent_uncompressed(server, client):
+    url = stored(server, "tiny.dxf", b"0\nEOF\n")
+    response = client.get(url, headers={"Accept-Encoding": "gzip, br"})
+    assert response.content_encoding is None
+    assert response.data == b"0\nEOF\n"
+
+
+def test_stored_gzip_is_sent_as_stored(server, client):
+    data = b"  0\nLINE\n  8\nWALLS\n" * 400
+    url = stored(server, "stored.dxf", data, encoding="gzip")
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.content_encoding == "gzip"
+    assert response.data == compress(data, "gzip")
+
+    etag = response.headers["ETag"]
+    assert client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag}).status_code == 304
+
+
+@pytest.mark.parametrize("accept", [None, "br;q=0, identity"])
+def test_stored_gzip_is_decompressed_for_clients_without_gzip(server, client, accept):
+    data = b"  0\nARC\n  8\nDOORS\n" * 400
+    url = stored(server, "stored_plain.dxf", data, encoding="gzip")
+    response = client.get(url, headers={"Accept-Encoding": accept} if accept else {})
+    assert response.content_encoding is None
+    assert response.data == data
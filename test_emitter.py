@@ -0,0 +1,87 @@
+# test_emitter.py - Tests for the bulk entity emitter (dxf_emitter.py)
+# File: /test_emitter.py
+#
+# Usage: python -m pytest test_emitter.py
+#
+# BulkEmitter fills ezdxf entities through private internals, so these
+# check its output against the public msp.add_*() path on the installed ezdxf.
+import io
+
+import ezdxf
+import numpy as np
+from ezdxf.enums import TextEntityAlignment
+
+from dxf_emitter import BulkEmitter
+from dxf_engine import normalize_spec, render_spec
+from dxf_render import templates
+
+SEGMENTS = np.array([(0, 0, 5000, 0), (5000, 0, 5000, 4000), (120.5, 80.25, 900, 3300)])
+CENTERS = np.array([(1000, 0), (2500.5, 4000)])
+RADII = np.array([800, 650.5])
+ANGLES = np.array([(0, 90), (180, 270)])
+FRAMES = np.array([[(0, 0), (1200, 0), (1200, 150), (0, 150)], [(3000, 4000), (4000, 4000), (4000, 4150), (3000, 4150)]])
+LABELS = ["Bedroom 1", "Kitchen"]
+
+
+def per_call(msp):
+    for x1, y1, x2, y2 in SEGMENTS.tolist():
+        msp.add_line((x1, y1), (x2, y2), dxfattribs={"layer": "WALLS", "lineweight": 30})
+    for (x, y), radius, (start, end) in zip(CENTERS.tolist(), RADII.tolist(), ANGLES.tolist()):
+        msp.add_arc(center=(x, y), radius=radius, start_angle=start, end_angle=end, dxfattribs={"layer": "DOORS"})
+    for corners in FRAMES.tolist():
+        msp.add_lwpolyline(corners, close=True, dxfattribs={"layer": "WINDOWS"})
+    for label, (x, y) in zip(LABELS, CENTERS.tolist()):
+        msp.add_text(label, dxfattribs={"height": 200, "layer": "TEXT"}
+                     ).set_placement((x, y), align=TextEntityAlignment.MIDDLE_CENTER)
+
+
+def bulk(msp):
+    emit = BulkEmitter(msp)
+    emit.lines(SEGMENTS, layer="WALLS", lineweight=30)
+    emit.arcs(CENTERS, RADII, ANGLES, layer="DOORS")
+    emit.polylines(FRAMES, close=True, layer="WINDOWS")
+    emit.texts(LABELS, CENTERS, align=TextEntityAlignment.MIDDLE_CENTER, height=200, layer="TEXT")
+
+
+def drawn_with(emit):
+    doc = templates.new_document("architectural")
+    emit(doc.modelspace())
+    return doc
+
+
+def describe(entity):
+    """An entity's type and attributes, without those that differ between documents."""
+    attribs = entity.dxfattribs(drop={"handle", "owner"})
+    if entity.dxftype() == "LWPOLYLINE":
+        attribs["points"] = [tuple(point) for point in entity.get_points()]
+    return entity.dxftype(), attribs
+
+
+def test_bulk_entities_match_the_per_call_path():
+    expected, actual = drawn_with(per_call), drawn_with(bulk)
+    assert [describe(entity) for entity in actual.modelspace()] == [describe(entity) for entity in expected.modelspace()]
+
+
+def test_bulk_entities_are_registered_like_per_call_ones():
+    doc = drawn_with(bulk)
+    msp = doc.modelspace()
+    owner = msp.block_record.dxf.handle
+    for entity in msp:
+        assert doc.entitydb[entity.dxf.handle] is entity
+        assert entity.dxf.owner == owner
+        assert entity.doc is doc
+
+
+def test_bulk_output_passes_audit():
+    doc = drawn_with(bulk)
+    auditor = doc.audit()
+    assert not auditor.has_errors, [str(error.message) for error in auditor.errors]
+    assert not auditor.has_fixes, [str(fix.message) for fix in auditor.fixes]
+
+
+def test_rendered_plan_reads_back_and_passes_audit():
+    spec = normalize_spec("house with 3 doors, 4 windows, 2 bedrooms and kitchen")
+    doc = ezdxf.read(io.StringIO(render_spec(spec).decode("utf-8")))
+    auditor = doc.audit()
+    assert not auditor.has_errors, [str(error.message) for error in auditor.errors]
+    assert len(doc.modelspace()) > 0
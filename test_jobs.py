@@ -0,0 +1,269 @@
+# test_jobs.py - Tests for the durable job queue (dxf_jobs.py)
+# File: /test_jobs.py
+#
+# Usage: python -m pytest test_jobs.py
+import threading
+import time
+
+import pytest
+
+from dxf_jobs import DONE, FAILED, QUEUED, RUNNING, STALE_AFTER, JobQueue
+
+
+def make_queue(path, handler, **kwargs):
+    kwargs.setdefault("poll_interval", 0.05)
+    return JobQueue(str(path), handler, **kwargs)
+
+
+class Recorder:
+    """
+    Job handler that records the order jobs run in. A job whose spec has
+    "gate" holds the worker until open() is called, so jobs can be queued
+    up behind it and the claim order observed.
+    """
+
+    def __init__(self):
+        self.ran = []
+        self.gate_reached = threading.Event()
+        self._gate = threading.Event()
+
+    def __call__(self, spec, report):
+        report("working")
+        if spec.get("gate"):
+            self.gate_reached.set()
+            self._gate.wait(10)
+        else:
+            self.ran.append(spec["name"])
+        return {"name": spec.get("name")}
+
+    def open(self):
+        self._gate.set()
+
+
+@pytest.fixture
+def queue(tmp_path):
+    recorder = Recorder()
+    queue = make_queue(tmp_path / "jobs.sqlite3", recorder, workers=1)
+    queue.recorder = recorder
+    yield queue
+    recorder.open()
+    queue.shutdown()
+
+
+def hold_worker(queue):
+    """Occupy the only worker, so the next submissions wait in the queue."""
+    gate = queue.submit({"gate": True}, client="gate")
+    assert queue.recorder.gate_reached.wait(5)
+    return gate
+
+
+def run_all(queue, job_ids):
+    queue.recorder.open()
+    return [queue.future(job_id).result(timeout=10) for job_id in job_ids]
+
+
+def counted(queue):
+    """Jobs per state as the table actually holds them, to check the trigger-kept counts."""
+    rows = queue._db().execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+    return {state: dict(rows).get(state, 0) for state in (QUEUED, RUNNING, DONE, FAILED)}
+
+
+def insert_job(queue, job_id, state, **columns):
+    """A job row as another (possibly dead) process would have left it."""
+    columns = {"id": job_id, "client": "other", "priority": 0, "state": state, "spec": '{"name": "%s"}' % job_id,
+               "created": time.time(), **columns}
+    names = ", ".join(columns)
+    with queue._transaction() as db:
+        db.execute(f"INSERT INTO jobs ({names}) VALUES ({', '.join('?' * len(columns))})", tuple(columns.values()))
+
+
+def test_a_job_runs_and_records_its_result(queue):
+    job = queue.submit({"name": "plan"}, client="a")
+    assert job["state"] in (QUEUED, RUNNING)
+    job = queue.future(job["id"]).result(timeout=10)
+    assert job["state"] == DONE
+    assert job["result"] == {"name": "plan"}
+    assert job["stage"] == "working"
+    assert job["attempts"] == 1
+    assert job["finished"] >= job["started"] >= job["created"]
+
+
+def test_a_failing_handler_fails_the_job(tmp_path):
+    def handler(spec, report):
+        raise ValueError("cannot draw that")
+
+    queue = make_queue(tmp_path / "jobs.sqlite3", handler)
+    try:
+        job = queue.future(queue.submit({"name": "plan"})["id"]).result(timeout=10)
+    finally:
+        queue.shutdown()
+    assert job["state"] == FAILED
+    assert job["error"] == "cannot draw that"
+
+
+def test_queue_position_counts_the_jobs_ahead(queue):
+    hold_worker(queue)
+    first = queue.submit({"name": "first"})
+    second = queue.submit({"name": "second"})
+    urgent = queue.submit({"name": "urgent"}, priority=5)
+    assert (first["queued_ahead"], second["queued_ahead"], urgent["queued_ahead"]) == (0, 1, 0)
+    assert queue.get(second["id"])["queued_ahead"] == 2
+
+
+def test_higher_priority_runs_first(queue):
+    hold_worker(queue)
+    job_ids = [queue.submit({"name": name}, priority=priority)["id"]
+               for name, priority in (("low", -1), ("normal", 0), ("high", 7))]
+    run_all(queue, job_ids)
+    assert queue.recorder.ran == ["high", "normal", "low"]
+
+
+def test_clients_take_turns_at_equal_priority(queue):
+    hold_worker(queue)
+    job_ids = [queue.submit({"name": f"a{n}"}, client="a")["id"] for n in range(1, 4)]
+    job_ids += [queue.submit({"name": f"b{n}"}, client="b")["id"] for n in range(1, 3)]
+    run_all(queue, job_ids)
+    assert queue.recorder.ran == ["a1", "b1", "a2", "b2", "a3"]
+
+
+def test_jobs_with_the_same_key_are_coalesced_while_unfinished(queue):
+    hold_worker(queue)
+    first = queue.submit({"name": "plan"}, key="k", priority=0)
+    joined = queue.submit({"name": "plan"}, key="k", priority=9)
+    other = queue.submit({"name": "other"}, key="other")
+    assert joined["id"] == first["id"] != other["id"]
+    assert joined["coalesced"] == 1
+    assert joined["priority"] == 9
+
+    run_all(queue, [first["id"], other["id"]])
+    assert queue.recorder.ran.count("plan") == 1
+    stats = queue.stats()
+    assert (stats["submitted"], stats["coalesced"]) == (3, 1)
+
+    # A finished job is not joined; the same key runs again
+    again = queue.submit({"name": "plan"}, key="k")
+    assert again["id"] != first["id"]
+    assert queue.future(again["id"]).result(timeout=10)["state"] == DONE
+
+
+def test_wait_returns_when_the_job_changes(queue):
+    hold_worker(queue)
+    job = queue.submit({"name": "plan"})
+    start = time.monotonic()
+    assert queue.wait(job["id"], job["version"], timeout=0.2)["state"] == QUEUED
+    assert time.monotonic() - start >= 0.2
+    queue.recorder.open()
+    assert queue.wait(job["id"], job["version"], timeout=10)["version"] != job["version"]
+
+
+def test_running_jobs_renew_their_heartbeat(queue):
+    gate = hold_worker(queue)
+    before = queue._db().execute("SELECT heartbeat FROM jobs WHERE id = ?", (gate["id"],)).fetchone()[0]
+    time.sleep(0.01)
+    queue._housekeeping()
+    after, state = queue._db().execute("SELECT heartbeat, state FROM jobs WHERE id = ?", (gate["id"],)).fetchone()
+    assert after > before
+    assert state == RUNNING
+
+
+def test_jobs_of_a_dead_process_are_requeued_or_failed(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    stale = time.time() - STALE_AFTER - 1
+    # Never started: only used to leave rows behind as a crashed process would
+    crashed = make_queue(path, None)
+    insert_job(crashed, "interrupted", RUNNING, owner="gone:1", heartbeat=stale, started=stale, attempts=1)
+    insert_job(crashed, "unlucky", RUNNING, owner="gone:1", heartbeat=stale, started=stale, attempts=3)
+    insert_job(crashed, "alive", RUNNING, owner="busy:2", heartbeat=time.time(), started=time.time(), attempts=1)
+
+    recorder = Recorder()
+    queue = make_queue(path, recorder, max_attempts=3)
+    try:
+        interrupted = queue.future("interrupted").result(timeout=10)
+        unlucky = queue.future("unlucky").result(timeout=10)
+        alive = queue.get("alive")
+    finally:
+        queue.shutdown()
+    assert interrupted["state"] == DONE
+    assert interrupted["attempts"] == 2
+    assert unlucky["state"] == FAILED
+    assert unlucky["error"] == "interrupted too many times"
+    # Still owned by a live process; left alone
+    assert alive["state"] == RUNNING
+    assert recorder.ran == ["interrupted"]
+
+
+def test_finished_jobs_are_pruned_after_the_retention_period(tmp_path):
+    queue = make_queue(tmp_path / "jobs.sqlite3", Recorder(), retention=3600)
+    now = time.time()
+    insert_job(queue, "old", DONE, finished=now - 7200)
+    insert_job(queue, "recent", DONE, finished=now - 60)
+    insert_job(queue, "old-failure", FAILED, finished=now - 7200)
+    queue.start()
+    try:
+        queue._housekeeping()
+        assert queue.get("old") is None
+        assert queue.get("old-failure") is None
+        assert queue.get("recent")["state"] == DONE
+    finally:
+        queue.shutdown()
+
+
+def test_state_counts_match_the_jobs_table(queue):
+    hold_worker(queue)
+    job_ids = [queue.submit({"name": f"plan{n}"})["id"] for n in range(3)]
+    insert_job(queue, "broken", FAILED, finished=time.time())
+    stats = queue.stats()
+    assert {state: stats[state] for state in (QUEUED, RUNNING, DONE, FAILED)} == counted(queue)
+    assert (stats[QUEUED], stats[RUNNING], stats[FAILED]) == (3, 1, 1)
+
+    run_all(queue, job_ids)
+    stats = queue.stats()
+    assert {state: stats[state] for state in (QUEUED, RUNNING, DONE, FAILED)} == counted(queue)
+    assert stats[DONE] == 4
+
+
+def test_unknown_jobs(queue):
+    assert queue.get("missing") is None
+    with pytest.raises(KeyError):
+        queue.future("missing").result(timeout=5)
+
+
+def test_priorities_are_validated(queue):
+    with pytest.raises(ValueError):
+        queue.submit({"name": "plan"}, priority="high")
+    with pytest.raises(ValueError):
+        queue.submit({"name": "plan"}, priority=1.5)
+    assert queue.submit({"name": "plan"}, priority=1000)["priority"] == 100
+
+
+def test_queues_sharing_a_database_run_only_their_own_jobs(tmp_path):
+    ran = {"a": [], "b": []}
+    lock = threading.Lock()
+
+    def handler_for(scope):
+        def handler(spec, report):
+            with lock:
+                ran[scope].append(spec["n"])
+            return {"scope": scope}
+        return handler
+
+    path = tmp_path / "jobs.sqlite3"
+    queues = {scope: make_queue(path, handler_for(scope), scope=scope) for scope in ("a", "b")}
+    try:
+        submitted = {scope: [] for scope in queues}
+        for n in range(20):
+            scope = "ab"[n % 2]
+            # Identical keys in both scopes must not be joined across them
+            submitted[scope].append(queues[scope].submit({"n": n}, key=f"same-{n // 2}")["id"])
+        for scope, job_ids in submitted.items():
+            for job_id in job_ids:
+                job = queues[scope].future(job_id).result(timeout=10)
+                assert job["state"] == DONE
+                assert job["result"] == {"scope": scope}
+    finally:
+        for queue in queues.values():
+            queue.shutdown()
+
+    assert sorted(ran["a"]) == list(range(0, 20, 2))
+    assert sorted(ran["b"]) == list(range(1, 20, 2))
+    assert queues["a"].coalesced == queues["b"].coalesced == 0
@@ -51,7 +51,7 @@ async def test_mcp_server():
                 
                 # Verify we have the expected tools
                 tool_names = [tool.name for tool in tools]
-                expected_tools = ["generate_architectural_dxf", "list_recent_dxf_files"]
+                expected_tools = ["generate_architectural_dxf", "generate_dxf_batch", "list_recent_dxf_files"]
                 
                 for expected in expected_tools:
                     if expected in tool_names: